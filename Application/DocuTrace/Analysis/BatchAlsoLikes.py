@@ -0,0 +1,235 @@
+import csv
+import json
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from .CoReadIndex import DEFAULT_BLOCK_SIZE, block_bounds
+from .Interning import Interner
+from .ReadGraph import ReadGraph
+from ..Utils.Logging import logger
+
+
+OUTPUT_FORMATS = ('jsonl', 'csv')
+CSV_HEADER = ('document', 'visitor', 'rank', 'also_likes', 'readers')
+NO_VISITOR = -1
+
+# Set in each worker process by init_worker, so the read graph is sent to a worker once rather than with every block
+worker_state = {}
+
+
+def name_ranks(interner: Interner) -> np.ndarray:
+    """Rank the strings of an interner in sorted order, used to break ties between equal counts as sort_dict_by_value does
+
+    Args:
+        interner (Interner): The interner
+
+    Returns:
+        numpy.ndarray: Indexed by id, the position of each string in sorted order
+    """
+    ranks = np.empty(len(interner), dtype=np.int64)
+    ranks[np.argsort(np.array(interner.values, dtype=object), kind='stable')] = np.arange(len(interner))
+    return ranks
+
+
+def expanded_reads(read_graph: ReadGraph) -> np.ndarray:
+    """Count the reads of the readers of each document, the number of pairs a document expands to when its also likes are computed
+
+    Args:
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+
+    Returns:
+        numpy.ndarray: Indexed by document id, the number of documents read by each of its readers
+    """
+    reader_degrees = read_graph.documents_read.degrees()[read_graph.readers.indices]
+    return np.bincount(read_graph.readers.row_ids(), weights=reader_degrees, minlength=len(read_graph.readers)).astype(np.int64)
+
+
+def also_likes_block(read_graph: ReadGraph, ranks: np.ndarray, document_ids: np.ndarray, visitor_ids: np.ndarray, n: int=None) -> list:
+    """Compute the also likes of a block of documents in one vectorised pass over the read graph
+
+    Args:
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+        ranks (numpy.ndarray): The sorted position of each document id, returned by name_ranks
+        document_ids (numpy.ndarray): Ids of the documents
+        visitor_ids (numpy.ndarray): Id of the visitor excluded from the readers of each document, NO_VISITOR for none
+        n (int, optional): The number of also likes kept for each document, every one when None. Defaults to None.
+
+    Returns:
+        list((numpy.ndarray, numpy.ndarray)): For each document, the also liked document ids ordered as sort_dict_by_value orders them, and the number of shared readers of each
+    """
+    readers, _ = read_graph.readers.gather(document_ids)
+    owners = np.repeat(np.arange(len(document_ids)), read_graph.readers.degrees(document_ids))
+    other_reader = readers != visitor_ids[owners]
+    readers, owners = readers[other_reader], owners[other_reader]
+
+    read, _ = read_graph.documents_read.gather(readers)
+    owners = np.repeat(owners, read_graph.documents_read.degrees(readers))
+    other_document = read != document_ids[owners]
+    pairs, counts = np.unique((owners[other_document].astype(np.int64) << 32) | read[other_document], return_counts=True)
+
+    owners = pairs >> 32
+    also_liked = pairs & 0xFFFFFFFF
+    order = top_order(owners, counts, ranks[also_liked], len(document_ids))
+    bounds = np.searchsorted(owners[order], np.arange(len(document_ids) + 1))
+    results = []
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if n is not None:
+            end = min(end, start + n)
+        results.append((also_liked[order[start:end]], counts[order[start:end]]))
+    return results
+
+
+def top_order(owners: np.ndarray, counts: np.ndarray, ranks: np.ndarray, n_owners: int) -> np.ndarray:
+    """Order entries by owner, then by count from largest to smallest, then by rank.
+    The three keys are packed into one integer when they fit, which sorts far faster than a lexsort.
+
+    Args:
+        owners (numpy.ndarray): The owner of each entry
+        counts (numpy.ndarray): The count of each entry
+        ranks (numpy.ndarray): The rank of each entry, breaking ties between equal counts
+        n_owners (int): The number of owners
+
+    Returns:
+        numpy.ndarray: The order of the entries
+    """
+    if len(counts) == 0:
+        return np.empty(0, dtype=np.int64)
+    max_count = int(counts.max())
+    n_ranks = int(ranks.max()) + 1
+    if n_owners * (max_count + 1) * n_ranks >= 1 << 62:
+        return np.lexsort((ranks, -counts, owners))
+    return np.argsort((owners * (max_count + 1) + (max_count - counts)) * n_ranks + ranks)
+
+
+def init_worker(read_graph: ReadGraph, ranks: np.ndarray) -> None:
+    """Keep the read graph in a worker process of the pool
+
+    Args:
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+        ranks (numpy.ndarray): The sorted position of each document id
+    """
+    worker_state['read_graph'] = read_graph
+    worker_state['ranks'] = ranks
+
+
+def run_block(block: tuple) -> list:
+    """Compute the also likes of a block of documents in a worker process
+
+    Args:
+        block ((numpy.ndarray, numpy.ndarray, int)): The document ids, the excluded visitor ids and n
+
+    Returns:
+        list((numpy.ndarray, numpy.ndarray)): The result of also_likes_block
+    """
+    return also_likes_block(worker_state['read_graph'], worker_state['ranks'], *block)
+
+
+def batch_also_likes(read_graph: ReadGraph, documents='all', visitors: dict=None, n: int=10, max_workers: int=1, block_size: int=DEFAULT_BLOCK_SIZE):
+    """Compute the also likes of many documents, a block of documents at a time, in a pool of processes when max_workers is more than one.
+    Documents are split into blocks expanding to at most block_size reads, blocks are computed in parallel and yielded in order.
+    The counts are the number of distinct readers, as ComputeData.find_also_likes_counts returns them.
+
+    Args:
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+        documents (list(str) | str, optional): The document ids, or 'all' for every document with a reader. Defaults to 'all'.
+        visitors (dict(str, str), optional): A visitor uuid to exclude from the readers of each document. Defaults to None.
+        n (int, optional): The number of also likes kept for each document, every one when None. Defaults to 10.
+        max_workers (int, optional): The max number of processes, None for one per cpu. Defaults to 1.
+        block_size (int, optional): The most reads expanded in a block. Defaults to DEFAULT_BLOCK_SIZE.
+
+    Yields:
+        (str, str | None, list((str, int))): Each document, the excluded visitor, and its also liked documents with the number of shared readers
+    """
+    document_interner = read_graph.documents
+    visitors = visitors or {}
+    if isinstance(documents, str) and documents == 'all':
+        document_ids = np.flatnonzero(read_graph.readers.degrees())
+    else:
+        document_ids = []
+        for document in documents:
+            document_id = document_interner.get_id(document)
+            if document_id is None or document_id >= len(read_graph.readers) or read_graph.readers.degrees(document_id) == 0:
+                logger.warning('Document not found, skipping: {}'.format(document))
+            else:
+                document_ids.append(document_id)
+        document_ids = np.array(document_ids, dtype=np.int64)
+    visitor_ids = np.array([read_graph.visitors.get_id(visitors.get(document), NO_VISITOR)
+                            for document in document_interner.lookup_many(document_ids.tolist())], dtype=np.int64)
+
+    ranks = name_ranks(document_interner)
+    blocks = [(document_ids[start:end], visitor_ids[start:end], n)
+              for start, end in block_bounds(expanded_reads(read_graph)[document_ids], block_size)]
+    if max_workers is None:
+        max_workers = cpu_count()
+    max_workers = min(max_workers, len(blocks))
+    logger.debug('Batch also likes: {} documents | Blocks: {} | Processes: {}'.format(len(document_ids), len(blocks), max_workers))
+
+    if max_workers <= 1:
+        results = (also_likes_block(read_graph, ranks, *block) for block in blocks)
+        yield from decode_blocks(read_graph, blocks, results)
+    else:
+        with Pool(max_workers, initializer=init_worker, initargs=(read_graph, ranks)) as pool:
+            yield from decode_blocks(read_graph, blocks, pool.imap(run_block, blocks))
+
+
+def decode_blocks(read_graph: ReadGraph, blocks: list, results):
+    """Translate the ids of the results of each block back to strings
+
+    Args:
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+        blocks (list(tuple)): The blocks passed to also_likes_block
+        results (iterable(list)): The result of each block, in order
+
+    Yields:
+        (str, str | None, list((str, int))): Each document, the excluded visitor, and its also liked documents with the number of shared readers
+    """
+    documents = read_graph.documents
+    visitors = read_graph.visitors
+    for (document_ids, visitor_ids, _), block_results in zip(blocks, results):
+        for document_id, visitor_id, (also_liked, counts) in zip(document_ids.tolist(), visitor_ids.tolist(), block_results):
+            visitor = None if visitor_id == NO_VISITOR else visitors.lookup(visitor_id)
+            yield documents.lookup(document_id), visitor, list(zip(documents.lookup_many(also_liked.tolist()), counts.tolist()))
+
+
+def output_format(path: str) -> str:
+    """Choose the output format of a file from its extension
+
+    Args:
+        path (str): The path of the output file
+
+    Returns:
+        str: 'csv' for .csv files, otherwise 'jsonl'
+    """
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def write_also_likes(results, file, format: str='jsonl') -> int:
+    """Stream the results of batch_also_likes to a file as they are computed
+
+    Args:
+        results (iterable(tuple)): The results yielded by batch_also_likes
+        file (TextIO): The open file to write to
+        format (str, optional): 'jsonl' for one JSON object per document, or 'csv' for one row per also liked document. Defaults to 'jsonl'.
+
+    Raises:
+        ValueError: When the format is not one of OUTPUT_FORMATS
+
+    Returns:
+        int: The number of documents written
+    """
+    if format not in OUTPUT_FORMATS:
+        raise ValueError('Output format must be one of {}'.format(OUTPUT_FORMATS))
+    n_documents = 0
+    if format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for document, visitor, also_likes in results:
+            writer.writerows((document, visitor or '', rank, also_liked, readers) for rank, (also_liked, readers) in enumerate(also_likes, start=1))
+            n_documents += 1
+    else:
+        for document, visitor, also_likes in results:
+            file.write(json.dumps({'document': document, 'visitor': visitor,
+                                   'also_likes': [{'document': also_liked, 'readers': readers} for also_liked, readers in also_likes]}) + '\n')
+            n_documents += 1
+    return n_documents
@@ -0,0 +1,121 @@
+import os
+import pickle
+import time
+
+from DocuTrace.Utils.Logging import logger
+
+
+CHECKPOINT_VERSION = 1
+
+
+def file_signature(paths: list) -> list:
+    """Identify the contents of the files being read, so a checkpoint is not applied to files that have changed
+
+    Args:
+        paths (list(str)): Paths to the files
+
+    Returns:
+        list((str, int, int)): The path, size and modification time of each file
+    """
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+class Checkpoint:
+    """Periodically persist the chunks that have been parsed along with the merged data collector, so an interrupted read can be resumed.
+    The checkpoint is a single pickle written to a temporary file and moved over the previous checkpoint, so it is never left half written.
+
+    Args:
+        path (str): Path to the checkpoint file
+        resume (bool, optional): Load an existing checkpoint and skip the chunks it covers. Defaults to False.
+        interval (float, optional): Minimum number of seconds between checkpoints. Defaults to 60.0.
+    """
+    def __init__(self, path: str, resume: bool=False, interval: float=60.0):
+        self.path = path
+        self.resume = resume
+        self.interval = interval
+        self.metadata = None
+        self.done = set()
+        self.last_save = time.time()
+
+    def start(self, data_collector, paths: list, chunk_size: int) -> set:
+        """Describe the read being checkpointed, when resuming merge the saved data into the data collector
+
+        Args:
+            data_collector (DataCollector): The data collector being populated
+            paths (list(str)): The files being read
+            chunk_size (int): The chunk size used to partition the files, ranges only match when it is unchanged
+
+        Returns:
+            set(ByteRange | FrameRange | FileTask): The chunks already parsed, these must not be parsed again
+        """
+        self.metadata = {
+            'version': CHECKPOINT_VERSION,
+            'files': file_signature(paths),
+            'chunk_size': chunk_size,
+            'data_fns': [fn.__name__ for fn in data_collector.data_fns]
+        }
+        self.done = set()
+        self.last_save = time.time()
+        if not self.resume:
+            return self.done
+
+        saved = self.load()
+        if saved is None:
+            return self.done
+        if saved['metadata'] != self.metadata:
+            logger.warning('Checkpoint does not match the files or options of this run, starting from the beginning: {}'.format(self.path))
+            return self.done
+
+        data_collector.merge(saved['data_collector'])
+        self.done = set(saved['done'])
+        logger.info('Resuming from checkpoint: {} | Chunks already parsed: {}'.format(self.path, len(self.done)))
+        return self.done
+
+    def load(self) -> dict:
+        """Read the checkpoint file
+
+        Returns:
+            dict | None: The saved checkpoint, None when there is no readable checkpoint
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            logger.info('No checkpoint to resume from: {}'.format(self.path))
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            logger.warning('Unreadable checkpoint, starting from the beginning: {} | {}'.format(self.path, e))
+        return None
+
+    def record(self, chunks: list) -> None:
+        """Mark chunks as parsed, they must already be merged into the data collector that will be saved
+
+        Args:
+            chunks (list(ByteRange | FrameRange | FileTask | None)): The parsed chunks, None for chunks that cannot be identified
+        """
+        self.done.update(chunk for chunk in chunks if chunk is not None)
+
+    def due(self) -> bool:
+        """Check whether the interval since the last checkpoint has passed
+
+        Returns:
+            bool: True when a checkpoint should be written
+        """
+        return time.time() - self.last_save >= self.interval
+
+    def save(self, data_collector) -> None:
+        """Write the checkpoint
+
+        Args:
+            data_collector (DataCollector): The data collector holding the merged results of every recorded chunk
+        """
+        start_time = time.time()
+        temp_path = '{}.tmp'.format(self.path)
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'metadata': self.metadata, 'done': list(self.done), 'data_collector': data_collector}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+        self.last_save = time.time()
+        logger.debug('Checkpoint written: {} | Chunks parsed: {} | Duration: {}'.format(self.path, len(self.done), self.last_save - start_time))
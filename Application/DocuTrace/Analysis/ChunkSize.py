@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+from DocuTrace.Utils.Logging import logger
+
+
+# Bytes in each chunk handed to a worker, unless the chunk size is given or tuned
+DEFAULT_CHUNK_SIZE = 1 << 20
+MIN_CHUNK_SIZE = 1 << 16
+MAX_CHUNK_SIZE = 1 << 22
+
+
+ChunkStats = namedtuple('ChunkStats', ['n_bytes', 'duration'])
+"""Sent by a worker after parsing a chunk, so the parent can measure throughput
+
+Args:
+    n_bytes (int): Size of the chunk
+    duration (float): Seconds spent parsing the chunk
+"""
+
+
+class ChunkSizeTuner:
+    """Choose the size of streamed chunks from the measured throughput of the workers and the depth of the work queue.
+    Chunks are sized so each takes a worker about target_seconds, large enough to amortise the cost of queueing and small enough to keep the workers evenly loaded.
+    When the workers are waiting for the reader the size is halved, so the work that is read is shared between more of them.
+    Call the tuner to get the current size, it can be passed as the chunk_size of stream_file_chunks.
+
+    Args:
+        chunk_size (int, optional): The size used until throughput has been measured. Defaults to DEFAULT_CHUNK_SIZE.
+        min_size (int, optional): The smallest chunk size. Defaults to MIN_CHUNK_SIZE.
+        max_size (int, optional): The largest chunk size, with a bounded queue this caps the memory held by queued chunks. Defaults to MAX_CHUNK_SIZE.
+        target_seconds (float, optional): The time a worker should spend on each chunk. Defaults to 0.1.
+        smoothing (float, optional): Weight of the latest measurement in the moving average of throughput. Defaults to 0.3.
+    """
+    def __init__(self, chunk_size: int=DEFAULT_CHUNK_SIZE, min_size: int=MIN_CHUNK_SIZE, max_size: int=MAX_CHUNK_SIZE, target_seconds: float=0.1, smoothing: float=0.3):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.throughput = None
+        self.starved = False
+
+    def clamp(self, chunk_size: float) -> int:
+        """Limit a chunk size to the configured bounds
+
+        Args:
+            chunk_size (float): The proposed size
+
+        Returns:
+            int: The size within [min_size, max_size]
+        """
+        return int(max(self.min_size, min(self.max_size, chunk_size)))
+
+    def record(self, stats: ChunkStats) -> None:
+        """Add a throughput measurement from a worker
+
+        Args:
+            stats (ChunkStats): Size of a parsed chunk and the time it took
+        """
+        if stats.duration <= 0 or stats.n_bytes <= 0:
+            return
+        throughput = stats.n_bytes / stats.duration
+        if self.throughput is None:
+            self.throughput = throughput
+        else:
+            self.throughput += self.smoothing * (throughput - self.throughput)
+        self.update()
+
+    def observe_queue(self, depth: int) -> None:
+        """Record the number of chunks waiting in the work queue when a chunk is queued
+
+        Args:
+            depth (int | None): The queue depth, None when the platform cannot report it
+        """
+        if depth is None:
+            return
+        starved = depth == 0
+        if starved != self.starved:
+            self.starved = starved
+            self.update()
+
+    def update(self) -> None:
+        """Recompute the chunk size
+        """
+        if self.throughput is None:
+            return
+        chunk_size = self.throughput * self.target_seconds
+        if self.starved:
+            chunk_size /= 2
+        chunk_size = self.clamp(chunk_size)
+        if chunk_size != self.chunk_size:
+            logger.debug('Chunk size tuned to {} bytes | Throughput per worker: {:.0f} bytes/s'.format(chunk_size, self.throughput))
+        self.chunk_size = chunk_size
+
+    def __call__(self) -> int:
+        return self.chunk_size
@@ -0,0 +1,141 @@
+import numpy as np
+
+from .ReadGraph import ReadGraph, CompressedRows
+from ..Utils.Logging import logger
+
+
+# The most (document, document) pairs expanded at once while the index is built
+DEFAULT_BLOCK_SIZE = 1 << 22
+
+
+def block_bounds(pair_counts: np.ndarray, block_size: int) -> list:
+    """Split consecutive items into blocks holding at most block_size pairs, an item with more pairs is a block of its own
+
+    Args:
+        pair_counts (numpy.ndarray): The number of pairs of each item
+        block_size (int): The most pairs in a block
+
+    Returns:
+        list((int, int)): The start and end of each block
+    """
+    totals = np.cumsum(pair_counts)
+    bounds = []
+    start = 0
+    while start < len(pair_counts):
+        base = totals[start - 1] if start else 0
+        end = max(int(np.searchsorted(totals, base + block_size, side='right')), start + 1)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+class CoReadIndex:
+    """A precomputed sparse document by document matrix, counting the distinct readers each pair of documents has in common.
+    Once built, the also likes counts of a document are one row of the matrix, a visitor is excluded by subtracting one from the documents they read.
+    The matrix is built a block of readers at a time, so at most block_size pairs are expanded at once.
+
+    Args:
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+        top_k (int, optional): Keep only the top_k most co-read documents of each document, when None every document is kept.
+            With top_k the counts after excluding a visitor are exact, but a document just below the top_k may be missing. Defaults to None.
+        block_size (int, optional): The most pairs expanded at once. Defaults to DEFAULT_BLOCK_SIZE.
+    """
+    def __init__(self, read_graph: ReadGraph, top_k: int=None, block_size: int=DEFAULT_BLOCK_SIZE):
+        self.read_graph = read_graph
+        self.top_k = top_k
+        self.neighbours = self.build(block_size)
+        logger.debug('Also likes index: {}'.format(self.neighbours))
+
+    def build(self, block_size: int) -> CompressedRows:
+        """Count the co-readers of every pair of documents
+
+        Args:
+            block_size (int): The most pairs expanded at once
+
+        Returns:
+            CompressedRows: The co-read documents of each document and the number of shared readers
+        """
+        documents_read = self.read_graph.documents_read
+        degrees = documents_read.degrees().astype(np.int64)
+        readers = np.flatnonzero(degrees > 1)
+        pairs, counts = [], []
+        for start, end in block_bounds(degrees[readers] ** 2, block_size):
+            block = readers[start:end]
+            documents, _ = documents_read.gather(block)
+            entry_readers = np.repeat(block, degrees[block])
+            left = np.repeat(documents, degrees[entry_readers])
+            right, _ = documents_read.gather(entry_readers)
+            other = left != right
+            block_pairs, block_counts = np.unique((left[other].astype(np.int64) << 32) | right[other], return_counts=True)
+            pairs.append(block_pairs)
+            counts.append(block_counts)
+
+        n_documents = len(self.read_graph.readers)
+        if not pairs:
+            return CompressedRows.from_packed(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), n_rows=n_documents)
+        if len(pairs) == 1:
+            pairs, counts = pairs[0], counts[0]
+        else:
+            pairs, inverse = np.unique(np.concatenate(pairs), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate(counts), minlength=len(pairs)).astype(np.int64)
+        if self.top_k is not None:
+            pairs, counts = self.keep_top_k(pairs, counts)
+        return CompressedRows.from_packed(pairs, counts, n_rows=n_documents)
+
+    def keep_top_k(self, pairs: np.ndarray, counts: np.ndarray) -> tuple:
+        """Drop all but the top_k largest counts of each document, equal counts are kept in document id order
+
+        Args:
+            pairs (numpy.ndarray): The sorted packed (document id, co-read document id) pairs
+            counts (numpy.ndarray): The count of each pair
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The kept pairs, still sorted, and their counts
+        """
+        rows = pairs >> 32
+        order = np.lexsort((pairs & 0xFFFFFFFF, -counts, rows))
+        row_starts = np.searchsorted(rows, rows[order])
+        keep = np.zeros(len(pairs), dtype=bool)
+        keep[order] = np.arange(len(pairs)) - row_starts < self.top_k
+        return pairs[keep], counts[keep]
+
+    def counts(self, document_id: int, visitor_id: int=None) -> tuple:
+        """Get the documents co-read with a document, and the number of readers they share
+
+        Args:
+            document_id (int): Id of the document
+            visitor_id (int, optional): Id of a visitor to exclude from the readers. Defaults to None.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The co-read document ids in ascending order, and the number of readers of each
+        """
+        documents = self.neighbours.row(document_id)
+        counts = self.neighbours.row_counts(document_id)
+        if visitor_id is None or not self.is_reader(document_id, visitor_id):
+            return documents, counts
+
+        visitor_documents = self.read_graph.documents_read.row(visitor_id)
+        positions = np.searchsorted(documents, visitor_documents)
+        found = positions < len(documents)
+        found[found] = documents[positions[found]] == visitor_documents[found]
+        counts = counts.copy()
+        counts[positions[found]] -= 1
+        shared = counts > 0
+        return documents[shared], counts[shared]
+
+    def is_reader(self, document_id: int, visitor_id: int) -> bool:
+        """Check whether a visitor read a document
+
+        Args:
+            document_id (int): Id of the document
+            visitor_id (int): Id of the visitor
+
+        Returns:
+            bool: True when the visitor read the document
+        """
+        readers = self.read_graph.readers.row(document_id)
+        position = np.searchsorted(readers, visitor_id)
+        return bool(position < len(readers) and readers[position] == visitor_id)
+
+    def __repr__(self):
+        return 'CoReadIndex(documents: {}, pairs: {}, top_k: {})'.format(len(self.neighbours), self.neighbours.n_entries, self.top_k)
@@ -0,0 +1,282 @@
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from .DataCollector import DataCollector, RequiresFields, ChunkFunction, ReaderProfiles, DocumentLocations, BrowserData, merge_dict, resolve_browser_families
+from .Geography import continent_counts
+from .Interning import Interner, IdRelation
+from .ReadGraph import ReadGraph
+from .Sketches import HeavyHitters, DEFAULT_CAPACITY
+
+
+# Name, array type code and numpy dtype of each column, missing values are stored as -1
+COLUMNS = (
+    ('ts', 'q', np.int64),
+    ('visitor', 'i', np.int32),
+    ('document', 'i', np.int32),
+    ('country', 'i', np.int32),
+    ('browser', 'i', np.int32),
+    ('event_type', 'i', np.int32),
+    ('readtime', 'q', np.int64)
+)
+MISSING = -1
+
+
+def remap(column: np.ndarray, mapping: np.ndarray) -> np.ndarray:
+    """Translate the ids in a column with a mapping returned by Interner.merge, keeping missing values
+
+    Args:
+        column (numpy.ndarray): Interned ids, MISSING where there is no value
+        mapping (numpy.ndarray): The new id of each old id
+
+    Returns:
+        numpy.ndarray: The translated ids
+    """
+    result = np.full(len(column), MISSING, dtype=np.int32)
+    present = column != MISSING
+    result[present] = mapping[column[present]]
+    return result
+
+
+class ColumnarCollector(DataCollector):
+    """A DataCollector that appends each event to a compact columnar table while parsing, instead of running a function per statistic.
+    The dictionaries a DataCollector provides are derived from the columns with numpy group-bys by finalise, so ComputeData is used as before.
+    Every event costs roughly 36 bytes until the collector is cleared.
+
+    Args:
+        path (str | list(str), optional): Path to the file being read, or a list of files, directories and glob patterns. Defaults to None.
+        count_doc_locations (bool, optional): Derive document location data? Defaults to True.
+        count_browser (bool, optional): Derive browser data? Defaults to True.
+        count_country (bool, optional): Derive country data? Defaults to True.
+        count_continent (bool, optional): Derive continent data? Defaults to True.
+        build_reader_profiles (bool, optional): Derive reader profiles? Defaults to True.
+        collect_doc_data (bool, optional): Derive document-reader relationships? Defaults to True.
+        count_heavy_hitters (bool, optional): Derive summaries of the most viewed and most read documents and the most common user agents? Defaults to False.
+        heavy_hitters_capacity (int, optional): The most items each heavy hitters summary monitors. Defaults to DEFAULT_CAPACITY.
+    """
+    def __init__(self, path: str=None, count_doc_locations: bool=True, count_browser: bool=True, count_country: bool=True, count_continent: bool=True, build_reader_profiles: bool=True, collect_doc_data: bool=True,
+                 count_heavy_hitters: bool=False, heavy_hitters_capacity: int=DEFAULT_CAPACITY):
+        super().__init__(path, count_heavy_hitters=count_heavy_hitters, heavy_hitters_capacity=heavy_hitters_capacity)
+        self.derive = {
+            'doc_locations': count_doc_locations,
+            'browser_families': count_browser,
+            'countries': count_country,
+            'continents': count_continent,
+            'reader_profiles': build_reader_profiles,
+            'document_readers': collect_doc_data,
+            'heavy_hitters': count_heavy_hitters
+        }
+        self.clear_columns()
+        self.data_fns = [self.collect_chunk]
+
+    def clear_columns(self) -> None:
+        """Empty the columns and the interners of the values they hold
+        """
+        self.columns = OrderedDict((name, array(typecode)) for name, typecode, _ in COLUMNS)
+        self.country_codes = Interner()
+        self.user_agents = Interner()
+        self.event_types = Interner()
+
+    @RequiresFields('ts', 'visitor_uuid', 'subject_doc_id', 'visitor_country', 'visitor_useragent', 'event_type', 'event_readtime')
+    @ChunkFunction()
+    def collect_chunk(self, events: list) -> None:
+        """Append the events of a chunk to the columns, extracting and interning each field for the whole chunk at once
+
+        Args:
+            events (list(dict)): dicts returned by json.load
+        """
+        if not events:
+            return
+        fields = {
+            'visitor': (self.visitors, 'visitor_uuid'),
+            'document': (self.documents, 'subject_doc_id'),
+            'country': (self.country_codes, 'visitor_country'),
+            'browser': (self.user_agents, 'visitor_useragent'),
+            'event_type': (self.event_types, 'event_type')
+        }
+        self.columns['ts'].extend([int(event.get('ts') or 0) for event in events])
+        for name, (interner, field) in fields.items():
+            values = [event.get(field) for event in events]
+            present = np.fromiter((value is not None for value in values), dtype=bool, count=len(values))
+            ids = np.full(len(values), MISSING, dtype=np.int32)
+            ids[present] = interner.intern_many([value for value in values if value is not None])
+            self.columns[name].frombytes(ids.tobytes())
+        readtimes = [event.get('event_readtime') for event in events]
+        self.columns['readtime'].extend([MISSING if readtime is None else int(readtime) for readtime in readtimes])
+
+    def column(self, name: str) -> np.ndarray:
+        """Get a column as a numpy array, without copying it
+
+        Args:
+            name (str): Name of the column, one of COLUMNS
+
+        Returns:
+            numpy.ndarray: The column
+        """
+        dtype = next(dtype for column_name, _, dtype in COLUMNS if column_name == name)
+        return np.frombuffer(self.columns[name], dtype=dtype)
+
+    def __len__(self):
+        return len(self.columns['ts'])
+
+    def event_mask(self, event_type: str) -> np.ndarray:
+        """Select the events of one type
+
+        Args:
+            event_type (str): The event type
+
+        Returns:
+            numpy.ndarray: A boolean mask over the events
+        """
+        event_type_id = self.event_types.get_id(event_type, MISSING - 1)
+        return self.column('event_type') == event_type_id
+
+    def finalise(self, max_workers: int=1) -> None:
+        """Derive the dictionaries of a DataCollector from the columns
+
+        Args:
+            max_workers (int, optional): The max number of processes used to resolve user agents, None for one per cpu. Defaults to 1.
+        """
+        if self.derive['countries'] or self.derive['continents']:
+            country_counts = self.country_counts()
+            if self.derive['countries']:
+                self.countries = country_counts
+            if self.derive['continents']:
+                self.continents = continent_counts(country_counts)
+        if self.derive['browser_families']:
+            self.browser_families = self.derive_browser_families(max_workers=max_workers)
+        if self.derive['reader_profiles']:
+            self.reader_profiles = self.derive_reader_profiles()
+        if self.derive['document_readers']:
+            self.derive_document_readers()
+        if self.derive['doc_locations']:
+            self.doc_locations = self.derive_doc_locations()
+        if self.derive['heavy_hitters']:
+            self.heavy_hitters = self.derive_heavy_hitters()
+        self.version += 1
+
+    def country_counts(self) -> dict:
+        """Count the events from each country
+
+        Returns:
+            dict(str, int): The number of events with each country code
+        """
+        country = self.column('country')
+        counts = np.bincount(country[country != MISSING], minlength=len(self.country_codes))
+        return {code: int(count) for code, count in zip(self.country_codes.values, counts) if count > 0}
+
+    def derive_browser_families(self, max_workers: int=1) -> dict:
+        """Count the events from each browser family, resolving each distinct user agent string once
+
+        Args:
+            max_workers (int, optional): The max number of processes used to resolve user agents, None for one per cpu. Defaults to 1.
+
+        Returns:
+            dict(str, BrowserData): Counts keyed by browser family, the long name is the first user agent seen for the family
+        """
+        browser = self.column('browser')
+        counts = np.bincount(browser[browser != MISSING], minlength=len(self.user_agents))
+        unresolved = [ua_string for ua_string in self.user_agents.values if ua_string not in self.user_agent_families]
+        if unresolved:
+            self.user_agent_families.update(zip(unresolved, resolve_browser_families(unresolved, max_workers=max_workers)))
+        browser_families = {}
+        for ua_string, count in zip(self.user_agents.values, counts):
+            if count == 0:
+                continue
+            family = self.user_agent_families[ua_string]
+            if family in browser_families:
+                browser_families[family] += BrowserData(family, ua_string, int(count))
+            else:
+                browser_families[family] = BrowserData(family, ua_string, int(count))
+        return browser_families
+
+    def derive_reader_profiles(self) -> ReaderProfiles:
+        """Total the reading time and reads of each visitor from their pagereadtime events
+
+        Returns:
+            ReaderProfiles: Reading data keyed by visitor uuid, in visitor id order
+        """
+        visitor = self.column('visitor')
+        readtime = self.column('readtime')
+        mask = self.event_mask('pagereadtime') & (visitor != MISSING) & (readtime != MISSING)
+        reads = np.bincount(visitor[mask], minlength=len(self.visitors))
+        read_times = np.bincount(visitor[mask], weights=readtime[mask], minlength=len(self.visitors))
+        visitor_ids = np.flatnonzero(reads)
+        reader_profiles = ReaderProfiles(self.visitors)
+        reader_profiles.add_many(visitor_ids, read_times[visitor_ids].astype(np.int64), reads[visitor_ids])
+        return reader_profiles
+
+    def derive_document_readers(self) -> None:
+        """Build document_readers, visitor_documents and the read graph from the read events
+        """
+        visitor = self.column('visitor')
+        document = self.column('document')
+        mask = self.event_mask('read') & (visitor != MISSING) & (document != MISSING)
+        self.document_readers = IdRelation(self.documents, self.visitors)
+        self.document_readers.add_many(document[mask], visitor[mask])
+        self.visitor_documents = IdRelation(self.visitors, self.documents)
+        self.visitor_documents.add_many(visitor[mask], document[mask])
+        self.read_graph = ReadGraph.from_edges(self.documents, self.visitors, document[mask], visitor[mask])
+
+    def derive_doc_locations(self) -> DocumentLocations:
+        """Count the countries of the events for each document
+
+        Returns:
+            DocumentLocations: Sparse counts by document and country
+        """
+        country = self.column('country')
+        document = self.column('document')
+        mask = (country != MISSING) & (document != MISSING)
+        doc_locations = DocumentLocations(self.documents, self.country_codes)
+        doc_locations.add_many(document[mask], country[mask])
+        return doc_locations
+
+    def derive_heavy_hitters(self) -> dict:
+        """Summarise the most viewed and most read documents and the most common user agents from their exact counts
+
+        Returns:
+            dict(str, HeavyHitters): The summaries keyed by name, one of HEAVY_HITTERS
+        """
+        document = self.column('document')
+        browser = self.column('browser')
+        columns = {
+            'document_views': (document, self.documents),
+            'document_reads': (document[self.event_mask('read')], self.documents),
+            'user_agents': (browser, self.user_agents)
+        }
+        heavy_hitters = {}
+        for name, (ids, interner) in columns.items():
+            counts = np.bincount(ids[ids != MISSING], minlength=len(interner))
+            present = np.flatnonzero(counts)
+            heavy_hitters[name] = HeavyHitters(self.heavy_hitters[name].capacity)
+            heavy_hitters[name].add_many(interner.lookup_many(present.tolist()), counts[present].tolist())
+        return heavy_hitters
+
+    def merge(self, other) -> None:
+        """Append the columns of other to the columns of self
+
+        Args:
+            other (ColumnarCollector): other must be a ColumnarCollector instance
+        """
+        maps = {
+            'visitor': self.visitors.merge(other.visitors),
+            'document': self.documents.merge(other.documents),
+            'country': self.country_codes.merge(other.country_codes),
+            'browser': self.user_agents.merge(other.user_agents),
+            'event_type': self.event_types.merge(other.event_types)
+        }
+        for name, _, _ in COLUMNS:
+            column = other.column(name)
+            if name in maps:
+                column = remap(column, maps[name])
+            self.columns[name].frombytes(column.tobytes())
+        self.read_graph = None
+        self.parse_stats = merge_dict(self.parse_stats, other.parse_stats)
+        self.version += 1
+
+    def clear(self) -> None:
+        """Clear the columns and the derived data
+        """
+        super().clear()
+        self.clear_columns()
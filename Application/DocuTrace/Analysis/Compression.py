@@ -0,0 +1,279 @@
+import functools
+import gzip
+import io
+import lzma
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+from DocuTrace.Utils.Logging import logger
+from DocuTrace.Analysis.ChunkSize import DEFAULT_CHUNK_SIZE
+
+
+compression_suffixes = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.xz': 'xz',
+    '.lzma': 'xz',
+    '.zst': 'zstd',
+    '.zstd': 'zstd'
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+GZIP_FEXTRA = 4
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A5E
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+
+
+FrameRange = namedtuple('FrameRange', ['path', 'codec', 'start', 'stop'])
+"""A run of independently compressed frames, handed to worker processes to decompress and parse.
+
+Args:
+    path (str): Path to the compressed file
+    codec (str): The compression format, one of the values of compression_suffixes
+    start (int): Index of the first frame in the frame index
+    stop (int): Index after the last frame in the frame index
+"""
+
+
+def compression_of(path: str) -> str:
+    """Identify the compression format of a file from its extension
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        str | None: The compression format, None for uncompressed files
+    """
+    _, extension = os.path.splitext(path.lower())
+    return compression_suffixes.get(extension, None)
+
+
+def import_zstandard():
+    """Import the optional zstandard module
+
+    Raises:
+        ImportError: When zstandard is not installed
+
+    Returns:
+        module: The zstandard module
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('The zstandard package must be installed to read .zst files')
+    return zstandard
+
+
+def open_compressed(path: str, codec: str):
+    """Open a compressed file for streaming decompression
+
+    Args:
+        path (str): Path to the file
+        codec (str): The compression format
+
+    Returns:
+        io.BufferedIOBase: A binary file object yielding decompressed data
+    """
+    if codec == 'gzip':
+        return gzip.open(path, 'rb')
+    if codec == 'xz':
+        return lzma.open(path, 'rb')
+    if codec == 'zstd':
+        zstandard = import_zstandard()
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True))
+    raise ValueError('Unsupported compression format: {}'.format(codec))
+
+
+def gzip_block_size(header: bytes, f) -> int:
+    """Read the BGZF block size from a gzip member header
+
+    Args:
+        header (bytes): The first 12 bytes of the member
+        f (io.BufferedReader): The file, positioned after the header
+
+    Returns:
+        int | None: The compressed size of the member, None when the member has no BGZF size field
+    """
+    if len(header) < 12 or header[:2] != GZIP_MAGIC or not header[3] & GZIP_FEXTRA:
+        return None
+    extra_length = struct.unpack('<H', header[10:12])[0]
+    extra = f.read(extra_length)
+    position = 0
+    while position + 4 <= len(extra):
+        subfield_length = struct.unpack('<H', extra[position + 2:position + 4])[0]
+        if extra[position:position + 2] == b'BC' and subfield_length == 2:
+            return struct.unpack('<H', extra[position + 4:position + 6])[0] + 1
+        position += 4 + subfield_length
+    return None
+
+
+def gzip_frames(path: str) -> list:
+    """Find the members of a blocked gzip (BGZF) file from their headers, without decompressing anything
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        list((int, int)) | None: (offset, size) of each member, None when the file is not blocked gzip
+    """
+    frames = []
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset < size:
+            f.seek(offset)
+            block_size = gzip_block_size(f.read(12), f)
+            if block_size is None:
+                return None
+            frames.append((offset, block_size))
+            offset += block_size
+    return frames
+
+
+def zstd_frames(path: str) -> list:
+    """Read the frames of a seekable zstd file from its seek table
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        list((int, int)) | None: (offset, size) of each frame, None when the file has no seek table
+    """
+    size = os.path.getsize(path)
+    if size < 17:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(size - 9)
+        n_frames, descriptor, magic = struct.unpack('<IBI', f.read(9))
+        if magic != ZSTD_SEEKABLE_MAGIC:
+            return None
+        entry_size = 12 if descriptor & 0x80 else 8
+        table_size = n_frames * entry_size
+        f.seek(size - 9 - table_size - 8)
+        skippable_magic, _ = struct.unpack('<II', f.read(8))
+        if skippable_magic != ZSTD_SKIPPABLE_MAGIC:
+            return None
+        table = f.read(table_size)
+
+    frames = []
+    offset = 0
+    for i in range(n_frames):
+        compressed_size = struct.unpack('<I', table[i * entry_size:i * entry_size + 4])[0]
+        frames.append((offset, compressed_size))
+        offset += compressed_size
+    return frames
+
+
+@functools.lru_cache(maxsize=16)
+def frame_index(path: str, codec: str) -> list:
+    """Get the independently decompressible frames of a file. Cached so worker processes forked after the parent builds the index reuse it.
+
+    Args:
+        path (str): Path to the file
+        codec (str): The compression format
+
+    Returns:
+        list((int, int)) | None: (offset, size) of each frame, None when the file can only be decompressed as one stream
+    """
+    if codec == 'gzip':
+        return gzip_frames(path)
+    if codec == 'zstd':
+        return zstd_frames(path)
+    return None
+
+
+def decompress_frame(data: bytes, codec: str) -> bytes:
+    """Decompress one frame
+
+    Args:
+        data (bytes): The compressed frame
+        codec (str): The compression format
+
+    Returns:
+        bytes: The decompressed data
+    """
+    if codec == 'gzip':
+        return zlib.decompress(data, 31)
+    if codec == 'zstd':
+        zstandard = import_zstandard()
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError('Unsupported compression format: {}'.format(codec))
+
+
+def partition_frames(path: str, codec: str, chunk_size: int=DEFAULT_CHUNK_SIZE) -> list:
+    """Group the frames of a compressed file into ranges of roughly chunk_size compressed bytes
+
+    Args:
+        path (str): Path to the file
+        codec (str): The compression format
+        chunk_size (int, optional): The approximate number of compressed bytes in each range. Defaults to DEFAULT_CHUNK_SIZE.
+
+    Returns:
+        list(FrameRange) | None: Ranges covering every frame, None when the file cannot be decompressed in parallel
+    """
+    frames = frame_index(path, codec)
+    if frames is None:
+        return None
+
+    ranges = []
+    start = 0
+    compressed_bytes = 0
+    for i, (_, size) in enumerate(frames):
+        compressed_bytes += size
+        if compressed_bytes >= chunk_size:
+            ranges.append(FrameRange(path, codec, start, i + 1))
+            start = i + 1
+            compressed_bytes = 0
+    if start < len(frames):
+        ranges.append(FrameRange(path, codec, start, len(frames)))
+    return ranges
+
+
+def read_frame_range(frame_range: FrameRange) -> list:
+    """Decompress a range of frames and split it into lines.
+    A range owns the lines that start inside it, so a partial first line is left to the previous range and the last line is completed from the following frames.
+
+    Args:
+        frame_range (FrameRange): The range to read, produced by partition_frames
+
+    Returns:
+        list(bytes): A list of lines, without line endings
+    """
+    frames = frame_index(frame_range.path, frame_range.codec)
+
+    def read_frame(f, i):
+        offset, size = frames[i]
+        f.seek(offset)
+        return decompress_frame(f.read(size), frame_range.codec)
+
+    with open(frame_range.path, 'rb') as f:
+        data = b''.join(read_frame(f, i) for i in range(frame_range.start, frame_range.stop))
+
+        previous = b''
+        for i in range(frame_range.start - 1, -1, -1):
+            previous = read_frame(f, i)
+            if previous:
+                break
+        if previous and not previous.endswith(b'\n'):
+            newline = data.find(b'\n')
+            data = b'' if newline == -1 else data[newline + 1:]
+
+        following = frame_range.stop
+        tail = []
+        if data and not data.endswith(b'\n'):
+            while following < len(frames):
+                frame = read_frame(f, following)
+                newline = frame.find(b'\n')
+                if newline != -1:
+                    tail.append(frame[:newline])
+                    break
+                tail.append(frame)
+                following += 1
+
+    lines = (data + b''.join(tail)).split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    logger.debug('Decompressed frames {} to {} of {}'.format(frame_range.start, frame_range.stop, frame_range.path))
+    return lines
@@ -1,11 +1,23 @@
+import heapq
+import threading
 from typing import OrderedDict
 import numpy as np
-import pycountry
-import pycountry_convert
 from .Plots import Charts
+from .Interning import id_relations
+from .DataCollector import ReaderProfiles, DocumentLocationSketch
+from .Sketches import Estimate
+from .ReadGraph import ReadGraph
+from .CoReadIndex import CoReadIndex
+from .BatchAlsoLikes import batch_also_likes
+from .Geography import continent_name, country_name
+from DocuTrace.Utils.Cache import ResultCache, DEFAULT_RESULT_CACHE_SIZE
 from DocuTrace.Utils.Exceptions import InvalidDocUUIDError
 
 
+# The dicts sort orders by value, assigning one of them drops the sorted views memoised for it
+SORTED_FIELDS = ('countries', 'continents', 'browser_families', 'reader_profiles')
+
+
 def sort_dict_by_value(collection: dict, reverse: bool=True) -> list:
     """Sort a dictionary by the values inside, returns a list of keys
 
@@ -29,58 +41,121 @@ def top_n_sorted(collection: dict, n: int=10) -> list:
     Returns:
         list(str): List of strings sorted by the corresponding values from the 'collection' parameter
     """
-    return sort_dict_by_value(collection, reverse=True)[:n]
+    return [k for k, _ in heapq.nlargest(n, collection.items(), key=lambda item: item[1])]
 
 
-def country_name(code: str) -> str:
-    """Get the country name from its alpha2 code
+def top_n_items(collection: dict, n: int, reverse: bool=True) -> dict:
+    """Select the n items with the largest values without sorting the whole dict, the same items in the same order as sorting it then taking the first n
 
     Args:
-        code (str): Country code
+        collection (dict): A dict of comparable values
+        n (int): Number of items to select
+        reverse (bool, optional): Select the largest values, False for the smallest. Defaults to True.
 
     Returns:
-        str: Country name
+        dict: The selected items in sorted order
     """
-    country = pycountry.countries.get(alpha_2=code)
-    if country is None:
-        return 'Unknown'
-    else:
-        return country.name
-
-
-def continent_name(alpha2_country:str) -> str:
-    """Get the contenent name from the country
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    return dict(select(n, collection.items(), key=lambda item: item[1]))
 
-    Args:
-        alpha2_country (str): Country code
 
-    Returns:
-        str: Continent name
-    """          
-    try:
-        c = pycountry_convert.country_alpha2_to_continent_code(alpha2_country)
-        cont = pycountry_convert.convert_continent_code_to_continent_name(c)
-    except KeyError:
-        return 'Unknown'
-    return cont
-    
 class ComputeData:
     """Class to manage sorting and displaying data
 
     Args:
         data_collector (DataCollector): Instance of a DataCollector class, populated with dictionaries of data.
         fig_size (tuple, optional): figure dimensions. Defaults to (8, 6).
+        also_likes_index (bool, optional): Precompute the co-readers of every pair of documents, so also likes queries read one row. Defaults to False.
+        index_top_k (int, optional): Keep only the top k co-read documents of each document in the index, every document when None. Defaults to None.
+        cache_size (int, optional): The most also likes results kept, the least recently used are dropped first. Defaults to DEFAULT_RESULT_CACHE_SIZE.
     """
-    def __init__(self, data_collector, fig_size=(8, 6)):
+    def __init__(self, data_collector, fig_size=(8, 6), also_likes_index: bool=False, index_top_k: int=None, cache_size: int=DEFAULT_RESULT_CACHE_SIZE):
+        self.also_likes_index = also_likes_index
+        self.index_top_k = index_top_k
+        self.results = ResultCache(cache_size)
+        self.views = {}
+        self.sorted_order = {}
+        self.snapshot_lock = threading.Lock()
+        self.pending_snapshot = None
+        self.update(data_collector)
+        self.histo_config = None
+        self.fig_size = fig_size
+        publisher = getattr(data_collector, 'publisher', None)
+        if publisher is not None:
+            publisher.subscribe(self.receive_snapshot)
+
+    def receive_snapshot(self, data_collector) -> None:
+        """Keep a snapshot of a followed file until the next query, called on the thread following the file.
+        The data is only replaced by refresh on the thread making queries, so a query never mixes two snapshots.
+
+        Args:
+            data_collector (DataCollector): The snapshot
+        """
+        with self.snapshot_lock:
+            self.pending_snapshot = data_collector
+
+    def update(self, data_collector) -> None:
+        """Replace the data with the contents of a data collector
+
+        Args:
+            data_collector (DataCollector): Instance of a DataCollector class, populated with dictionaries of data.
+        """
+        self.data_collector = data_collector
+        self.data_version = getattr(data_collector, 'version', None)
+        self.results.invalidate()
         self.doc_locations = data_collector.doc_locations
         self.countries = data_collector.countries
         self.continents = data_collector.continents
         self.browser_families = data_collector.browser_families
         self.reader_profiles = data_collector.reader_profiles
-        self.document_readers = data_collector.document_readers
-        self.visitor_documents = data_collector.visitor_documents
-        self.histo_config = None
-        self.fig_size = fig_size
+        self.heavy_hitters = getattr(data_collector, 'heavy_hitters', {})
+        self.distinct_readers = getattr(data_collector, 'distinct_readers', None)
+        self.document_readers, self.visitor_documents = id_relations(data_collector.document_readers, data_collector.visitor_documents)
+        self.read_graph = getattr(data_collector, 'read_graph', None)
+        if self.read_graph is None:
+            self.read_graph = ReadGraph.from_relation(self.document_readers)
+        self.documents = self.read_graph.documents
+        self.visitors = self.read_graph.visitors
+        self.co_read_index = None
+        if self.also_likes_index:
+            self.build_also_likes_index(self.index_top_k)
+
+
+    def build_also_likes_index(self, top_k: int=None) -> CoReadIndex:
+        """Precompute the co-readers of every pair of documents, later also likes queries that count distinct readers read one row of it.
+        The index is rebuilt whenever new data is received.
+
+        Args:
+            top_k (int, optional): Keep only the top k co-read documents of each document, every document when None. Defaults to None.
+
+        Returns:
+            CoReadIndex: The index
+        """
+        self.also_likes_index = True
+        self.index_top_k = top_k
+        self.co_read_index = CoReadIndex(self.read_graph, top_k=top_k)
+        self.results.invalidate()
+        return self.co_read_index
+
+
+    def refresh(self) -> None:
+        """Take the latest snapshot received, or the data again when the data collector has changed since it was last taken, dropping the cached results
+        """
+        with self.snapshot_lock:
+            snapshot, self.pending_snapshot = self.pending_snapshot, None
+        if snapshot is not None:
+            self.update(snapshot)
+        elif getattr(self.data_collector, 'version', None) != self.data_version:
+            self.update(self.data_collector)
+
+
+    def cache_info(self):
+        """Get the statistics of the also likes result cache
+
+        Returns:
+            CacheInfo: The hits, misses, maximum size and current size
+        """
+        return self.results.info()
 
 
     def also_likes_top_10(self, document: str, visitor: str=None) -> list:
@@ -98,6 +173,7 @@ class ComputeData:
 
     def also_likes(self, document: str, visitor: str=None, sort_fn=sort_dict_by_value, **kwargs) -> list:
         """For a given document identify which other documents have been read by a reader of this document, when visitor is given exclude them from the resulting list.
+        Results are cached by their arguments until the data collector changes.
 
         Args:
             document (str): Document id
@@ -110,23 +186,39 @@ class ComputeData:
         if document is None or '':
             raise InvalidDocUUIDError('Document ID cannot be None')
 
-        also_likes_dict = self.find_also_likes_counts(document, visitor=visitor)
-        return sort_fn(also_likes_dict,  **kwargs)
+        self.refresh()
+        self.require_readers()
+        compute = lambda: sort_fn(self.find_also_likes_counts(document, visitor=visitor), **kwargs)
+        try:
+            key = (document, visitor, sort_fn, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return compute()
+        return list(self.results.get(key, compute))
 
 
-    def find_also_likes_counts(self, document: str, visitor:str =None) -> dict:
+    def find_also_likes_counts(self, document: str, visitor:str =None, count_reads: bool=False) -> dict:
         """Computes also likes based on a document id, and (optionally) a visitor id
 
         Args:
             document (str): Document id
             visitor (str, optional): visitor uuid. Defaults to None.
+            count_reads (bool, optional): Count every read of a document by the readers, instead of the number of distinct readers. Defaults to False.
 
         Returns:
             dict(str, int): A dict, where each key is a document id and each key is a count
         """
-        relevant_docs, _ = self.find_relevant_docs(document, visitor)
-        keys, counts = np.unique(relevant_docs, return_counts=True)
-        return dict(zip(keys, counts))
+        if self.co_read_index is not None and not count_reads:
+            doc_ids, counts = self.co_read_index.counts(self.find_document_id(document), self.visitors.get_id(visitor))
+            return dict(sorted(zip(self.documents.lookup_many(doc_ids.tolist()), counts.tolist())))
+
+        relevant_ids, reads, _ = self.find_relevant_edges(document, visitor)
+        if count_reads:
+            counts = np.bincount(relevant_ids, weights=reads).astype(np.int64)
+        else:
+            counts = np.bincount(relevant_ids)
+        doc_ids = np.flatnonzero(counts)
+        return dict(sorted(zip(self.documents.lookup_many(doc_ids), counts[doc_ids])))
 
 
     def find_relevant_docs(self, document: str, visitor: str=None) -> tuple:
@@ -140,27 +232,112 @@ class ComputeData:
             KeyError: Raised when document is not found
 
         Returns:
-            [(numpy.array(str), numpy.array(str))]: [description]
+            [(numpy.array(str), numpy.array(str))]: The documents read by each reader, and the readers
+        """
+        relevant_ids, reader_ids = self.find_relevant_ids(document, visitor)
+        return np.array(self.documents.lookup_many(relevant_ids)), np.array(self.visitors.lookup_many(reader_ids))
+
+
+    def find_relevant_ids(self, document: str, visitor: str=None) -> tuple:
+        """Finds the interned ids of all documents relevant to the given document, and all readers except the given visitor
+
+        Args:
+            document (str): Document id
+            visitor (str, optional): visitor uuid. Defaults to None.
+
+        Raises:
+            KeyError: Raised when document is not found
+
+        Returns:
+            [(numpy.array(int), numpy.array(int))]: Ids of the documents read by each reader, once per reader, and ids of the readers
+        """
+        relevant_ids, _, readers = self.find_relevant_edges(document, visitor)
+        return relevant_ids, readers
+
+
+    def find_relevant_edges(self, document: str, visitor: str=None) -> tuple:
+        """Finds the edges of the read graph from the readers of the given document, except the given visitor, to the other documents they read
+
+        Args:
+            document (str): Document id
+            visitor (str, optional): visitor uuid. Defaults to None.
+
+        Raises:
+            KeyError: Raised when document is not found
+
+        Returns:
+            [(numpy.array(int), numpy.array(int), numpy.array(int))]: Ids of the documents read by each reader, the number of times each was read, and ids of the readers
         """
-        # key error raised if document not found
-        readers = np.array(self.document_readers.get(document))
+        graph = self.read_graph
+        document_id = self.find_document_id(document)
+        readers = graph.readers.row(document_id)
 
         # Visitor should be excluded from result
-        if visitor in readers:
-            readers = readers[readers != visitor]
+        visitor_id = self.visitors.get_id(visitor)
+        if visitor_id is not None:
+            readers = readers[readers != visitor_id]
+
+        relevant_ids, reads = graph.documents_read.gather(readers)
+        if reads is None:
+            reads = np.ones(len(relevant_ids), dtype=np.int32)
+        other = relevant_ids != document_id
+        return relevant_ids[other], reads[other], readers
+
+
+    def batch_also_likes(self, documents='all', visitors: dict=None, n: int=10, max_workers: int=1):
+        """Compute the also likes of many documents in one vectorised pass a block at a time, see BatchAlsoLikes.batch_also_likes
 
-        docs = []
-        for uuid in readers:
-            docs += [*self.visitor_documents.get(uuid, '')]
+        Args:
+            documents (list(str) | str, optional): The document ids, or 'all' for every document with a reader. Defaults to 'all'.
+            visitors (dict(str, str), optional): A visitor uuid to exclude from the readers of each document. Defaults to None.
+            n (int, optional): The number of also likes kept for each document, every one when None. Defaults to 10.
+            max_workers (int, optional): The max number of processes, None for one per cpu. Defaults to 1.
+
+        Returns:
+            generator: Yields each document, the excluded visitor, and its also liked documents with the number of shared readers
+        """
+        self.require_readers()
+        return batch_also_likes(self.read_graph, documents=documents, visitors=visitors, n=n, max_workers=max_workers)
 
-        relevant_docs = np.array(docs)
-        relevant_docs = relevant_docs[relevant_docs != '']
-        relevant_docs = relevant_docs[relevant_docs != document]
-        return relevant_docs, readers
+
+    def require_readers(self) -> None:
+        """Check the readers of each document are kept, also likes cannot be computed from the estimates of sketch mode
+
+        Raises:
+            ValueError: When the data collector is in sketch mode
+        """
+        if self.distinct_readers is not None:
+            raise ValueError('Also likes need the readers of each document, sketch mode only estimates how many there are')
+
+
+    def find_document_id(self, document: str) -> int:
+        """Get the interned id of a document with at least one reader
+
+        Args:
+            document (str): Document id
+
+        Raises:
+            KeyError: Raised when document is not found
+
+        Returns:
+            int: The id of the document
+        """
+        document_id = self.documents.get_id(document)
+        if document_id is None or len(self.read_graph.readers.row(document_id)) == 0:
+            raise KeyError(document)
+        return document_id
+
+
+    def __setattr__(self, name, value):
+        if name in SORTED_FIELDS and 'views' in self.__dict__:
+            self.sorted_order.pop(name, None)
+            for key in [key for key in self.views if key[0] == name]:
+                del self.views[key]
+        super().__setattr__(name, value)
 
 
     def sort(self, reverse: bool=True, sort_countries: bool=True, sort_continents: bool=True, sort_browsers: bool=True, sort_reader_profiles: bool=True) -> None:
-        """Sort each dict by its values
+        """Sort each dict by its values, a dict already sorted in this order since it was last assigned is not sorted again
 
         Args:
             reverse (bool, optional): Reverse the sorting order, (reverse=True is descending)
@@ -169,21 +346,73 @@ class ComputeData:
             sort_browsers (bool, optional): Sort browser data in self? Defaults to True.
             sort_reader_profiles (bool, optional): Sort reading data in self? Defaults to True.
         """
-        if sort_countries:
-            self.countries = {k: v for k, v in sorted(
-                self.countries.items(), key=lambda item: item[1], reverse=reverse)}
+        selected = (sort_countries, sort_continents, sort_browsers, sort_reader_profiles)
+        for name, sort_field in zip(SORTED_FIELDS, selected):
+            if sort_field:
+                self.sort_field(name, reverse)
+
+
+    def sort_field(self, name: str, reverse: bool=True) -> None:
+        """Sort one dict by its values, unless it is already sorted in this order since it was last assigned
+
+        Args:
+            name (str): The name of the dict, one of SORTED_FIELDS
+            reverse (bool, optional): Reverse the sorting order, (reverse=True is descending)
+        """
+        if self.sorted_order.get(name) == reverse:
+            return
+        collection = getattr(self, name)
+        if isinstance(collection, ReaderProfiles):
+            setattr(self, name, collection.sorted(reverse))
+        else:
+            ordered = sorted(collection.items(), key=lambda item: item[1], reverse=reverse)
+            setattr(self, name, OrderedDict(ordered) if name == 'reader_profiles' else dict(ordered))
+        self.sorted_order[name] = reverse
 
-        if sort_continents:
-            self.continents = {k: v for k, v in sorted(
-                self.continents.items(), key=lambda item: item[1], reverse=reverse)}
 
-        if sort_browsers:
-            self.browser_families = {k: v for k, v in sorted(
-                self.browser_families.items(), key=lambda item: item[1], reverse=reverse)}
+    def top(self, name: str, n: int, reverse: bool=True) -> dict:
+        """Get the n items of a dict with the largest values, memoised until the dict is assigned again
+
+        Args:
+            name (str): The name of the dict, one of SORTED_FIELDS
+            n (int): Number of items
+            reverse (bool, optional): Select the largest values, False for the smallest. Defaults to True.
+
+        Returns:
+            dict: The items in sorted order
+        """
+        key = (name, 'top', n, reverse)
+        if key not in self.views:
+            collection = getattr(self, name)
+            if isinstance(collection, ReaderProfiles):
+                self.views[key] = collection.top(n, reverse=reverse)
+            elif self.sorted_order.get(name) == reverse:
+                self.views[key] = dict(list(collection.items())[:n])
+            else:
+                self.views[key] = top_n_items(collection, n, reverse=reverse)
+        return self.views[key]
 
-        if sort_reader_profiles:
-            self.reader_profiles = OrderedDict([(k, v) for k, v in sorted(
-                self.reader_profiles.items(), key=lambda item: item[1], reverse=reverse)])
+
+    def counts_view(self, name: str, sorted: bool, reverse: bool, n: int=None) -> dict:
+        """Get a dict of counts for a figure, sorting only the dict being plotted
+
+        Args:
+            name (str): The name of the dict, one of SORTED_FIELDS
+            sorted (bool): Order the counts by value
+            reverse (bool): Sort asc or desc, True is desc
+            n (int, optional): Select how many counts to show, every count when None. Defaults to None.
+
+        Returns:
+            dict: The counts
+        """
+        if sorted and n is not None:
+            return self.top(name, n, reverse=reverse)
+        if sorted:
+            self.sort_field(name, reverse)
+        collection = getattr(self, name)
+        if n is not None:
+            return dict(list(collection.items())[:n])
+        return collection
 
 
     def top_reads(self, top_n=10, to_print=True) -> list:
@@ -196,37 +425,85 @@ class ComputeData:
         Returns:
             list(ReadingData): A list of top readers
         """
-        self.sort(sort_countries=False, sort_continents=False, sort_browsers=False)
-        top_readers = dict(list(self.reader_profiles.items())[:top_n])
+        self.refresh()
+        top_readers = self.top('reader_profiles', top_n)
         if to_print:
             [print(reader) for reader in top_readers]
         return top_readers
 
 
+    def top_documents(self, top_n: int=10, summary: str='document_views', to_print: bool=True) -> list:
+        """Find the most frequent items of a heavy hitters summary, without an exact count of every item
+
+        Args:
+            top_n (int, optional): How many items to find. Defaults to 10.
+            summary (str, optional): The summary, one of HEAVY_HITTERS. Defaults to 'document_views'.
+            to_print (bool, optional): Print the result? Defaults to True.
+
+        Raises:
+            KeyError: When the summary was not counted, the data collector needs count_heavy_hitters
+
+        Returns:
+            list(HeavyHitter): The items and their counts, each true count is at most error more than its count
+        """
+        self.refresh()
+        if summary not in self.heavy_hitters:
+            raise KeyError('Heavy hitters were not counted: {}'.format(summary))
+        top_items = self.heavy_hitters[summary].top(top_n)
+        if to_print:
+            for i, hitter in enumerate(top_items):
+                print('{:{width}} | {} | {} (up to {} more)'.format(i, hitter.item, hitter.count, hitter.error, width=4))
+        return top_items
+
+
+    def count_readers(self, doc_uuid: str) -> Estimate:
+        """Count the distinct readers of a document, estimated from its HyperLogLog when the data collector is in sketch mode
+
+        Args:
+            doc_uuid (str): The document id
+
+        Returns:
+            Estimate: The readers and the standard error of the count, zero when counted exactly
+        """
+        self.refresh()
+        if self.distinct_readers is not None:
+            return self.distinct_readers.estimate(doc_uuid)
+        document_id = self.documents.get_id(doc_uuid)
+        if document_id is None or document_id >= len(self.read_graph.readers):
+            return Estimate(0, 0)
+        return Estimate(int(self.read_graph.readers.degrees(document_id)), 0)
+
+
     def long_browsers(self) -> dict:
-        """Make dict with long browser names as keys
+        """Make dict with long browser names as keys, memoised until browser_families is assigned again
 
         Returns:
             dict: dict with long browser names as keys
         """
         from DocuTrace.Analysis.DataCollector import merge_dict
-        long_browser_names = {}
-        for browser in self.browser_families.values():
-            long_browser_names = merge_dict(long_browser_names, browser.as_long_name())
-        return long_browser_names
+        key = ('browser_families', 'long')
+        if key not in self.views:
+            long_browser_names = {}
+            for browser in self.browser_families.values():
+                long_browser_names = merge_dict(long_browser_names, browser.as_long_name())
+            self.views[key] = long_browser_names
+        return self.views[key]
 
 
     def short_browsers(self) -> dict:
-        """Make dict with short browser names as keys
+        """Make dict with short browser names as keys, memoised until browser_families is assigned again
 
         Returns:
             dict: dict with short browser names as keys
         """
         from DocuTrace.Analysis.DataCollector import merge_dict
-        short_browser_names = {}
-        for browser in self.browser_families.values():
-            short_browser_names = merge_dict(short_browser_names, browser.as_short_name())
-        return short_browser_names
+        key = ('browser_families', 'short')
+        if key not in self.views:
+            short_browser_names = {}
+            for browser in self.browser_families.values():
+                short_browser_names = merge_dict(short_browser_names, browser.as_short_name())
+            self.views[key] = short_browser_names
+        return self.views[key]
 
 
     def histogram(self):
@@ -264,36 +541,48 @@ class ComputeData:
         Returns:
             tuple: Tuple of figure config data to produce a histogram
         """
-        if sorted:
-            self.sort(reverse)
+        self.refresh()
 
         #! Raises KeyError
         doc_data = self.doc_locations.get(doc_uuid, None)
         if doc_data is None:
             raise InvalidDocUUIDError('Document ID cannot be None')
 
+        # Only the rows of this document are ordered, they are already ordered from the largest count
         continents = doc_data.continents
         countries = doc_data.countries
+        if sorted and not reverse:
+            continents = top_n_items(continents, len(continents), reverse=False)
+            countries = top_n_items(countries, len(countries), reverse=False)
 
         if n_continents is not None:
-            continents = dict(list(doc_data.continents.items())[:n_continents])
+            continents = dict(list(continents.items())[:n_continents])
 
         if n_countries is not None:
-            countries = dict(list(doc_data.countries.items())[:n_countries])
+            countries = dict(list(countries.items())[:n_countries])
 
         data = []
         titles = []
         x_labels = []
         y_labels = []
+        # Sketched counts are estimates, the title says how far over the true counts they may be and estimates the distinct readers
+        estimated = ''
+        if isinstance(self.doc_locations, DocumentLocationSketch):
+            estimated = ' (estimates, at most {} over with {:.0%} confidence'.format(self.doc_locations.error_bound, self.doc_locations.confidence)
+            if self.distinct_readers is not None:
+                readers = self.count_readers(doc_uuid)
+                estimated += ', {} ± {} distinct readers'.format(readers.count, readers.error)
+            estimated += ')'
+
         if show_continents:
             data.append(continents)
-            titles.append('Document views from each continent')
+            titles.append('Document views from each continent' + estimated)
             x_labels.append('')
             y_labels.append('Continent')
 
         if show_countries:
             data.append(countries)
-            titles.append('Document views from each country')
+            titles.append('Document views from each country' + estimated)
             x_labels.append('')
             y_labels.append('Country')
         
@@ -318,32 +607,26 @@ class ComputeData:
         Returns:
             tuple: Tuple of figure config data to produce a histogram
         """
-        if sorted:
-            self.sort(reverse)
-
-        continents = self.continents
-        countries = self.countries
-        if n_continents is not None:
-            continents = dict(list(self.continents.items())[:n_continents])
-        if n_countries is not None:
-            countries = dict(list(self.countries.items())[:n_countries])
+        self.refresh()
         data = []
         titles = []
         x_labels = []
         y_labels = []
         if show_continents:
-            data.append(continents)
+            data.append(self.counts_view('continents', sorted, reverse, n_continents))
             titles.append('Views from each continent')
             x_labels.append('')
             y_labels.append('Continent')
 
         if show_countries:
-            data.append(countries)
+            data.append(self.counts_view('countries', sorted, reverse, n_countries))
             titles.append('Views from each country')
             x_labels.append('')
             y_labels.append('Country')
 
         if show_browsers:
+            if sorted:
+                self.sort_field('browser_families', reverse)
             if clean_browser_names:
                 browsers = self.short_browsers()
             else:
@@ -1,11 +1,25 @@
 from functools import total_ordering
 from user_agents import parse as ua_parse
-from collections import OrderedDict
+from array import array
+from collections import OrderedDict, Counter
+from collections.abc import Mapping
+from multiprocessing import Pool, cpu_count
 import functools
+import numpy as np
 from .FileRead import ParseFile
+from .Checkpoint import Checkpoint
+from .ChunkSize import DEFAULT_CHUNK_SIZE
+from .Interning import Interner, IdRelation
+from .ReadGraph import ReadGraph
+from .Sketches import HeavyHitters, CountMinSketch, DistinctReaders, hash_strings, mix, DEFAULT_CAPACITY, DEFAULT_PRECISION, DEFAULT_WIDTH, DEFAULT_DEPTH
 from ..Utils.Logging import logger, debug
+from ..Utils.Cache import cached_many
 
-from .ComputeData import continent_name
+from .Geography import continent_name, continent_counts
+
+
+# The heavy hitters summaries kept when count_heavy_hitters is set, counting every event of a document, its read events, and every event of a user agent
+HEAVY_HITTERS = ('document_views', 'document_reads', 'user_agents')
 
 
 def merge_dict(own: dict, other: dict) -> dict:
@@ -23,6 +37,94 @@ def merge_dict(own: dict, other: dict) -> dict:
     return own
  
 
+# Fewer distinct user agents than this are resolved in the calling process, starting a pool would cost more than it saves
+PARALLEL_USER_AGENTS = 2000
+
+
+def browser_family(ua_string: str) -> str:
+    """Resolve a user agent string to its browser family
+
+    Args:
+        ua_string (str): The user agent string
+
+    Returns:
+        str: The browser family
+    """
+    return ua_parse(ua_string).browser.family
+
+
+def resolve_browser_families(ua_strings: list, max_workers: int=1) -> list:
+    """Resolve many distinct user agent strings to their browser families through the lookup cache, parsing those not cached in a pool of processes when there are enough of them
+
+    Args:
+        ua_strings (list(str)): The distinct user agent strings
+        max_workers (int, optional): The max number of processes, None for one per cpu. Defaults to 1.
+
+    Returns:
+        list(str): The browser family of each user agent string
+    """
+    return cached_many('browser_family', ua_strings, functools.partial(parse_browser_families, max_workers=max_workers))
+
+
+def parse_browser_families(ua_strings: list, max_workers: int=1) -> list:
+    """Parse many distinct user agent strings to their browser families, in a pool of processes when there are enough of them
+
+    Args:
+        ua_strings (list(str)): The distinct user agent strings
+        max_workers (int, optional): The max number of processes, None for one per cpu. Defaults to 1.
+
+    Returns:
+        list(str): The browser family of each user agent string
+    """
+    if max_workers is None:
+        max_workers = cpu_count()
+    max_workers = min(max_workers, len(ua_strings) // PARALLEL_USER_AGENTS)
+    if max_workers <= 1:
+        return [browser_family(ua_string) for ua_string in ua_strings]
+    logger.debug('Resolving user agents: {} | Processes: {}'.format(len(ua_strings), max_workers))
+    with Pool(max_workers) as pool:
+        return pool.map(browser_family, ua_strings, chunksize=max(1, len(ua_strings) // (max_workers * 4)))
+
+
+def RequiresFields(*fields):
+    """Declare the json fields a data function reads, used to decide which parts of each line must be decoded
+
+    Args:
+        fields (str): Names of the json fields used by the function
+
+    Returns:
+        (dict -> Any) -> (dict -> Any): Decorator returning the function with a fields attribute
+    """
+    def decorator(func):
+        func.fields = fields
+        return func
+    return decorator
+
+
+def ChunkFunction(*event_types):
+    """Declare that a data function takes every decoded event of a chunk at once, so it can update its aggregates in batches
+
+    Args:
+        event_types (str): The event types the function uses, when given only events of these types are passed to it
+
+    Returns:
+        (list(dict) -> Any) -> (list(dict) -> Any): Decorator returning the wrapped function with a takes_chunk attribute
+    """
+    def decorator(func):
+        if event_types:
+            @functools.wraps(func)
+            def inner(self, events, **kwargs):
+                return func(self, [event for event in events if type(event) is dict and event.get('event_type', None) in event_types], **kwargs)
+            inner.event_types = event_types
+        else:
+            @functools.wraps(func)
+            def inner(self, events, **kwargs):
+                return func(self, [event for event in events if type(event) is dict], **kwargs)
+        inner.takes_chunk = True
+        return inner
+    return decorator
+
+
 def CheckEventReadtime(func):
     """Wrapper to check if the event type is "read" or impression
 
@@ -42,6 +144,7 @@ def CheckEventReadtime(func):
             return func(self, json, **kwargs)
         else:
             return
+    inner.event_types = ('pagereadtime',)
     return inner
 
 
@@ -64,7 +167,8 @@ def CheckEventRead(func):
             return func(self, json, **kwargs)
         else:
             return
-    return inner    
+    inner.event_types = ('read',)
+    return inner
 
 
 @total_ordering
@@ -76,6 +180,8 @@ class ReadingData:
         read_time (int, optional): Amount of read time to initialise this user wtih. Defaults to 0.
         reads (int, optional): Number times this user has read a document. Defaults to 1.
     """
+    __slots__ = ('uuid', 'read_time', 'reads')
+
     def __init__(self, uuid, read_time=0, reads=1):
         self.uuid = uuid
         self.read_time = read_time
@@ -135,6 +241,185 @@ class ReadingData:
         return ReadingData(self.uuid, total_read_time, total_reads)
 
 
+class ReaderProfiles(Mapping):
+    """The total reading time and number of reads of each visitor, held in parallel arrays of visitor ids, read times and reads, about 16 bytes a visitor.
+    Reads are buffered as they are added and summed into the arrays when the profiles are next read, profiles keep the order visitors first read in.
+    Read as a mapping each visitor uuid gives a new ReadingData holding the visitor's total read time and number of reads.
+
+    Args:
+        visitors (Interner): Interns the visitor uuids
+    """
+    def __init__(self, visitors: Interner):
+        self.visitors = visitors
+        self.ids = np.empty(0, dtype=np.int32)
+        self.read_times = np.empty(0, dtype=np.int64)
+        self.reads = np.empty(0, dtype=np.int32)
+        self.positions = np.empty(0, dtype=np.int32)
+        self.pending_ids = array('i')
+        self.pending_read_times = array('q')
+        self.pending_reads = array('i')
+
+    def add(self, visitor_id: int, read_time: int, reads: int=1) -> None:
+        """Add reading time to the profile of a visitor
+
+        Args:
+            visitor_id (int): Id of the visitor
+            read_time (int): The reading time
+            reads (int, optional): The number of reads the reading time is from. Defaults to 1.
+        """
+        self.pending_ids.append(visitor_id)
+        self.pending_read_times.append(read_time)
+        self.pending_reads.append(reads)
+
+    def add_many(self, visitor_ids: np.ndarray, read_times: np.ndarray, reads: np.ndarray=None) -> None:
+        """Add reading time to the profiles of many visitors
+
+        Args:
+            visitor_ids (numpy.ndarray): Id of the visitor of each reading time
+            read_times (numpy.ndarray): The reading times
+            reads (numpy.ndarray, optional): The number of reads each reading time is from, one when None. Defaults to None.
+        """
+        # Every array is converted before any is buffered, so a bad value leaves the buffers unchanged
+        visitor_ids = np.asarray(visitor_ids, dtype=np.int32)
+        read_times = np.asarray(read_times, dtype=np.int64)
+        reads = np.ones(len(visitor_ids), dtype=np.int32) if reads is None else np.asarray(reads, dtype=np.int32)
+        self.pending_ids.frombytes(visitor_ids.tobytes())
+        self.pending_read_times.frombytes(read_times.tobytes())
+        self.pending_reads.frombytes(reads.tobytes())
+
+    def consolidate(self) -> None:
+        """Sum the buffered reading times into the arrays, appending visitors seen for the first time in the order they first read
+        """
+        if not self.pending_ids:
+            return
+        visitor_ids = np.frombuffer(self.pending_ids, dtype=np.int32)
+        read_times = np.frombuffer(self.pending_read_times, dtype=np.int64)
+        reads = np.frombuffer(self.pending_reads, dtype=np.int32)
+        self.pending_ids = array('i')
+        self.pending_read_times = array('q')
+        self.pending_reads = array('i')
+
+        if len(self.positions) <= visitor_ids.max():
+            grown = np.full(max(len(self.visitors), int(visitor_ids.max()) + 1), -1, dtype=np.int32)
+            grown[:len(self.positions)] = self.positions
+            self.positions = grown
+        unique_ids, first_index = np.unique(visitor_ids, return_index=True)
+        new_ids = unique_ids[np.argsort(first_index)]
+        new_ids = new_ids[self.positions[new_ids] == -1]
+        if len(new_ids):
+            self.positions[new_ids] = np.arange(len(self.ids), len(self.ids) + len(new_ids))
+            self.ids = np.concatenate((self.ids, new_ids))
+            self.read_times = np.concatenate((self.read_times, np.zeros(len(new_ids), dtype=np.int64)))
+            self.reads = np.concatenate((self.reads, np.zeros(len(new_ids), dtype=np.int32)))
+        positions = self.positions[visitor_ids]
+        self.read_times += np.bincount(positions, weights=read_times, minlength=len(self.ids)).astype(np.int64)
+        self.reads += np.bincount(positions, weights=reads, minlength=len(self.ids)).astype(np.int32)
+
+    def merge(self, other, visitor_map: np.ndarray) -> None:
+        """Add the profiles of another ReaderProfiles
+
+        Args:
+            other (ReaderProfiles): The profiles being merged
+            visitor_map (numpy.ndarray): Maps the visitor ids of other to visitor ids of self, returned by Interner.merge
+        """
+        other.consolidate()
+        self.add_many(visitor_map[other.ids], other.read_times, other.reads)
+
+    def top(self, n: int, reverse: bool=True) -> dict:
+        """Select the n visitors with the most reading time, with argpartition rather than a sort of every visitor
+
+        Args:
+            n (int): Number of visitors
+            reverse (bool, optional): Select the most reading time, False for the least. Defaults to True.
+
+        Returns:
+            dict(str, ReadingData): The reading data of the selected visitors, in the order a stable sort by reading time gives
+        """
+        self.consolidate()
+        if n <= 0:
+            return {}
+        keys = -self.read_times if reverse else self.read_times
+        if n < len(keys):
+            selected = np.argpartition(keys, n - 1)[:n]
+            # Visitors tied with the last selected read time are chosen by first read, as a stable sort chooses them
+            cutoff = keys[selected].max()
+            selected = np.concatenate((np.flatnonzero(keys < cutoff), np.flatnonzero(keys == cutoff)))[:n]
+        else:
+            selected = np.arange(len(keys))
+        selected = selected[np.lexsort((selected, keys[selected]))]
+        return {profile.uuid: profile for profile in self.profiles(selected)}
+
+    def sorted(self, reverse: bool=True):
+        """Copy the profiles in order of reading time
+
+        Args:
+            reverse (bool, optional): Order from the most reading time, False for the least. Defaults to True.
+
+        Returns:
+            ReaderProfiles: The ordered profiles, equal reading times keep their order
+        """
+        self.consolidate()
+        order = np.argsort(-self.read_times if reverse else self.read_times, kind='stable')
+        profiles = ReaderProfiles(self.visitors)
+        profiles.ids = self.ids[order]
+        profiles.read_times = self.read_times[order]
+        profiles.reads = self.reads[order]
+        profiles.positions = np.full(len(self.positions), -1, dtype=np.int32)
+        profiles.positions[profiles.ids] = np.arange(len(order))
+        return profiles
+
+    def profiles(self, positions: np.ndarray) -> list:
+        """Create the ReadingData of the profiles at some positions
+
+        Args:
+            positions (numpy.ndarray): Positions in the arrays
+
+        Returns:
+            list(ReadingData): The reading data
+        """
+        uuids = self.visitors.lookup_many(self.ids[positions].tolist())
+        return [ReadingData(uuid, read_time, reads) for uuid, read_time, reads in zip(uuids, self.read_times[positions].tolist(), self.reads[positions].tolist())]
+
+    def position(self, uuid: str) -> int:
+        visitor_id = self.visitors.get_id(uuid)
+        self.consolidate()
+        if visitor_id is None or visitor_id >= len(self.positions) or self.positions[visitor_id] == -1:
+            return None
+        return int(self.positions[visitor_id])
+
+    def __getitem__(self, uuid: str) -> ReadingData:
+        position = self.position(uuid)
+        if position is None:
+            raise KeyError(uuid)
+        return self.profiles(np.array([position]))[0]
+
+    def __contains__(self, uuid):
+        return self.position(uuid) is not None
+
+    def __iter__(self):
+        self.consolidate()
+        return iter(self.visitors.lookup_many(self.ids.tolist()))
+
+    def __len__(self):
+        self.consolidate()
+        return len(self.ids)
+
+    def __getstate__(self):
+        self.consolidate()
+        return {'visitors': self.visitors, 'ids': self.ids, 'read_times': self.read_times, 'reads': self.reads}
+
+    def __setstate__(self, state):
+        self.__init__(state['visitors'])
+        self.ids = state['ids']
+        self.read_times = state['read_times']
+        self.reads = state['reads']
+        self.positions = np.full(int(self.ids.max()) + 1 if len(self.ids) else 0, -1, dtype=np.int32)
+        self.positions[self.ids] = np.arange(len(self.ids), dtype=np.int32)
+
+    def __repr__(self):
+        return 'ReaderProfiles(visitors: {})'.format(len(self))
+
+
 class DocLocation:
     def __init__(self, uuid, countries=None, continents=None):
         self.uuid = uuid
@@ -190,6 +475,323 @@ class DocLocation:
         return DocLocation(self.uuid, new_countries, new_continents)
         
 
+def sort_counts(counts: dict) -> dict:
+    """Order counts from the largest to the smallest, keeping the order of equal counts
+
+    Args:
+        counts (dict(str, int)): The counts
+
+    Returns:
+        dict(str, int): The ordered counts
+    """
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
+class DocumentLocations(Mapping):
+    """Sparse counts of events for each document and country, stored as arrays of packed (document id, country id) pairs and their counts.
+    Pairs are buffered as they are added and summed into the arrays when the counts are next read, so collecting a location costs no allocation.
+    Read as a mapping each document id gives a new DocLocation holding its event counts by country, and by continent derived from those countries.
+
+    Args:
+        documents (Interner): Interns the document ids
+        countries (Interner): Interns the country codes
+    """
+    def __init__(self, documents: Interner, countries: Interner):
+        self.documents = documents
+        self.countries = countries
+        self.pairs = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.pending_pairs = array('q')
+        self.pending_counts = array('q')
+
+    def add(self, document_id: int, country_id: int, count: int=1) -> None:
+        """Count events of a document from a country
+
+        Args:
+            document_id (int): Id of the document
+            country_id (int): Id of the country code
+            count (int, optional): The number of events. Defaults to 1.
+        """
+        self.pending_pairs.append((document_id << 32) | country_id)
+        self.pending_counts.append(count)
+
+    def add_many(self, document_ids: np.ndarray, country_ids: np.ndarray, counts: np.ndarray=None) -> None:
+        """Count events of many documents
+
+        Args:
+            document_ids (numpy.ndarray): Id of the document of each event
+            country_ids (numpy.ndarray): Id of the country code of each event
+            counts (numpy.ndarray, optional): The number of events each pair stands for, one when None. Defaults to None.
+        """
+        pairs = (np.asarray(document_ids, dtype=np.int64) << 32) | np.asarray(country_ids, dtype=np.int64)
+        counts = np.ones(len(pairs), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.pending_pairs.frombytes(pairs.tobytes())
+        self.pending_counts.frombytes(counts.tobytes())
+
+    def consolidate(self) -> None:
+        """Sum the buffered pairs into the sorted arrays of pairs and counts
+        """
+        if not self.pending_pairs:
+            return
+        pairs = np.concatenate((self.pairs, np.frombuffer(self.pending_pairs, dtype=np.int64)))
+        counts = np.concatenate((self.counts, np.frombuffer(self.pending_counts, dtype=np.int64)))
+        self.pending_pairs = array('q')
+        self.pending_counts = array('q')
+        self.pairs, inverse = np.unique(pairs, return_inverse=True)
+        self.counts = np.zeros(len(self.pairs), dtype=np.int64)
+        np.add.at(self.counts, inverse, counts)
+
+    def row(self, document_id: int) -> tuple:
+        """Get the countries of a document and their counts
+
+        Args:
+            document_id (int): Id of the document
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The country ids and the number of events from each
+        """
+        self.consolidate()
+        start, end = np.searchsorted(self.pairs, [document_id << 32, (document_id + 1) << 32])
+        return (self.pairs[start:end] & 0xFFFFFFFF), self.counts[start:end]
+
+    def country_counts(self, doc_uuid: str) -> dict:
+        """Count the events of a document from each country
+
+        Args:
+            doc_uuid (str): The document id
+
+        Returns:
+            dict(str, int): Counts keyed by country code, largest first
+        """
+        document_id = self.documents.get_id(doc_uuid)
+        if document_id is None:
+            return {}
+        country_ids, counts = self.row(document_id)
+        return sort_counts(dict(zip(self.countries.lookup_many(country_ids.tolist()), counts.tolist())))
+
+    def merge(self, other, document_map: np.ndarray, country_map: np.ndarray) -> None:
+        """Add the counts of another DocumentLocations
+
+        Args:
+            other (DocumentLocations): The counts being merged
+            document_map (numpy.ndarray): Maps the document ids of other to document ids of self, returned by Interner.merge
+            country_map (numpy.ndarray): Maps the country ids of other to country ids of self
+        """
+        other.consolidate()
+        self.add_many(document_map[other.pairs >> 32], country_map[other.pairs & 0xFFFFFFFF], other.counts)
+
+    def document_ids(self) -> np.ndarray:
+        """Get the ids of every document with a location
+
+        Returns:
+            numpy.ndarray: The document ids in ascending order
+        """
+        self.consolidate()
+        return np.unique(self.pairs >> 32)
+
+    def __getitem__(self, doc_uuid: str):
+        countries = self.country_counts(doc_uuid)
+        if not countries:
+            raise KeyError(doc_uuid)
+        return DocLocation(self.documents.lookup(self.documents.get_id(doc_uuid)), countries, sort_counts(continent_counts(countries)))
+
+    def __contains__(self, doc_uuid):
+        return bool(self.country_counts(doc_uuid))
+
+    def __iter__(self):
+        return iter(self.documents.lookup_many(self.document_ids().tolist()))
+
+    def __len__(self):
+        return len(self.document_ids())
+
+    def __getstate__(self):
+        self.consolidate()
+        return {'documents': self.documents, 'countries': self.countries, 'pairs': self.pairs, 'counts': self.counts}
+
+    def __setstate__(self, state):
+        self.__init__(state['documents'], state['countries'])
+        self.pairs = state['pairs']
+        self.counts = state['counts']
+
+    def __repr__(self):
+        return 'DocumentLocations(documents: {}, pairs: {})'.format(len(self), len(self.pairs))
+
+
+class DocumentLocationSketch(Mapping):
+    """Estimated counts of events for each document and country, held in a Count-Min sketch of hashed (document, country) pairs.
+    Memory does not grow with the events counted, the estimated counts are never below the true counts and are over them by at most error_bound with probability confidence.
+    It is read as a mapping like DocumentLocations, estimating the count of every known country for a document.
+
+    Args:
+        documents (Interner): Interns the document ids
+        countries (Interner): Interns the country codes
+        width (int, optional): The counters in each row of the sketch. Defaults to DEFAULT_WIDTH.
+        depth (int, optional): The rows of the sketch. Defaults to DEFAULT_DEPTH.
+    """
+    # Pairs buffered before they are added to the sketch
+    max_pending = 1 << 16
+
+    def __init__(self, documents: Interner, countries: Interner, width: int=DEFAULT_WIDTH, depth: int=DEFAULT_DEPTH):
+        self.documents = documents
+        self.countries = countries
+        self.sketch = CountMinSketch(width, depth)
+        self.document_hashes = np.empty(0, dtype=np.uint64)
+        self.country_hashes = np.empty(0, dtype=np.uint64)
+        self.seen = np.zeros(0, dtype=bool)
+        self.pending_documents = array('i')
+        self.pending_countries = array('i')
+
+    def add(self, document_id: int, country_id: int) -> None:
+        """Count an event of a document from a country
+
+        Args:
+            document_id (int): Id of the document
+            country_id (int): Id of the country code
+        """
+        self.pending_documents.append(document_id)
+        self.pending_countries.append(country_id)
+        if len(self.pending_documents) >= self.max_pending:
+            self.consolidate()
+
+    def add_many(self, document_ids: np.ndarray, country_ids: np.ndarray) -> None:
+        """Count events of many documents
+
+        Args:
+            document_ids (numpy.ndarray): Id of the document of each event
+            country_ids (numpy.ndarray): Id of the country code of each event
+        """
+        self.pending_documents.frombytes(np.asarray(document_ids, dtype=np.int32).tobytes())
+        self.pending_countries.frombytes(np.asarray(country_ids, dtype=np.int32).tobytes())
+        if len(self.pending_documents) >= self.max_pending:
+            self.consolidate()
+
+    def hashes(self) -> tuple:
+        """Hash the document ids and country codes interned since the last call
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The hash of each document id and of each country code, indexed by id
+        """
+        if len(self.document_hashes) < len(self.documents):
+            self.document_hashes = np.concatenate((self.document_hashes, hash_strings(self.documents.values[len(self.document_hashes):])))
+        if len(self.country_hashes) < len(self.countries):
+            self.country_hashes = np.concatenate((self.country_hashes, mix(hash_strings(self.countries.values[len(self.country_hashes):]))))
+        return self.document_hashes, self.country_hashes
+
+    def keys(self, document_ids: np.ndarray, country_ids: np.ndarray) -> np.ndarray:
+        """Hash (document, country) pairs, from the strings rather than the ids so sketches of other processes agree
+
+        Args:
+            document_ids (numpy.ndarray): Ids of the documents
+            country_ids (numpy.ndarray): Ids of the country codes
+
+        Returns:
+            numpy.ndarray: The uint64 hash of each pair
+        """
+        document_hashes, country_hashes = self.hashes()
+        return document_hashes[document_ids] ^ country_hashes[country_ids]
+
+    def consolidate(self) -> None:
+        """Add the buffered pairs to the sketch
+        """
+        if not self.pending_documents:
+            return
+        document_ids = np.frombuffer(self.pending_documents, dtype=np.int32)
+        country_ids = np.frombuffer(self.pending_countries, dtype=np.int32)
+        self.pending_documents = array('i')
+        self.pending_countries = array('i')
+        self.sketch.add_many(self.keys(document_ids, country_ids))
+        self.mark_seen(document_ids)
+
+    def mark_seen(self, document_ids: np.ndarray) -> None:
+        """Record the documents that have been counted
+
+        Args:
+            document_ids (numpy.ndarray): Ids of the documents
+        """
+        if len(self.seen) < len(self.documents):
+            self.seen = np.concatenate((self.seen, np.zeros(len(self.documents) - len(self.seen), dtype=bool)))
+        self.seen[document_ids] = True
+
+    def country_counts(self, doc_uuid: str) -> dict:
+        """Estimate the number of events of a document from each country
+
+        Args:
+            doc_uuid (str): The document id
+
+        Returns:
+            dict(str, int): The estimated count of each country with one, from the largest
+        """
+        self.consolidate()
+        document_id = self.documents.get_id(doc_uuid)
+        if document_id is None or document_id >= len(self.seen) or not self.seen[document_id]:
+            return {}
+        country_ids = np.arange(len(self.countries))
+        counts = self.sketch.estimate(self.keys(np.full(len(country_ids), document_id), country_ids))
+        return sort_counts({code: count for code, count in zip(self.countries.values, counts.tolist()) if count > 0})
+
+    def merge(self, other, document_map: np.ndarray, country_map: np.ndarray) -> None:
+        """Add the counts of another DocumentLocationSketch of the same size
+
+        Args:
+            other (DocumentLocationSketch): The counts being merged
+            document_map (numpy.ndarray): Maps the document ids of other to document ids of self, returned by Interner.merge
+            country_map (numpy.ndarray): Maps the country ids of other to country ids of self, unused as pairs are hashed from their strings
+        """
+        other.consolidate()
+        self.consolidate()
+        self.sketch.merge(other.sketch)
+        self.mark_seen(document_map[np.flatnonzero(other.seen)])
+
+    @property
+    def error_bound(self) -> int:
+        """The most an estimated count is over the true count, with probability confidence
+        """
+        self.consolidate()
+        return self.sketch.error_bound
+
+    @property
+    def confidence(self) -> float:
+        return self.sketch.confidence
+
+    def document_ids(self) -> np.ndarray:
+        """Get the ids of every document with a location
+
+        Returns:
+            numpy.ndarray: The document ids in ascending order
+        """
+        self.consolidate()
+        return np.flatnonzero(self.seen)
+
+    def __getitem__(self, doc_uuid: str):
+        countries = self.country_counts(doc_uuid)
+        if not countries:
+            raise KeyError(doc_uuid)
+        return DocLocation(self.documents.lookup(self.documents.get_id(doc_uuid)), countries, sort_counts(continent_counts(countries)))
+
+    def __contains__(self, doc_uuid):
+        return bool(self.country_counts(doc_uuid))
+
+    def __iter__(self):
+        return iter(self.documents.lookup_many(self.document_ids().tolist()))
+
+    def __len__(self):
+        return len(self.document_ids())
+
+    def __getstate__(self):
+        self.consolidate()
+        state = self.__dict__.copy()
+        del state['document_hashes'], state['country_hashes']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.document_hashes = np.empty(0, dtype=np.uint64)
+        self.country_hashes = np.empty(0, dtype=np.uint64)
+
+    def __repr__(self):
+        return 'DocumentLocationSketch(documents: {}, error_bound: {})'.format(len(self), self.error_bound)
+
+
 @total_ordering
 class BrowserData:
     def __init__(self, short_name, long_name, count=1):
@@ -244,116 +846,209 @@ class DataCollector:
     """Handles collection and orgnaisation of data
 
     Args:
-        path (str, optional): Path to the file being read. Defaults to None.
+        path (str | list(str), optional): Path to the file being read, or a list of files, directories and glob patterns. Defaults to None.
         count_browser (bool, optional): Count browser data? Defaults to True.
         count_country (bool, optional): Count country data? Defaults to True.
         count_continent (bool, optional): Count continent data? Defaults to True.
         build_reader_profiles (bool, optional): Build reader profiles? Defaults to True.
         collect_doc_data (bool, optional): Collect document-reader relationships? Defaults to True.
+        count_heavy_hitters (bool, optional): Keep bounded summaries of the most viewed and most read documents and the most common user agents? Defaults to False.
+        heavy_hitters_capacity (int, optional): The most items each heavy hitters summary monitors. Defaults to DEFAULT_CAPACITY.
+        sketch (bool, optional): Estimate document locations with a Count-Min sketch and the distinct readers of each document with HyperLogLogs,
+            instead of exact counts and document-reader relationships. Defaults to False.
+        sketch_precision (int, optional): The precision of each HyperLogLog. Defaults to DEFAULT_PRECISION.
+        sketch_width (int, optional): The counters in each row of the Count-Min sketch. Defaults to DEFAULT_WIDTH.
+        sketch_depth (int, optional): The rows of the Count-Min sketch. Defaults to DEFAULT_DEPTH.
     """
-    def __init__(self, path: str=None, count_doc_locations: bool=True, count_browser: bool=True, count_country: bool=True, count_continent: bool=True, build_reader_profiles: bool=True, collect_doc_data: bool=True):
+    def __init__(self, path: str=None, count_doc_locations: bool=True, count_browser: bool=True, count_country: bool=True, count_continent: bool=True, build_reader_profiles: bool=True, collect_doc_data: bool=True,
+                 count_heavy_hitters: bool=False, heavy_hitters_capacity: int=DEFAULT_CAPACITY,
+                 sketch: bool=False, sketch_precision: int=DEFAULT_PRECISION, sketch_width: int=DEFAULT_WIDTH, sketch_depth: int=DEFAULT_DEPTH):
         self.path = path
+        self.sketch = sketch
+        self.sketch_precision = sketch_precision
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
         self.countries = {}
-        self.doc_locations = {}
         self.continents = {}
         self.browser_families = {}
-        self.reader_profiles = OrderedDict()
-        self.document_readers = {}
-        self.visitor_documents = {}
+        self.user_agent_counts = {}
+        self.user_agent_families = {}
+        self.continent_country_counts = {}
+        self.documents = Interner()
+        self.visitors = Interner()
+        self.reader_profiles = ReaderProfiles(self.visitors)
+        self.country_codes = Interner()
+        self.doc_locations = self.new_doc_locations()
+        self.distinct_readers = DistinctReaders(self.documents, sketch_precision) if sketch else None
+        self.document_readers = IdRelation(self.documents, self.visitors)
+        self.visitor_documents = IdRelation(self.visitors, self.documents)
+        self.read_graph = None
+        self.heavy_hitters = {name: HeavyHitters(heavy_hitters_capacity) for name in HEAVY_HITTERS} if count_heavy_hitters else {}
+        self.parse_stats = {}
+        # Incremented whenever the data changes, so results computed from it can be invalidated
+        self.version = 0
         self.counted = False
         self.histo_config = None
 
         self.data_fns = []
         if count_doc_locations:
-            self.data_fns.append(self.find_doc_locations)
+            self.data_fns.append(self.find_chunk_doc_locations)
         if count_browser:
-            self.data_fns.append(self.count_browsers)
+            self.data_fns.append(self.count_chunk_user_agents)
         if count_country:
-            self.data_fns.append(self.count_countries)
+            self.data_fns.append(self.count_chunk_countries)
         if count_continent:
-            self.data_fns.append(self.count_continents)
+            self.data_fns.append(self.count_chunk_continents)
         if build_reader_profiles:
-            self.data_fns.append(self.collect_reading_data)
+            self.data_fns.append(self.collect_chunk_reading_data)
         if collect_doc_data:
-            self.data_fns.append(self.collect_document_readers)
+            self.data_fns.append(self.sketch_chunk_document_readers if sketch else self.collect_chunk_document_readers)
+        if count_heavy_hitters:
+            self.data_fns.append(self.count_chunk_heavy_hitters)
+
+    def new_doc_locations(self):
+        """Create empty document location counts
+
+        Returns:
+            DocumentLocations | DocumentLocationSketch: Exact counts, or a sketch in sketch mode
+        """
+        if self.sketch:
+            return DocumentLocationSketch(self.documents, self.country_codes, self.sketch_width, self.sketch_depth)
+        return DocumentLocations(self.documents, self.country_codes)
 
     def set_read_path(self, path: str) -> None:
         """Specify the path for LocationViews to read from
 
         Args:
-            path (str): Path to the datafile
+            path (str | list(str)): Path to the datafile, or a list of files, directories and glob patterns
         """
         self.path = path
 
-    def gather_data(self, concurrent: bool=True, max_workers: int=None, chunk_size: int=500000) -> None:
+    def gather_data(self, concurrent: bool=True, max_workers: int=None, chunk_size: int=DEFAULT_CHUNK_SIZE, use_mmap: bool=False, merge_every: int=None, decoder: str=None, extract_fields: bool=None,
+                    checkpoint: str=None, resume: bool=False, checkpoint_interval: float=60.0) -> None:
         """Compute the counts of the required data
+
+        Args:
+            concurrent (bool, optional): Enable concurrency when reading. Defaults to True.
+            max_workers (int, optional): The max number of workers to process the file input. Defaults to None.
+            chunk_size (int, optional): The number of bytes in each chunk of the file. Defaults to DEFAULT_CHUNK_SIZE.
+            use_mmap (bool, optional): Memory map the file so each worker reads its own byte ranges. Defaults to False.
+            merge_every (int, optional): Number of chunks each worker accumulates before sending a partial result. Defaults to None.
+            decoder (str, optional): Name of the JSON decoder, when None the fastest installed decoder is used. Defaults to None.
+            extract_fields (bool, optional): Extract only the needed fields from each line, when None this is enabled for the stdlib json decoder. Defaults to None.
+            checkpoint (str, optional): Path to periodically save progress to, the file is partitioned into byte ranges so each can be recorded. Defaults to None.
+            resume (bool, optional): Continue from the checkpoint instead of the start of the file. Defaults to False.
+            checkpoint_interval (float, optional): Minimum number of seconds between checkpoints. Defaults to 60.0.
+        """
+        if checkpoint is not None:
+            checkpoint = Checkpoint(checkpoint, resume=resume, interval=checkpoint_interval)
+        ParseFile(self.path, chunk_size=chunk_size, use_mmap=use_mmap, decoder=decoder, extract_fields=extract_fields).parse_file(
+            self, concurrent=concurrent, max_workers=max_workers, merge_every=merge_every, checkpoint=checkpoint)
+        self.finalise(max_workers=max_workers if concurrent else 1)
+        self.counted = True
+
+    def finalise(self, max_workers: int=1) -> None:
+        """Derive any data that is not collected while parsing, called once parsing is complete and before each snapshot of a followed file.
+        The user agent strings and continent countries counted since the last call are resolved and folded into the browser and continent counts,
+        and the reads are built into the deduplicated read graph.
+
+        Args:
+            max_workers (int, optional): The max number of processes used to resolve user agents, None for one per cpu. Defaults to 1.
+        """
+        self.resolve_user_agents(max_workers=max_workers)
+        self.resolve_continents()
+        self.build_read_graph()
+        self.version += 1
+
+    def build_read_graph(self) -> None:
+        """Build the read graph from the document readers, unless it is up to date
+        """
+        if self.read_graph is None:
+            self.read_graph = ReadGraph.from_relation(self.document_readers)
+
+    def resolve_continents(self) -> None:
+        """Fold the countries counted for continent data into the continent counts, with one vectorised lookup of the geography table
+        """
+        self.continents = merge_dict(self.continents, continent_counts(self.continent_country_counts))
+        self.continent_country_counts = {}
+
+    def resolve_user_agents(self, max_workers: int=1) -> None:
+        """Fold the counted user agent strings into the browser family counts, resolving each distinct string once.
+        Resolved families are remembered, so strings seen again in a followed file are not parsed again.
+
+        Args:
+            max_workers (int, optional): The max number of processes used to resolve user agents, None for one per cpu. Defaults to 1.
+        """
+        unresolved = [ua_string for ua_string in self.user_agent_counts if ua_string not in self.user_agent_families]
+        if unresolved:
+            self.user_agent_families.update(zip(unresolved, resolve_browser_families(unresolved, max_workers=max_workers)))
+        for ua_string, count in self.user_agent_counts.items():
+            browser = self.user_agent_families[ua_string]
+            if self.browser_families.get(browser, None) is None:
+                self.browser_families[browser] = BrowserData(browser, ua_string, count)
+            else:
+                self.browser_families[browser] += BrowserData(browser, ua_string, count)
+        self.user_agent_counts = {}
+
+    def follow_data(self, publisher=None, concurrent: bool=True, max_workers: int=None, chunk_size: int=DEFAULT_CHUNK_SIZE, decoder: str=None, extract_fields: bool=None,
+                    poll_interval: float=1.0, publish_interval: float=5.0, stop_event=None) -> None:
+        """Compute the counts of the required data, then keep updating them as lines are appended to the file. Blocks until stop_event is set.
+
+        Args:
+            publisher (SnapshotPublisher, optional): Receives consistent copies of this data collector as it is updated. Defaults to None.
+            concurrent (bool, optional): Enable concurrency when reading the existing contents. Defaults to True.
+            max_workers (int, optional): The max number of workers to process the existing contents. Defaults to None.
+            chunk_size (int, optional): The number of bytes in each chunk of the file. Defaults to DEFAULT_CHUNK_SIZE.
+            decoder (str, optional): Name of the JSON decoder, when None the fastest installed decoder is used. Defaults to None.
+            extract_fields (bool, optional): Extract only the needed fields from each line, when None this is enabled for the stdlib json decoder. Defaults to None.
+            poll_interval (float, optional): Seconds to wait when no new lines have been written. Defaults to 1.0.
+            publish_interval (float, optional): Minimum number of seconds between snapshots. Defaults to 5.0.
+            stop_event (threading.Event, optional): Set to stop following the file. Defaults to None.
         """
-        ParseFile(self.path, chunk_size=chunk_size).parse_file(
-            self, concurrent=concurrent, max_workers=max_workers)
         self.counted = True
+        ParseFile(self.path, chunk_size=chunk_size, decoder=decoder, extract_fields=extract_fields).follow(
+            self, publisher=publisher, concurrent=concurrent, max_workers=max_workers, poll_interval=poll_interval,
+            publish_interval=publish_interval, stop_event=stop_event)
 
-    #@CheckEventRead
+    @RequiresFields('subject_doc_id', 'visitor_country')
     def find_doc_locations(self, json: dict) -> None:
         """Collect all document location data
 
         Args:
             json (dict): dict returned by json.load
         """
-        doc_uuid = json.get('subject_doc_id', None)
-        location = json.get('visitor_country', None)
-        if doc_uuid is not None and location is not None:
-            if self.doc_locations.get(doc_uuid, None) is None:
-                doc = DocLocation(doc_uuid).add_location(location)
-                self.doc_locations[doc_uuid] = doc
-            else:
-                doc = DocLocation(doc_uuid).add_location(location)
-                self.doc_locations[doc_uuid] += doc
-                    
-    #@CheckEventRead
+        self.find_chunk_doc_locations([json])
+
+    @RequiresFields('visitor_country')
     def count_countries(self, json: dict) -> None:
         """Increment the dictionary counter for the country in json
 
         Args:
             json (dict): dict returned by json.load
         """
-        location = json.get('visitor_country', None)
-        if location is not None:
-            if self.countries.get(location, None) is None:
-                self.countries[location] = 1
-            else:
-                self.countries[location] += 1
-            
-    #@CheckEventRead
+        self.count_chunk_countries([json])
+
+    @RequiresFields('visitor_country')
     def count_continents(self, json: dict) -> None:
         """Increment the dictionary counter for the continent derived from the country in json
 
         Args:
             json (dict): dict returned by json.load
         """
-        location = json.get('visitor_country', None)
-        if location is not None:
-            continent_n = continent_name(location)
-            if self.continents.get(continent_n, None) is None:
-                self.continents[continent_n] = 1
-            else:
-                self.continents[continent_n] += 1
-            
-    #@CheckEventRead
+        self.count_chunk_continents([json])
+        self.resolve_continents()
+
+    @RequiresFields('visitor_useragent')
     def count_browsers(self, json: dict) -> None:
         """Update the browser family count field in self
 
         Args:
             json (dict): dict returned by json.load
         """
-        ua_string = json.get('visitor_useragent', None)
-        if ua_string is not None:
-            user_agent = ua_parse(ua_string)
-            browser = user_agent.browser.family
-            if self.browser_families.get(browser, None) is None:
-                self.browser_families[browser] = BrowserData(browser, ua_string)
-            else:
-                self.browser_families[browser] += BrowserData(browser, ua_string)
+        self.count_chunk_user_agents([json])
+        self.resolve_user_agents()
 
+    @RequiresFields('event_type', 'event_readtime', 'visitor_uuid')
     @CheckEventReadtime
     def collect_reading_data(self, json: dict) -> None:
         """Update reading data for each uuid
@@ -361,14 +1056,28 @@ class DataCollector:
         Args:
             json (dict): dict returned by json.load
         """
-        reading_time = json.get('event_readtime')
-        uuid = json.get('visitor_uuid')
-        if reading_time is not None and uuid is not None:
-            if self.reader_profiles.get(uuid, None) is None:
-                self.reader_profiles[uuid] = ReadingData(uuid, read_time=reading_time)
-            else:
-                self.reader_profiles[uuid].new_read(reading_time)
+        self.collect_chunk_reading_data([json])
+
+    @RequiresFields('event_type', 'subject_doc_id', 'visitor_useragent')
+    def count_heavy_hitters(self, json: dict) -> None:
+        """Count the document and user agent of an event in the heavy hitters summaries
+
+        Args:
+            json (dict): dict returned by json.load
+        """
+        self.count_chunk_heavy_hitters([json])
+
+    @RequiresFields('event_type', 'subject_doc_id', 'visitor_uuid')
+    @CheckEventRead
+    def sketch_document_readers(self, json: dict) -> None:
+        """Add the reader of a document to its distinct readers estimate
+
+        Args:
+            json (dict): dict returned by json.load
+        """
+        self.sketch_chunk_document_readers([json])
 
+    @RequiresFields('event_type', 'subject_doc_id', 'visitor_uuid')
     @CheckEventRead
     def collect_document_readers(self, json: dict) -> None:
         """Collect document id and reader id information
@@ -376,19 +1085,122 @@ class DataCollector:
         Args:
             json (dict): dict returned by json.load
         """
-        document = json.get('subject_doc_id')
-        uuid = json.get('visitor_uuid')
+        self.collect_chunk_document_readers([json])
 
-        if document is not None and uuid is not None:
-            if self.document_readers.get(document, None) is None:
-                self.document_readers[document] = [uuid]
-            else:
-                self.document_readers[document].append(uuid)
+    @RequiresFields('subject_doc_id', 'visitor_country')
+    @ChunkFunction()
+    def find_chunk_doc_locations(self, events: list) -> None:
+        """Collect the document location data of a chunk, adding the interned pairs to the sparse counts at once
 
-            if self.visitor_documents.get(uuid, None) is None:
-                self.visitor_documents[uuid] = [document]
-            else:
-                self.visitor_documents[uuid].append(document)
+        Args:
+            events (list(dict)): dicts returned by json.load
+        """
+        pairs = [(event.get('subject_doc_id', None), event.get('visitor_country', None)) for event in events]
+        pairs = [(doc_uuid, location) for doc_uuid, location in pairs if doc_uuid is not None and location is not None]
+        if not pairs:
+            return
+        doc_uuids, locations = zip(*pairs)
+        self.doc_locations.add_many(self.documents.intern_many(doc_uuids), self.country_codes.intern_many(locations))
+
+    @RequiresFields('visitor_country')
+    @ChunkFunction()
+    def count_chunk_countries(self, events: list) -> None:
+        """Add the number of events from each country in a chunk to the country counts
+
+        Args:
+            events (list(dict)): dicts returned by json.load
+        """
+        counts = Counter([event.get('visitor_country', None) for event in events])
+        counts.pop(None, None)
+        merge_dict(self.countries, counts)
+
+    @RequiresFields('visitor_country')
+    @ChunkFunction()
+    def count_chunk_continents(self, events: list) -> None:
+        """Count the countries of a chunk for continent data, they are totalled by continent once parsing is complete by finalise
+
+        Args:
+            events (list(dict)): dicts returned by json.load
+        """
+        counts = Counter([event.get('visitor_country', None) for event in events])
+        counts.pop(None, None)
+        merge_dict(self.continent_country_counts, counts)
+
+    @RequiresFields('visitor_useragent')
+    @ChunkFunction()
+    def count_chunk_user_agents(self, events: list) -> None:
+        """Count the user agent strings of a chunk, they are resolved to browser families once parsing is complete by finalise
+
+        Args:
+            events (list(dict)): dicts returned by json.load
+        """
+        counts = Counter([event.get('visitor_useragent', None) for event in events])
+        counts.pop(None, None)
+        merge_dict(self.user_agent_counts, counts)
+
+    @RequiresFields('event_type', 'event_readtime', 'visitor_uuid')
+    @ChunkFunction('pagereadtime')
+    def collect_chunk_reading_data(self, events: list) -> None:
+        """Add the reading time of each read in a chunk to the reader profiles at once
+
+        Args:
+            events (list(dict)): dicts returned by json.load for pagereadtime events
+        """
+        reads = [(event.get('visitor_uuid'), event.get('event_readtime')) for event in events]
+        reads = [(uuid, reading_time) for uuid, reading_time in reads if uuid is not None and reading_time is not None]
+        if not reads:
+            return
+        uuids, reading_times = zip(*reads)
+        self.reader_profiles.add_many(self.visitors.intern_many(uuids), reading_times)
+
+    @RequiresFields('event_type', 'subject_doc_id', 'visitor_useragent')
+    @ChunkFunction()
+    def count_chunk_heavy_hitters(self, events: list) -> None:
+        """Count the documents and user agents of a chunk, then fold the counts into the heavy hitters summaries
+
+        Args:
+            events (list(dict)): dicts returned by json.load
+        """
+        documents = [(event.get('subject_doc_id', None), event.get('event_type', None)) for event in events]
+        documents = [(doc_uuid, event_type) for doc_uuid, event_type in documents if doc_uuid is not None]
+        user_agents = [event.get('visitor_useragent', None) for event in events]
+        self.heavy_hitters['document_views'].add_many(doc_uuid for doc_uuid, _ in documents)
+        self.heavy_hitters['document_reads'].add_many(doc_uuid for doc_uuid, event_type in documents if event_type == 'read')
+        self.heavy_hitters['user_agents'].add_many(ua_string for ua_string in user_agents if ua_string is not None)
+
+    @RequiresFields('event_type', 'subject_doc_id', 'visitor_uuid')
+    @ChunkFunction('read')
+    def sketch_chunk_document_readers(self, events: list) -> None:
+        """Add the readers of each read in a chunk to the distinct readers estimates of their documents
+
+        Args:
+            events (list(dict)): dicts returned by json.load for read events
+        """
+        reads = [(event.get('subject_doc_id'), event.get('visitor_uuid')) for event in events]
+        reads = [(document, uuid) for document, uuid in reads if document is not None and uuid is not None]
+        if not reads:
+            return
+        documents, uuids = zip(*reads)
+        self.distinct_readers.add_many(self.documents.intern_many(documents), uuids)
+
+    @RequiresFields('event_type', 'subject_doc_id', 'visitor_uuid')
+    @ChunkFunction('read')
+    def collect_chunk_document_readers(self, events: list) -> None:
+        """Collect the document id and reader id of each read in a chunk, grouping them by document and by reader at once
+
+        Args:
+            events (list(dict)): dicts returned by json.load for read events
+        """
+        reads = [(event.get('subject_doc_id'), event.get('visitor_uuid')) for event in events]
+        reads = [(document, uuid) for document, uuid in reads if document is not None and uuid is not None]
+        if not reads:
+            return
+        documents, uuids = zip(*reads)
+        document_ids = self.documents.intern_many(documents)
+        visitor_ids = self.visitors.intern_many(uuids)
+        self.document_readers.add_many(document_ids, visitor_ids)
+        self.visitor_documents.add_many(visitor_ids, document_ids)
+        self.read_graph = None
 
 
     def merge(self, other) -> None:
@@ -397,24 +1209,52 @@ class DataCollector:
         Args:
             other (DataCollector): other must be a DataCollector instance
         """
-        self.doc_locations = merge_dict(self.doc_locations, other.doc_locations)
         self.countries = merge_dict(self.countries, other.countries)
         self.continents = merge_dict(self.continents, other.continents)
         self.browser_families = merge_dict(self.browser_families, other.browser_families)
-        self.reader_profiles = merge_dict(self.reader_profiles, other.reader_profiles)
-        self.document_readers = merge_dict(self.document_readers, other.document_readers)
-        self.visitor_documents = merge_dict(self.visitor_documents, other.visitor_documents)
+        self.user_agent_counts = merge_dict(self.user_agent_counts, other.user_agent_counts)
+        self.continent_country_counts = merge_dict(self.continent_country_counts, other.continent_country_counts)
+        self.user_agent_families.update(other.user_agent_families)
+        document_map = self.documents.merge(other.documents)
+        visitor_map = self.visitors.merge(other.visitors)
+        self.reader_profiles.merge(other.reader_profiles, visitor_map)
+        self.document_readers.merge(other.document_readers, document_map, visitor_map)
+        self.doc_locations.merge(other.doc_locations, document_map, self.country_codes.merge(other.country_codes))
+        self.visitor_documents.merge(other.visitor_documents, visitor_map, document_map)
+        if self.distinct_readers is not None and other.distinct_readers is not None:
+            self.distinct_readers.merge(other.distinct_readers, document_map)
+        if self.read_graph is not None and other.read_graph is not None:
+            self.read_graph = self.read_graph.merge(other.read_graph, document_map, visitor_map)
+        elif len(other.document_readers):
+            self.read_graph = None
+        for name, summary in other.heavy_hitters.items():
+            if name in self.heavy_hitters:
+                self.heavy_hitters[name].merge(summary)
+            else:
+                self.heavy_hitters[name] = summary
+        self.parse_stats = merge_dict(self.parse_stats, other.parse_stats)
+        self.version += 1
 
     def clear(self) -> None:
         """Clear the data in this dict
         """
         self.countries = {}
         self.continents = {}
-        self.doc_locations ={}
         self.browser_families = {}
-        self.reader_profiles = {}
-        self.document_readers = {}
-        self.visitor_documents = {}
+        self.user_agent_counts = {}
+        self.continent_country_counts = {}
+        self.documents = Interner()
+        self.visitors = Interner()
+        self.reader_profiles = ReaderProfiles(self.visitors)
+        self.country_codes = Interner()
+        self.doc_locations = self.new_doc_locations()
+        self.distinct_readers = DistinctReaders(self.documents, self.sketch_precision) if self.sketch else None
+        self.document_readers = IdRelation(self.documents, self.visitors)
+        self.visitor_documents = IdRelation(self.visitors, self.documents)
+        self.read_graph = None
+        self.heavy_hitters = {name: HeavyHitters(summary.capacity) for name, summary in self.heavy_hitters.items()}
+        self.parse_stats = {}
+        self.version += 1
 
 
 #! --------------------- MOVE TO NEW CLASS -------------------------
@@ -0,0 +1,83 @@
+import re
+
+
+class FieldExtractor:
+    """Pulls named fields out of a flat issuu event line with one precompiled pattern, without decoding the whole line.
+    A line is only handled when it has a single object and no escape sequences, so every quote in it delimits a key or a string value.
+
+    Args:
+        fields (iterable(str)): The json fields to extract
+    """
+    def __init__(self, fields):
+        self.fields = sorted(set(fields))
+        keys = '|'.join(re.escape(field) for field in self.fields)
+        pattern = r'"({})"\s*:\s*("[^"]*"|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|null|true|false)\s*[,}}]'.format(keys)
+        self.patterns = {
+            bytes: re.compile(pattern.encode()),
+            str: re.compile(pattern)
+        }
+        self.tokens = {
+            bytes: {field: '"{}"'.format(field).encode() for field in self.fields},
+            str: {field: '"{}"'.format(field) for field in self.fields}
+        }
+        self.specials = {
+            bytes: (b'\\', b'{', b'"', b'null', b'true', b'false'),
+            str: ('\\', '{', '"', 'null', 'true', 'false')
+        }
+
+    def extract(self, line) -> dict:
+        """Extract the fields from one line
+
+        Args:
+            line (bytes | str): A raw line from the file
+
+        Returns:
+            dict | None: The extracted fields, missing fields are left out. None when the line does not have the expected shape and must be decoded as JSON.
+        """
+        line_type = type(line)
+        backslash, brace, quote, null, true, false = self.specials[line_type]
+        if backslash in line or line.count(brace) != 1:
+            return None
+
+        event = {}
+        for key, value in self.patterns[line_type].findall(line):
+            if isinstance(key, bytes):
+                key = key.decode()
+            if value[:1] == quote:
+                value = value[1:-1]
+                event[key] = value.decode() if line_type is bytes else value
+            elif value == null:
+                event[key] = None
+            elif value == true:
+                event[key] = True
+            elif value == false:
+                event[key] = False
+            elif value.isdigit() or value[1:].isdigit():
+                event[key] = int(value)
+            else:
+                event[key] = float(value)
+
+        if len(event) != len(self.fields):
+            tokens = self.tokens[line_type]
+            for field in self.fields:
+                if field not in event and tokens[field] in line:
+                    return None
+        return event
+
+
+def build_extractor(fn_list: list) -> FieldExtractor:
+    """Build an extractor for the union of the fields declared by each data function
+
+    Args:
+        fn_list (list(dict -> None)): Data functions, each should have a fields attribute
+
+    Returns:
+        FieldExtractor | None: None when any function does not declare its fields
+    """
+    fields = set()
+    for fn in fn_list:
+        fn_fields = getattr(fn, 'fields', None)
+        if fn_fields is None:
+            return None
+        fields.update(fn_fields)
+    return FieldExtractor(fields)
@@ -1,30 +1,465 @@
+from collections import OrderedDict, namedtuple
 from copy import deepcopy
+import glob
 import json
+import mmap
+import os
+import re
 import threading
+import weakref
 from multiprocessing import JoinableQueue, Process, cpu_count
-from threading import Thread
+from queue import Empty, Full
 from DocuTrace.Utils.Logging import logger, debug, logging
+from DocuTrace.Utils.Validation import is_json_path
+from DocuTrace.Utils.Exceptions import InvalidPathError
+from DocuTrace.Analysis.JsonDecoder import get_decoder
+from DocuTrace.Analysis.FieldExtractor import FieldExtractor, build_extractor
+from DocuTrace.Analysis.Compression import FrameRange, compression_of, open_compressed, partition_frames, read_frame_range
+from DocuTrace.Analysis.Checkpoint import Checkpoint
+from DocuTrace.Analysis.ChunkSize import DEFAULT_CHUNK_SIZE, ChunkSizeTuner, ChunkStats
 import time
 
 
-def stream_file_chunks(file_name: str, chunk_size: int=5000000):
-    """Use an iterator over the file, using a hint for the number of bytes for each 
+# Chunks each worker parses before sending a partial result when checkpointing, so progress reaches the parent while the file is read
+CHECKPOINT_MERGE_EVERY = 4
+
+# Seconds the parent waits to queue a chunk before reading feedback from the workers again
+FEEDBACK_POLL_SECONDS = 0.05
+
+
+def stream_file_chunks(file_name: str, chunk_size: int=DEFAULT_CHUNK_SIZE):
+    """Use an iterator over the file, using a hint for the number of bytes for each. Compressed files are decompressed as they are read.
 
     Args:
         file_name (str): Path to the file
-        chunk_size (int, optional): The number of bytes each readlines() call will attempt to consume. Defaults to 5000000.
+        chunk_size (int | callable, optional): The number of bytes each readlines() call will attempt to consume, or a function returning it such as a ChunkSizeTuner. Defaults to DEFAULT_CHUNK_SIZE.
 
     Yields:
-        list(str): A list of strings, each string is one line from the file
+        list(bytes): A list of byte strings, each is one line from the file
     """
-    with open(file_name) as f:
+    codec = compression_of(file_name)
+    if codec is None:
+        file = open(file_name, 'rb')
+    else:
+        file = open_compressed(file_name, codec)
+
+    with file as f:
         while True:
-            data = f.readlines(chunk_size)
+            data = f.readlines(chunk_size() if callable(chunk_size) else chunk_size)
             if not data:
                 break
             yield data
 
 
+ByteRange = namedtuple('ByteRange', ['path', 'offset', 'length'])
+"""A newline aligned slice of a file, handed to worker processes in place of the lines themselves.
+
+Args:
+    path (str): Path to the file
+    offset (int): Byte offset of the first line in the range
+    length (int): Number of bytes in the range
+"""
+
+
+FileTask = namedtuple('FileTask', ['path', 'chunk_size'])
+"""A whole file handed to one worker process, which streams and parses it itself.
+
+Args:
+    path (str): Path to the file
+    chunk_size (int): The number of bytes each readlines() call will attempt to consume
+"""
+
+
+WorkerError = namedtuple('WorkerError', ['name', 'error'])
+"""Sent by a worker process in place of its exit marker when an exception ends it.
+
+Args:
+    name (Any): The identifier of the process
+    error (str): The type and message of the exception
+"""
+
+
+def resolve_paths(path) -> list:
+    """Expand a path, directory, glob pattern or list of these into the files to read, largest first
+
+    Args:
+        path (str | list(str)): Paths to files or directories, or glob patterns. Directories are expanded to the json files they contain.
+
+    Raises:
+        InvalidPathError: When there is more than one file and one of them does not exist
+
+    Returns:
+        list(str): Absolute paths to files, sorted by size with the largest first when there is more than one
+    """
+    if isinstance(path, str):
+        path = [path]
+
+    paths = []
+    for entry in path:
+        if os.path.isdir(entry):
+            paths += sorted(os.path.join(entry, name) for name in os.listdir(entry)
+                            if is_json_path(name) and os.path.isfile(os.path.join(entry, name)))
+        elif any(char in entry for char in '*?['):
+            paths += sorted(match for match in glob.glob(entry) if os.path.isfile(match))
+        else:
+            paths.append(entry)
+
+    # Absolute paths identify the chunks of a file however it was given, so a checkpoint resumes with any spelling of its path
+    paths = list(OrderedDict.fromkeys(os.path.abspath(path) for path in paths))
+    if len(paths) > 1:
+        try:
+            paths.sort(key=os.path.getsize, reverse=True)
+        except OSError as e:
+            raise InvalidPathError('File not found: {}'.format(e.filename)) from e
+    return paths
+
+
+def partition_file(file_name: str, chunk_size: int=DEFAULT_CHUNK_SIZE, limit: int=None) -> list:
+    """Split a file into newline aligned byte ranges using a memory map, no lines are read by this function.
+
+    Args:
+        file_name (str): Path to the file
+        chunk_size (int, optional): The approximate number of bytes in each range. Defaults to DEFAULT_CHUNK_SIZE.
+        limit (int, optional): Only partition the bytes before this offset, which should follow a newline. When None the whole file is partitioned. Defaults to None.
+
+    Returns:
+        list(ByteRange): Ranges covering the whole file, each range ends on a newline or at the end of the file
+    """
+    ranges = []
+    with open(file_name, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if limit is not None:
+            size = min(size, limit)
+        if size == 0:
+            return ranges
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            start = 0
+            while start < size:
+                end = min(start + chunk_size, size)
+                if end < size:
+                    newline = mapping.find(b'\n', end - 1, size)
+                    end = size if newline == -1 else newline + 1
+                ranges.append(ByteRange(file_name, start, end - start))
+                start = end
+    return ranges
+
+
+def read_byte_range(mapping: mmap.mmap, byte_range: ByteRange) -> list:
+    """Read the lines inside a byte range from a memory mapped file
+
+    Args:
+        mapping (mmap.mmap): The memory mapped file
+        byte_range (ByteRange): The range to read, produced by partition_file
+
+    Returns:
+        list(bytes): A list of lines, without line endings
+    """
+    lines = mapping[byte_range.offset:byte_range.offset + byte_range.length].split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+class EventPrefilter:
+    """Byte level check for the event type of a raw line, so lines no data function will use are never decoded.
+    Matching is exact for event types written without escape sequences, lines it accepts are still checked after decoding.
+
+    Args:
+        event_types (iterable(str)): The event types that should be decoded
+    """
+    def __init__(self, event_types):
+        self.event_types = sorted(event_types)
+        alternatives = '|'.join(re.escape(event_type) for event_type in self.event_types)
+        pattern = r'"event_type"\s*:\s*"(?:{})"'.format(alternatives)
+        self.patterns = {
+            bytes: re.compile(pattern.encode()),
+            str: re.compile(pattern)
+        }
+
+    def search_fn(self, line_type: type):
+        """Get the search function for lines of the given type
+
+        Args:
+            line_type (type): bytes or str
+
+        Returns:
+            (bytes | str) -> Match | None: Returns a match when the line should be decoded
+        """
+        return self.patterns[line_type].search
+
+
+def build_prefilter(fn_list: list) -> EventPrefilter:
+    """Build a prefilter from the event types declared by each data function
+
+    Args:
+        fn_list (list(dict -> None)): Data functions, event restricted functions have an event_types attribute
+
+    Returns:
+        EventPrefilter | None: None when any function needs every event
+    """
+    event_types = set()
+    for fn in fn_list:
+        fn_events = getattr(fn, 'event_types', None)
+        if fn_events is None:
+            return None
+        event_types.update(fn_events)
+    return EventPrefilter(event_types)
+
+
+def parse_lines(lines: list, fn_list: list, name: str='main', loads=json.loads, prefilter: EventPrefilter=None, extractor: FieldExtractor=None, stats: dict=None) -> None:
+    """Decode each line as JSON and apply every function in fn_list to the results.
+    Functions with a takes_chunk attribute are called once with every decoded line, the rest are called once per line.
+
+    Args:
+        lines (list(str | bytes)): Lines from the file
+        fn_list (list(dict -> None | list(dict) -> None)): Functions applied to the decoded lines
+        name (str, optional): Name of the thread or process used in log messages. Defaults to 'main'.
+        loads (bytes | str -> Any, optional): The JSON decoding function, must accept trailing whitespace. Defaults to json.loads.
+        prefilter (EventPrefilter, optional): Lines are only decoded when the prefilter matches them. Defaults to None.
+        extractor (FieldExtractor, optional): Extracts the required fields directly, lines it cannot handle are decoded with loads. Defaults to None.
+        stats (dict(str, int), optional): Counts of lines taking the extractor fast path and the fallback are added to this dict. Defaults to None.
+    """
+    if prefilter is not None and lines:
+        search = prefilter.search_fn(type(lines[0]))
+        lines = [line for line in lines if search(line)]
+
+    fast_path = 0
+    events = []
+    for line in lines:
+        try:
+            parsed_json = None
+            if extractor is not None:
+                parsed_json = extractor.extract(line)
+            if parsed_json is None:
+                parsed_json = loads(line)
+            else:
+                fast_path += 1
+            events.append(parsed_json)
+        except ValueError as e:
+            logger.exception('JSON decode error encountered in: {}. Exception: {}'.format(name, e))
+
+    # A data function failing on a bad value skips the event, or the chunk for a chunk function, rather than stopping the worker
+    for fn in fn_list:
+        if getattr(fn, 'takes_chunk', False):
+            try:
+                fn(events)
+            except (ValueError, TypeError) as e:
+                logger.exception('Data function {} failed on a chunk of {} events in: {}. Exception: {}'.format(getattr(fn, '__name__', fn), len(events), name, e))
+            continue
+        for parsed_json in events:
+            try:
+                fn(parsed_json)
+            except (ValueError, TypeError) as e:
+                logger.exception('Data function {} failed on an event in: {}. Exception: {}'.format(getattr(fn, '__name__', fn), name, e))
+
+    if extractor is not None and stats is not None:
+        stats['fast_path'] = stats.get('fast_path', 0) + fast_path
+        stats['fallback'] = stats.get('fallback', 0) + len(lines) - fast_path
+
+
+def tree_merge(partials: list):
+    """Combine partial data collectors by merging them in pairs until one remains
+
+    Args:
+        partials (list(DataCollector)): Partial results from the worker processes, each is merged in place
+
+    Returns:
+        DataCollector | None: The combined result, or None when partials is empty
+    """
+    while len(partials) > 1:
+        merged = []
+        for i in range(0, len(partials) - 1, 2):
+            partials[i].merge(partials[i + 1])
+            merged.append(partials[i])
+        if len(partials) % 2 == 1:
+            merged.append(partials[-1])
+        partials = merged
+    return partials[0] if partials else None
+
+
+class MappedFiles:
+    """Lazily memory maps files for reading byte ranges, each process keeps its own instance.
+    Ranges of compressed frames are decompressed and whole files are streamed rather than mapped.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def iter_chunk(self, chunk):
+        """Get the lines of a queued chunk
+
+        Args:
+            chunk (list(bytes) | ByteRange | FrameRange | FileTask): Lines, a range of a file to read them from, or a whole file
+
+        Yields:
+            list(bytes): A list of lines
+        """
+        if isinstance(chunk, ByteRange):
+            yield self.read(chunk)
+        elif isinstance(chunk, FrameRange):
+            yield read_frame_range(chunk)
+        elif isinstance(chunk, FileTask):
+            yield from stream_file_chunks(chunk.path, chunk_size=chunk.chunk_size)
+        else:
+            yield chunk
+
+    def read(self, byte_range: ByteRange) -> list:
+        """Read the lines in a byte range, mapping the file on first use
+
+        Args:
+            byte_range (ByteRange): The range to read
+
+        Returns:
+            list(bytes): A list of lines
+        """
+        mapping = self.files.get(byte_range.path, None)
+        if mapping is None:
+            with open(byte_range.path, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.files[byte_range.path] = mapping
+        return read_byte_range(mapping, byte_range)
+
+    def close(self) -> None:
+        """Close every open memory map
+        """
+        for mapping in self.files.values():
+            mapping.close()
+        self.files = {}
+
+
+def complete_lines_end(file_name: str) -> int:
+    """Find the end of the last complete line in a file, so a line still being written is not read
+
+    Args:
+        file_name (str): Path to the file
+
+    Returns:
+        int: The offset after the last newline, 0 when the file holds no complete line
+    """
+    with open(file_name, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            return mapping.rfind(b'\n', 0, size) + 1
+
+
+class FileFollower:
+    """Read the lines appended to a growing file, like tail -F. The file is kept open between reads, 
+    when it is replaced (log rotation) the remainder of the old file is read before the new file is opened from the start,
+    when it shrinks (truncation) it is read again from the start.
+
+    Args:
+        file_name (str): Path to the file
+        offset (int, optional): Byte offset to begin reading from, this should follow a newline. Defaults to 0.
+        chunk_size (int, optional): The maximum number of bytes consumed by each read. Defaults to DEFAULT_CHUNK_SIZE.
+    """
+    def __init__(self, file_name: str, offset: int=0, chunk_size: int=DEFAULT_CHUNK_SIZE):
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        self.file = open(file_name, 'rb')
+        self.file.seek(offset)
+
+    def read_lines(self) -> list:
+        """Read complete lines appended since the last call, a partial last line is kept until its newline is written
+
+        Returns:
+            list(bytes): A list of lines, without line endings, empty when nothing new has been written
+        """
+        data = self.file.read(self.chunk_size)
+        if not data:
+            if self.check_replaced():
+                return self.read_lines()
+            return []
+
+        data = self.buffer + data
+        newline = data.rfind(b'\n')
+        if newline == -1:
+            self.buffer = data
+            return []
+        self.buffer = data[newline + 1:]
+        return data[:newline].split(b'\n')
+
+    def check_replaced(self) -> bool:
+        """Reopen the file when it has been rotated, or rewind it when it has been truncated. Only called once the open file has been read to the end.
+
+        Returns:
+            bool: True when reading should start again from the beginning of a file
+        """
+        try:
+            stat = os.stat(self.file_name)
+        except FileNotFoundError:
+            # Rotated away, the new file has not been created yet
+            return False
+
+        if stat.st_ino != os.fstat(self.file.fileno()).st_ino:
+            logger.info('File rotated, reopening: {}'.format(self.file_name))
+            self.file.close()
+            self.file = open(self.file_name, 'rb')
+        elif stat.st_size < self.file.tell():
+            logger.info('File truncated, reading from the start: {}'.format(self.file_name))
+            self.file.seek(0)
+        else:
+            return False
+
+        if self.buffer:
+            logger.warning('Discarding an incomplete line at the end of the previous file: {}'.format(self.buffer[:100]))
+        self.buffer = b''
+        return True
+
+    def close(self) -> None:
+        """Close the file
+        """
+        self.file.close()
+
+
+class SnapshotPublisher:
+    """Hand out consistent copies of a data collector that is being updated by ParseFile.follow.
+    Each snapshot is a deep copy, so readers never see a partially applied chunk. ComputeData instances built from a snapshot subscribe to the updates.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.snapshot = None
+        self.subscribers = []
+
+    def publish(self, data_collector) -> None:
+        """Copy the data collector and notify subscribers of the new copy
+
+        Args:
+            data_collector (DataCollector): The live data collector, it must not be modified during this call
+        """
+        snapshot = deepcopy(data_collector)
+        snapshot.publisher = self
+        with self.lock:
+            self.snapshot = snapshot
+            self.subscribers = [ref for ref in self.subscribers if ref() is not None]
+            callbacks = [ref() for ref in self.subscribers]
+        self.ready.set()
+        for callback in callbacks:
+            if callback is not None:
+                callback(snapshot)
+
+    def subscribe(self, callback) -> None:
+        """Call a method with each new snapshot. Only a weak reference is held, so subscribing does not keep the owner alive.
+
+        Args:
+            callback (method): A bound method taking the snapshot as its only argument
+        """
+        with self.lock:
+            self.subscribers.append(weakref.WeakMethod(callback))
+
+    def latest(self):
+        """Get the most recent snapshot
+
+        Returns:
+            DataCollector | None: The snapshot, None before the first is published
+        """
+        with self.lock:
+            return self.snapshot
+
+
 def stream_read_json(fname: str):
     """Lazy read json generator inspiration for the stream_file_chunks solution (Not used).
     https://stackoverflow.com/questions/6886283/how-i-can-i-lazily-read-multiple-json-values-from-a-file-stream-in-python
@@ -54,35 +489,127 @@ class ParseFile:
     """Fast file reading class
 
     Args:
-        path (str, optional): Path to the file. Defaults to None.
-        chunk_size (int, optional): The number of bytes each readlines() call will attempt to consume. Defaults to 5000000.
+        path (str | list(str), optional): Path to the file, or a list of files, directories and glob patterns. Defaults to None.
+        chunk_size (int, optional): The number of bytes each readlines() call will attempt to consume. Defaults to DEFAULT_CHUNK_SIZE.
+        use_mmap (bool, optional): Memory map the file and hand out newline aligned byte ranges instead of lines. Defaults to False.
+        decoder (str, optional): Name of the JSON decoder to use, when None the fastest installed decoder is selected. Defaults to None.
+        extract_fields (bool, optional): Extract only the fields the data functions need instead of decoding each line. When None this is enabled if the stdlib json decoder is in use, as the C decoders are faster. Defaults to None.
+        tune_chunks (bool, optional): Adjust the size of streamed chunks to the measured throughput of the workers, starting from chunk_size. Defaults to True.
     """
 
-    def __init__(self, path: str=None,  chunk_size: int=5000000):
+    def __init__(self, path: str=None,  chunk_size: int=DEFAULT_CHUNK_SIZE, use_mmap: bool=False, decoder: str=None, extract_fields: bool=None, tune_chunks: bool=True):
+        self.file_iter = None
+        self.paths = []
+        self.tune_chunks = tune_chunks
+        self.tuner = None
         if path is not None:
-            self.file_iter = stream_file_chunks(path, chunk_size=chunk_size)
+            self.set_read_path(path, chunk_size=chunk_size)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.use_mmap = use_mmap
+        self.decoder = get_decoder(decoder)
+        if extract_fields is None:
+            extract_fields = self.decoder.name == 'json'
+        self.extract_fields = extract_fields
+
+
+    def set_read_path(self, path: str, chunk_size: int=DEFAULT_CHUNK_SIZE) -> None:
+        """Specify the path for LocationViews to read from
+
+        Args:
+            path (str | list(str)): Path to the datafile, or a list of files, directories and glob patterns
+            chunk_size (int, optional): The number of bytes each readlines() call will attempt to consume. Defaults to DEFAULT_CHUNK_SIZE.
+        """
+        self.paths = resolve_paths(path)
+        self.tuner = ChunkSizeTuner(chunk_size) if self.tune_chunks else None
+        read_size = chunk_size if self.tuner is None else self.tuner
+        if len(self.paths) == 1:
+            self.file_iter = stream_file_chunks(self.paths[0], chunk_size=read_size)
+        elif len(self.paths) > 1:
+            self.file_iter = (chunk for file_path in self.paths for chunk in stream_file_chunks(file_path, chunk_size=read_size))
         else:
             self.file_iter = None
         self.path = path
+        self.chunk_size = chunk_size
 
+    def file_ranges(self, path: str, use_mmap: bool=None) -> list:
+        """Split a file into ranges that worker processes can read independently
 
-    def set_read_path(self, path: str, chunk_size: int=5000000) -> None:
-        """Specify the path for LocationViews to read from
+        Args:
+            path (str): Path to the file
+            use_mmap (bool, optional): Partition uncompressed files into byte ranges, when None self.use_mmap is used. Defaults to None.
+
+        Returns:
+            list(ByteRange | FrameRange) | None: The ranges, None when the file must be read as one stream
+        """
+        codec = compression_of(path)
+        if codec is not None:
+            ranges = partition_frames(path, codec, chunk_size=self.chunk_size)
+            if ranges is None:
+                logger.info('{} compressed file has no frame index, decompressing as a single stream: {}'.format(codec, path))
+            else:
+                logger.debug('Compressed file partitioned into {} frame ranges: {}'.format(len(ranges), path))
+            return ranges
+        if use_mmap is None:
+            use_mmap = self.use_mmap
+        if use_mmap:
+            ranges = partition_file(path, chunk_size=self.chunk_size)
+            logger.debug('File partitioned into {} byte ranges: {}'.format(len(ranges), path))
+            return ranges
+        return None
+
+    def chunks(self, identifiable: bool=False):
+        """Get the chunks to process. A single file that cannot be split is streamed by this process,
+        with several files each one that cannot be split is handed to a worker whole, largest first.
 
         Args:
-            path (str): Path to the datafile
-            chunk_size (int, optional): The number of bytes each readlines() call will attempt to consume. Defaults to 5000000.
+            identifiable (bool, optional): Only produce chunks that identify the bytes they cover, so they can be recorded by a checkpoint.
+                Uncompressed files are always partitioned into byte ranges and files that cannot be split are handed out whole. Defaults to False.
+
+        Returns:
+            iterable(list(bytes) | ByteRange | FrameRange | FileTask): The chunks to queue
         """
-        self.file_iter = stream_file_chunks(path, chunk_size=chunk_size)
+        if len(self.paths) == 1 and not identifiable:
+            ranges = self.file_ranges(self.paths[0])
+            return self.file_iter if ranges is None else ranges
+
+        chunks = []
+        for path in self.paths:
+            ranges = self.file_ranges(path, use_mmap=self.use_mmap or identifiable)
+            if ranges is None:
+                chunks.append(FileTask(path, self.chunk_size))
+            else:
+                chunks += ranges
+        return chunks
+
+    def parsers(self, data_collector) -> tuple:
+        """Build the prefilter and field extractor for the data functions of a data collector
+
+        Args:
+            data_collector (DataCollector): The data collector being populated
+
+        Returns:
+            (EventPrefilter | None, FieldExtractor | None): The prefilter and extractor, None when they cannot be used
+        """
+        logger.info('Using JSON decoder: {}'.format(self.decoder.name))
+        prefilter = build_prefilter(data_collector.data_fns)
+        if prefilter is not None:
+            logger.info('Only decoding events of type: {}'.format(prefilter.event_types))
+        extractor = build_extractor(data_collector.data_fns) if self.extract_fields else None
+        if extractor is not None:
+            logger.info('Extracting fields: {}'.format(extractor.fields))
+        return prefilter, extractor
 
     #@debug
-    def parse_file(self, data_collector, concurrent: bool=True, max_workers: int=None) -> None:
+    def parse_file(self, data_collector, concurrent: bool=True, max_workers: int=None, merge_every: int=None, checkpoint: Checkpoint=None) -> None:
         """Apply a list of functions to the file_iter
 
         Args:
             data_collector(DataCollector): A data collection class used to collate all the data.
             concurrent(bool, optional): Enable concurrency when reading. Defaults to True.
             max_workers (int, optional): The max number of workers to process the file input. Defaults to None.
+            merge_every (int, optional): Number of chunks each worker processes before sending back a partial result, when None each worker sends one result after the queue drains. Defaults to None.
+            checkpoint (Checkpoint, optional): Periodically save progress, when resuming the chunks it records are skipped. Defaults to None.
 
 
         Raises:
@@ -93,28 +620,117 @@ class ParseFile:
             raise AttributeError('File iterator not set')
 
         logger.debug('Begin reading file: {}'.format(self.path))
+        if len(self.paths) > 1:
+            logger.info('Reading {} files'.format(len(self.paths)))
+        if checkpoint is None:
+            chunks = self.chunks()
+        else:
+            chunks = self.chunks(identifiable=True)
+            done = checkpoint.start(data_collector, self.paths, self.chunk_size)
+            chunks = [chunk for chunk in chunks if chunk not in done]
+            logger.info('Checkpointing to: {} | Chunks to parse: {}'.format(checkpoint.path, len(chunks)))
+        self.parse_chunks(chunks, data_collector, concurrent=concurrent, max_workers=max_workers, merge_every=merge_every, checkpoint=checkpoint)
+
+        if data_collector.parse_stats:
+            logger.info('Lines using the field extractor: {} | Lines decoded as JSON: {}'.format(
+                data_collector.parse_stats.get('fast_path', 0), data_collector.parse_stats.get('fallback', 0)))
+        logger.debug('End reading file: {}'.format(self.path))
+
+    def parse_chunks(self, chunks, data_collector, concurrent: bool=True, max_workers: int=None, merge_every: int=None, checkpoint: Checkpoint=None) -> None:
+        """Parse chunks into the data collector, either in worker processes or in this thread
+
+        Args:
+            chunks (iterable(list(bytes) | ByteRange | FrameRange | FileTask)): The chunks to parse
+            data_collector(DataCollector): A data collection class used to collate all the data.
+            concurrent(bool, optional): Enable concurrency when reading. Defaults to True.
+            max_workers (int, optional): The max number of workers to process the file input. Defaults to None.
+            merge_every (int, optional): Number of chunks each worker processes before sending back a partial result. Defaults to None.
+            checkpoint (Checkpoint, optional): Records parsed chunks, the chunks must be identifiable. Defaults to None.
+        """
+        prefilter, extractor = self.parsers(data_collector)
+
         if concurrent:
             logger.info('Multiprocessing has been enabled in FileRead.parse_file.')
-            with JsonProcessContextManager(data_collector, max_workers) as jtcm:
-                for chunk in self.file_iter:
+            if checkpoint is not None and merge_every is None:
+                merge_every = CHECKPOINT_MERGE_EVERY
+            with JsonProcessContextManager(data_collector, max_workers, merge_every=merge_every, decoder=self.decoder.name,
+                                           extract_fields=extractor is not None, checkpoint=checkpoint, tuner=self.tuner) as jtcm:
+                for chunk in chunks:
                     jtcm.enqueue(chunk)
                 logger.debug('Finished queueing chunks')
 
         else:
-            for chunk in self.file_iter:
-                start_time = time.time()
-                for line in chunk:
-                    try:
-                        json_line = line.rstrip()
-                        parsed_json = json.loads(json_line)
-                        [fn(parsed_json) for fn in data_collector.data_fns]
-                    except json.JSONDecodeError as e:
-                        logger.exception(
-                            'JSON decode error encountered in thread: main. Exception: {}'.format(e))
-                duration = time.time() - start_time
-                logger.debug('Thread <{}>... one chunk processed. Duration: {} | Chunk size: {}'.format(threading.current_thread(), duration, len(chunk)))
+            mapped_files = MappedFiles()
+            for chunk in chunks:
+                for lines in mapped_files.iter_chunk(chunk):
+                    start_time = time.time()
+                    parse_lines(lines, data_collector.data_fns, loads=self.decoder.loads, prefilter=prefilter, extractor=extractor, stats=data_collector.parse_stats)
+                    duration = time.time() - start_time
+                    if self.tuner is not None:
+                        self.tuner.record(ChunkStats(sum(map(len, lines)), duration))
+                    logger.debug('Thread <{}>... one chunk processed. Duration: {} | Chunk size: {}'.format(threading.current_thread(), duration, len(lines)))
+                if checkpoint is not None:
+                    checkpoint.record([chunk])
+                    if checkpoint.due():
+                        checkpoint.save(data_collector)
+            mapped_files.close()
+            if checkpoint is not None:
+                checkpoint.save(data_collector)
+
+    def follow(self, data_collector, publisher: SnapshotPublisher=None, concurrent: bool=True, max_workers: int=None,
+               poll_interval: float=1.0, publish_interval: float=5.0, stop_event: threading.Event=None) -> None:
+        """Parse the file, then keep it open and parse lines as they are appended until stop_event is set.
+        The existing contents are partitioned into byte ranges and parsed like parse_file, appended lines are parsed by this thread,
+        so only the new bytes are read on each update. Rotation and truncation of the file are handled by FileFollower.
 
-        logger.debug('End reading file: {}'.format(self.path))
+        Args:
+            data_collector(DataCollector): The live data collector, only this thread modifies it.
+            publisher (SnapshotPublisher, optional): Receives a snapshot after the initial load, then at most every publish_interval seconds when lines have been added. Defaults to None.
+            concurrent(bool, optional): Enable concurrency when reading the existing contents. Defaults to True.
+            max_workers (int, optional): The max number of workers to process the existing contents. Defaults to None.
+            poll_interval (float, optional): Seconds to wait when no new lines have been written. Defaults to 1.0.
+            publish_interval (float, optional): Minimum number of seconds between snapshots. Defaults to 5.0.
+            stop_event (threading.Event, optional): Set to stop following, when None the file is followed until the process exits. Defaults to None.
+
+        Raises:
+            ValueError: When the path is not a single uncompressed file
+        """
+        if len(self.paths) != 1 or compression_of(self.paths[0]) is not None:
+            raise ValueError('Follow mode reads a single uncompressed file, got: {}'.format(self.path))
+        if stop_event is None:
+            stop_event = threading.Event()
+
+        path = self.paths[0]
+        offset = complete_lines_end(path)
+        logger.debug('Begin following file: {} | Initial bytes: {}'.format(path, offset))
+        self.parse_chunks(partition_file(path, chunk_size=self.chunk_size, limit=offset), data_collector, concurrent=concurrent, max_workers=max_workers)
+        if publisher is not None:
+            data_collector.finalise()
+            publisher.publish(data_collector)
+
+        prefilter, extractor = self.parsers(data_collector)
+        follower = FileFollower(path, offset=offset, chunk_size=self.chunk_size)
+        last_publish = time.time()
+        pending = False
+        try:
+            while not stop_event.is_set():
+                lines = follower.read_lines()
+                if lines:
+                    parse_lines(lines, data_collector.data_fns, loads=self.decoder.loads, prefilter=prefilter, extractor=extractor, stats=data_collector.parse_stats)
+                    pending = True
+                if pending and publisher is not None and time.time() - last_publish >= publish_interval:
+                    data_collector.finalise()
+                    publisher.publish(data_collector)
+                    last_publish = time.time()
+                    pending = False
+                if not lines:
+                    stop_event.wait(poll_interval)
+            if pending and publisher is not None:
+                data_collector.finalise()
+                publisher.publish(data_collector)
+        finally:
+            follower.close()
+        logger.debug('End following file: {}'.format(path))
 
 class JsonProcessContextManager():
     """Context manager to assist processing large files with processes
@@ -122,26 +738,65 @@ class JsonProcessContextManager():
         Args:
             data_collector (DataCollector): An instance of the DataCollector class
             max_workers (int): The number of processes to instantiate
+            merge_every (int, optional): Number of chunks each worker processes before sending back a partial result. Defaults to None.
+            decoder (str, optional): Name of the JSON decoder each process should use. Defaults to None.
+            extract_fields (bool, optional): Use a FieldExtractor in each process. Defaults to False.
+            checkpoint (Checkpoint, optional): Partial results are merged and saved to the checkpoint as they arrive, once its interval has passed. Defaults to None.
+            queue_size (int, optional): The number of chunks the work queue holds, queueing blocks while it is full. When None this is twice the number of processes. Defaults to None.
+            tuner (ChunkSizeTuner, optional): Receives the throughput of each process and the depth of the work queue. Defaults to None.
         """
-    def __init__(self, data_collector, max_workers=None):
+    def __init__(self, data_collector, max_workers=None, merge_every=None, decoder=None, extract_fields=False, checkpoint=None, queue_size=None, tuner=None):
         if max_workers is None:
             max_workers = cpu_count()
+        if queue_size is None:
+            queue_size = 2 * max_workers
 
         self.data_collector = data_collector
+        self.checkpoint = checkpoint
+        self.tuner = tuner
+        self.pending = []
+        self.running = max_workers
 
-        self.queue = JoinableQueue()
+        self.queue = JoinableQueue(maxsize=queue_size)
         self.feedback_queue = JoinableQueue()
-        self.processes = [JsonParseProcess(i, self.data_collector, self.queue, self.feedback_queue) for i in range(max_workers)]
+        self.processes = [JsonParseProcess(i, self.data_collector, self.queue, self.feedback_queue, merge_every=merge_every, decoder=decoder,
+                                           extract_fields=extract_fields, report_stats=tuner is not None) for i in range(max_workers)]
         
 
     def enqueue(self, chunk: list) -> None:
-        """Add a chunk to the queue to be processed by consumer processes
+        """Add a chunk to the queue to be processed by consumer processes, blocking while the queue is full.
+        Feedback from the processes is handled while waiting, so partial results and throughput measurements do not build up.
 
         Args:
-            chunk (list(str)): A chunk produced by the stream_file_chunks function
+            chunk (list(str) | ByteRange | FrameRange | FileTask): A chunk produced by the stream_file_chunks function, a range produced by partition_file or partition_frames, or a whole file
+
+        Raises:
+            RuntimeError: When every process has exited, so the chunk can never be consumed, or a process has failed
         """
         #logger.debug("Enqueuing a chunk | Chunk lines: {}".format(len(chunk)))
-        self.queue.put(chunk)
+        if self.tuner is not None:
+            self.tuner.observe_queue(self.queue_depth())
+        while True:
+            self.drain_feedback()
+            try:
+                self.queue.put(chunk, timeout=FEEDBACK_POLL_SECONDS)
+                return
+            except Full:
+                if not any(process.is_alive() for process in self.processes):
+                    # Report the error that ended a process when one was sent
+                    self.drain_feedback()
+                    raise RuntimeError('Every worker process has exited')
+
+    def queue_depth(self) -> int:
+        """Get the number of chunks waiting in the work queue
+
+        Returns:
+            int | None: The approximate depth, None on platforms that cannot report it
+        """
+        try:
+            return self.queue.qsize()
+        except NotImplementedError:
+            return None
 
     def __enter__(self):
         logger.debug("Entering context manager")
@@ -150,29 +805,92 @@ class JsonProcessContextManager():
 
     def __exit__(self, exception_type, exception_value, traceback):
         if exception_value is not None:
-            logger.exception('Exception when leaving context manager: {} | Traceback: {}{'.format(exception_type, traceback))
+            logger.exception('Exception when leaving context manager: {} | Traceback: {}'.format(exception_type, traceback))
+            for process in self.processes:
+                process.terminate()
+            return
+
+        for _ in self.processes:
+            self.enqueue(None)
 
-        retrieve_data = Thread(target=self.retrieve_data, daemon=True)
-        retrieve_data.start()
+        try:
+            self.retrieve_data()
+        except BaseException:
+            # Keep the results that did arrive, so a checkpoint records them before the error propagates.
+            # A failed process leaves its chunk unfinished, so the queue is never joined
+            for process in self.processes:
+                process.terminate()
+            self.merge_pending()
+            raise
 
         self.queue.join()
-        self.feedback_queue.join()
         logger.debug('Queues flushed')
-        
+
         for process in self.processes:
-            process.terminate()
+            process.join()
 
-    def retrieve_data(self):
-        """Start reading data from feedback queue while waiting for json queue to finish
+        self.merge_pending()
+
+    def retrieve_data(self) -> None:
+        """Read feedback from the processes until every process has drained
+
+        Raises:
+            RuntimeError: When a process has failed
+        """
+        while self.running > 0:
+            self.handle_feedback(self.feedback_queue.get())
+            self.feedback_queue.task_done()
+
+    def drain_feedback(self) -> None:
+        """Handle the feedback that has already arrived, without waiting for more
         """
         while True:
-            result = self.feedback_queue.get()
-            if result is None:
-                break
-            self.data_collector.merge(result)
-            #self.new_collectors.append(result)
+            try:
+                result = self.feedback_queue.get_nowait()
+            except Empty:
+                return
+            self.handle_feedback(result)
             self.feedback_queue.task_done()
-        self.feedback_queue.task_done()
+
+    def handle_feedback(self, result) -> None:
+        """Handle one message from a process. Partial results are held in self.pending until merged,
+        when checkpointing they are merged and saved each time the checkpoint interval passes.
+
+        Args:
+            result ((DataCollector, list) | ChunkStats | WorkerError | None): A partial result with the chunks it covers, a throughput measurement,
+                the error that ended a process, or None when a process exits
+
+        Raises:
+            RuntimeError: When the result is the error that ended a process
+        """
+        if result is None:
+            self.running -= 1
+        elif isinstance(result, WorkerError):
+            self.running -= 1
+            raise RuntimeError('Process {} failed: {}'.format(result.name, result.error))
+        elif isinstance(result, ChunkStats):
+            if self.tuner is not None:
+                self.tuner.record(result)
+        else:
+            self.pending.append(result)
+            if self.checkpoint is not None and self.checkpoint.due():
+                self.merge_pending()
+
+    def merge_pending(self) -> None:
+        """Merge the pending partial results into the data collector, and record them in the checkpoint
+        """
+        partials = [collector for collector, _ in self.pending]
+        start_time = time.time()
+        result = tree_merge(partials)
+        if result is not None:
+            self.data_collector.merge(result)
+        logger.debug('Merged {} partial results. Duration: {}'.format(len(partials), time.time() - start_time))
+
+        if self.checkpoint is not None:
+            for _, chunks in self.pending:
+                self.checkpoint.record(chunks)
+            self.checkpoint.save(self.data_collector)
+        self.pending = []
 
 
 class JsonParseProcess(Process):
@@ -183,14 +901,40 @@ class JsonParseProcess(Process):
         data_collector (DataCollector): A data collector object that will be written back to after reading is complete
         queue (JoinableQueue): A multiprocessing JoinableQueue, this process will consume elements in the queue
         feedback_queue (JoinableQueue): A multiprocessing JoinableQueue, this process will produce elements for this queue
+        merge_every (int, optional): Number of chunks to accumulate before sending a partial result, when None a result is only sent once the queue drains. Defaults to None.
+        decoder (str, optional): Name of the JSON decoder to use. Defaults to None.
+        extract_fields (bool, optional): Use a FieldExtractor instead of decoding whole lines. Defaults to False.
+        report_stats (bool, optional): Send a ChunkStats measurement to the feedback queue after each chunk. Defaults to False.
     """
-    def __init__(self, name, data_collector, queue: JoinableQueue, feedback_queue: JoinableQueue):
+    def __init__(self, name, data_collector, queue: JoinableQueue, feedback_queue: JoinableQueue, merge_every: int=None, decoder: str=None, extract_fields: bool=False, report_stats: bool=False):
         super(Process, self).__init__()
         self.t_name = name
-        self.data_collector = deepcopy(data_collector)
-        self.fn_list = self.data_collector.data_fns
+        self.template = deepcopy(data_collector)
+        self.template.clear()
+        self.new_collector()
         self.feedback_queue = feedback_queue
         self.queue = queue
+        self.merge_every = merge_every
+        self.decoder = decoder
+        self.extract_fields = extract_fields
+        self.report_stats = report_stats
+        self.chunks_collected = []
+        self.mapped_files = MappedFiles()
+
+    def new_collector(self) -> None:
+        """Start accumulating into an empty copy of the data collector
+        """
+        self.data_collector = deepcopy(self.template)
+        self.fn_list = self.data_collector.data_fns
+
+    def send_partial(self) -> None:
+        """Send the locally accumulated data to the parent process, with the chunks it covers, and start a new collector
+        """
+        if not self.chunks_collected:
+            return
+        self.feedback_queue.put((self.data_collector, self.chunks_collected))
+        self.chunks_collected = []
+        self.new_collector()
 
     def set_queue(self, queue: JoinableQueue):
         """Assign a reference to the queue to consume from
@@ -208,30 +952,34 @@ class JsonParseProcess(Process):
         """Begin the process
         """
         logger.debug('Process: {} - running'.format(self.t_name))
+        loads = get_decoder(self.decoder).loads
+        prefilter = build_prefilter(self.fn_list)
+        extractor = build_extractor(self.fn_list) if self.extract_fields else None
+        exit_marker = None
         try:
             while True:
                 chunk = self.queue.get()
-                logger.debug('Process <{}>... Get from queue. | Chunk lines: {}'.format(self.t_name, len(chunk)))
 
                 if chunk is None:
                     logger.debug('PROCESS BREAKING FROM WHILE LOOP')
+                    self.send_partial()
                     break
                 start_time = time.time()
+                n_bytes = 0
+
+                for lines in self.mapped_files.iter_chunk(chunk):
+                    logger.debug('Process <{}>... Get from queue. | Chunk lines: {}'.format(self.t_name, len(lines)))
+                    parse_lines(lines, self.fn_list, name='Process {}'.format(self.t_name), loads=loads, prefilter=prefilter,
+                                extractor=extractor, stats=self.data_collector.parse_stats)
+                    if self.report_stats:
+                        n_bytes += sum(map(len, lines))
+                if self.report_stats:
+                    self.feedback_queue.put(ChunkStats(n_bytes, time.time() - start_time))
+                # Lines streamed by the parent cannot be identified, they are only counted
+                self.chunks_collected.append(chunk if isinstance(chunk, tuple) else None)
+                if self.merge_every is not None and len(self.chunks_collected) >= self.merge_every:
+                    self.send_partial()
 
-                for line in chunk:
-                    try:
-                        json_line = line.rstrip()
-                        parsed_json = json.loads(json_line)
-                        [fn(parsed_json) for fn in self.fn_list]
-                    except json.JSONDecodeError as e:
-                        logger.exception('JSON decode error encountered in Process: {}. Exception: {}'.format(self.t_name, e))
-
-                to_queue = deepcopy(self.data_collector)
-                
-                #logger.debug('Putting object on queue with len countries={}. Should have: {}'.format(len(to_queue.countries), len(self.data_collector.countries)))
-                self.feedback_queue.put(to_queue)
-                self.data_collector.clear()
-                
                 self.queue.task_done()
                 duration = time.time() - start_time
                 #logger.debug('Process <{}>... one chunk processed. Duration: {} | Chunk lines: {}'.format(self.t_name, duration, len(chunk)))
@@ -239,6 +987,12 @@ class JsonParseProcess(Process):
             self.queue.task_done()
             logger.debug('Process <{}>... Terminating'.format(self.t_name))
 
+        except BaseException as e:
+            exit_marker = WorkerError(self.t_name, '{}: {}'.format(type(e).__name__, e))
+            raise
+
         finally:
+            self.feedback_queue.put(exit_marker)
+            self.mapped_files.close()
             logger.debug('Process <{}>... IN FINALLY'.format(self.t_name))
 
@@ -0,0 +1,179 @@
+import functools
+
+import numpy as np
+import pycountry
+import pycountry_convert
+from pycountry_convert.convert_continent_code_to_continent_name import CONTINENT_CODE_TO_CONTINENT_NAME
+
+from DocuTrace.Utils.Cache import cached
+
+
+UNKNOWN = 'Unknown'
+# Every continent name a lookup can return, the index of a name is its continent id
+CONTINENT_NAMES = tuple(sorted(set(CONTINENT_CODE_TO_CONTINENT_NAME.values()))) + (UNKNOWN,)
+CONTINENT_IDS = {name: continent_id for continent_id, name in enumerate(CONTINENT_NAMES)}
+# Upper case two letter codes are packed into an index of the geography table
+N_CODES = 26 * 26
+NOT_PACKED = -1
+
+
+def lookup_country_name(code: str) -> str:
+    """Look up the country name of an alpha2 code
+
+    Args:
+        code (str): Country code
+
+    Returns:
+        str: Country name
+    """
+    country = pycountry.countries.get(alpha_2=code)
+    if country is None:
+        return UNKNOWN
+    else:
+        return country.name
+
+
+def lookup_continent_name(alpha2_country: str) -> str:
+    """Look up the continent name of a country
+
+    Args:
+        alpha2_country (str): Country code
+
+    Returns:
+        str: Continent name
+    """
+    try:
+        c = pycountry_convert.country_alpha2_to_continent_code(alpha2_country)
+        cont = pycountry_convert.convert_continent_code_to_continent_name(c)
+    except KeyError:
+        return UNKNOWN
+    return cont
+
+
+def pack_code(code: str) -> int:
+    """Pack an upper case two letter code into an index of the geography table
+
+    Args:
+        code (str): Country code
+
+    Returns:
+        int: The index, NOT_PACKED when the code is not two upper case letters
+    """
+    if type(code) is not str or len(code) != 2:
+        return NOT_PACKED
+    first, second = ord(code[0]) - 65, ord(code[1]) - 65
+    if 0 <= first < 26 and 0 <= second < 26:
+        return first * 26 + second
+    return NOT_PACKED
+
+
+def pack_codes(codes) -> np.ndarray:
+    """Pack many country codes into indexes of the geography table
+
+    Args:
+        codes (iterable(str)): Country codes
+
+    Returns:
+        numpy.ndarray: The index of each code, NOT_PACKED for codes that are not two upper case letters
+    """
+    codes = list(codes)
+    if not codes:
+        return np.empty(0, dtype=np.int32)
+    valid = np.fromiter((type(code) is str and len(code) == 2 for code in codes), dtype=bool, count=len(codes))
+    letters = np.array([code if is_valid else 'AA' for code, is_valid in zip(codes, valid)], dtype='<U2').view(np.uint32).reshape(-1, 2).astype(np.int32) - 65
+    valid &= ((letters >= 0) & (letters < 26)).all(axis=1)
+    return np.where(valid, letters[:, 0] * 26 + letters[:, 1], NOT_PACKED).astype(np.int32)
+
+
+@functools.lru_cache(maxsize=None)
+def geography_table() -> tuple:
+    """Build the table of every upper case two letter code once, looking each up with pycountry
+
+    Returns:
+        (numpy.ndarray, tuple(str)): The continent id and the country name of each packed code
+    """
+    continent_ids = np.empty(N_CODES, dtype=np.int8)
+    country_names = []
+    for index in range(N_CODES):
+        code = chr(65 + index // 26) + chr(65 + index % 26)
+        continent_ids[index] = CONTINENT_IDS[lookup_continent_name(code)]
+        country_names.append(lookup_country_name(code))
+    return continent_ids, tuple(country_names)
+
+
+def continent_name(alpha2_country: str) -> str:
+    """Get the continent name from the country
+
+    Args:
+        alpha2_country (str): Country code
+
+    Returns:
+        str: Continent name
+    """
+    index = pack_code(alpha2_country)
+    if index == NOT_PACKED:
+        return cached('continent_name', alpha2_country, lookup_continent_name)
+    return CONTINENT_NAMES[geography_table()[0][index]]
+
+
+def country_name(code: str) -> str:
+    """Get the country name from its alpha2 code
+
+    Args:
+        code (str): Country code
+
+    Returns:
+        str: Country name
+    """
+    index = pack_code(code)
+    if index == NOT_PACKED:
+        return cached('country_name', code, lookup_country_name)
+    return geography_table()[1][index]
+
+
+def continent_ids(codes) -> np.ndarray:
+    """Get the continent ids of many countries at once, codes outside the table are looked up individually
+
+    Args:
+        codes (iterable(str)): Country codes
+
+    Returns:
+        numpy.ndarray: The index in CONTINENT_NAMES of the continent of each country
+    """
+    codes = list(codes)
+    packed = pack_codes(codes)
+    ids = np.empty(len(codes), dtype=np.int8)
+    in_table = packed != NOT_PACKED
+    ids[in_table] = geography_table()[0][packed[in_table]]
+    for i in np.flatnonzero(~in_table).tolist():
+        ids[i] = CONTINENT_IDS.get(continent_name(codes[i]), CONTINENT_IDS[UNKNOWN])
+    return ids
+
+
+def continent_names(codes) -> list:
+    """Get the continent names of many countries at once
+
+    Args:
+        codes (iterable(str)): Country codes
+
+    Returns:
+        list(str): The continent of each country
+    """
+    return [CONTINENT_NAMES[continent_id] for continent_id in continent_ids(codes).tolist()]
+
+
+def continent_counts(country_counts: dict) -> dict:
+    """Total counts by country into counts by continent
+
+    Args:
+        country_counts (dict(str, int)): Counts keyed by country code
+
+    Returns:
+        dict(str, int): Counts keyed by continent, in the order each continent is first reached
+    """
+    if not country_counts:
+        return {}
+    ids = continent_ids(country_counts.keys())
+    totals = np.zeros(len(CONTINENT_NAMES), dtype=np.int64)
+    np.add.at(totals, ids, np.fromiter(country_counts.values(), dtype=np.int64, count=len(country_counts)))
+    return {CONTINENT_NAMES[continent_id]: int(totals[continent_id]) for continent_id in dict.fromkeys(ids.tolist())}
@@ -0,0 +1,314 @@
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# Type code of the arrays holding ids, a 32 bit signed integer on every supported platform
+ID_TYPECODE = 'i'
+
+
+def ids_to_array(ids) -> array:
+    """Copy a sequence of ids into an id array
+
+    Args:
+        ids (numpy.ndarray | iterable(int)): The ids
+
+    Returns:
+        array.array: An array of 32 bit ids
+    """
+    if isinstance(ids, np.ndarray):
+        row = array(ID_TYPECODE)
+        row.frombytes(ids.astype(np.int32, copy=False).tobytes())
+        return row
+    return array(ID_TYPECODE, ids)
+
+
+class Interner:
+    """Map strings to dense integer ids and back, each distinct string is stored once
+
+    Args:
+        values (iterable(str), optional): Strings to intern in order, so the first has id 0. Defaults to None.
+    """
+    def __init__(self, values=None):
+        self.ids = {}
+        self.values = []
+        if values is not None:
+            for value in values:
+                self.intern(value)
+
+    def intern(self, value: str) -> int:
+        """Get the id of a string, assigning the next id when it has not been seen
+
+        Args:
+            value (str): The string
+
+        Returns:
+            int: The id
+        """
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.ids[value] = value_id
+            self.values.append(value)
+        return value_id
+
+    def get_id(self, value: str, default=None) -> int:
+        """Get the id of a string without interning it
+
+        Args:
+            value (str): The string
+            default (Any, optional): Returned when the string has not been interned. Defaults to None.
+
+        Returns:
+            int: The id, or default
+        """
+        return self.ids.get(value, default)
+
+    def intern_many(self, values: list) -> np.ndarray:
+        """Get the ids of many strings, interning each distinct string once
+
+        Args:
+            values (list(str)): The strings
+
+        Returns:
+            numpy.ndarray: The id of each string
+        """
+        ids = self.ids
+        for value in dict.fromkeys(values):
+            if value not in ids:
+                ids[value] = len(self.values)
+                self.values.append(value)
+        return np.fromiter(map(ids.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def lookup(self, value_id: int) -> str:
+        """Get the string with an id
+
+        Args:
+            value_id (int): The id
+
+        Returns:
+            str: The string
+        """
+        return self.values[value_id]
+
+    def lookup_many(self, value_ids) -> list:
+        """Get the strings with each of the ids
+
+        Args:
+            value_ids (iterable(int)): The ids
+
+        Returns:
+            list(str): The strings
+        """
+        values = self.values
+        return [values[value_id] for value_id in value_ids]
+
+    def merge(self, other) -> np.ndarray:
+        """Intern every string of another interner
+
+        Args:
+            other (Interner): The interner being merged
+
+        Returns:
+            numpy.ndarray: Indexed by the ids of other, the id of the same string in self
+        """
+        return np.fromiter((self.intern(value) for value in other.values), dtype=np.int32, count=len(other.values))
+
+    def __contains__(self, value):
+        return value in self.ids
+
+    def __len__(self):
+        return len(self.values)
+
+
+class IdRelation(Mapping):
+    """A one to many relationship between interned strings, each key holds an array of value ids.
+    Read as a mapping each key string gives the list of its value strings, with a value repeated for each time its pair was added.
+    Pairs added with add_many are buffered and grouped into rows when the relationship is next read.
+
+    Args:
+        key_interner (Interner): Interns the keys
+        value_interner (Interner): Interns the values
+    """
+    def __init__(self, key_interner: Interner, value_interner: Interner):
+        self.key_interner = key_interner
+        self.value_interner = value_interner
+        self._rows = {}
+        self.pending_keys = array(ID_TYPECODE)
+        self.pending_values = array(ID_TYPECODE)
+
+    @property
+    def rows(self) -> dict:
+        """The value ids of each key id, grouping any buffered pairs first
+
+        Returns:
+            dict(int, array.array): The rows
+        """
+        if self.pending_keys:
+            self.flush()
+        return self._rows
+
+    def flush(self) -> None:
+        """Group the buffered pairs into the rows, keeping the order of the values within each key
+        """
+        key_ids = np.frombuffer(self.pending_keys, dtype=np.int32)
+        value_ids = np.frombuffer(self.pending_values, dtype=np.int32)
+        order = np.argsort(key_ids, kind='stable')
+        keys, lengths = np.unique(key_ids[order], return_counts=True)
+        values = value_ids[order]
+        del key_ids, value_ids
+        self.pending_keys = array(ID_TYPECODE)
+        self.pending_values = array(ID_TYPECODE)
+        self.extend_packed(keys, lengths, values)
+
+    @classmethod
+    def from_dict(cls, relation: dict, key_interner: Interner, value_interner: Interner):
+        """Build a relationship from a dict of lists of strings
+
+        Args:
+            relation (dict(str, list(str) | str)): The relationship, a single string is taken as one value
+            key_interner (Interner): Interns the keys
+            value_interner (Interner): Interns the values
+
+        Returns:
+            IdRelation: The relationship
+        """
+        id_relation = cls(key_interner, value_interner)
+        for key, values in relation.items():
+            if isinstance(values, str):
+                values = [values]
+            key_id = key_interner.intern(key)
+            for value in values:
+                id_relation.add(key_id, value_interner.intern(value))
+        return id_relation
+
+    def add(self, key_id: int, value_id: int) -> None:
+        """Append a value to the values of a key
+
+        Args:
+            key_id (int): Id of the key
+            value_id (int): Id of the value
+        """
+        rows = self.rows
+        row = rows.get(key_id)
+        if row is None:
+            rows[key_id] = array(ID_TYPECODE, (value_id,))
+        else:
+            row.append(value_id)
+
+    def add_many(self, key_ids: np.ndarray, value_ids: np.ndarray) -> None:
+        """Append values to the values of their keys, keeping the order of the values within each key.
+        The pairs are buffered, so adding many small batches costs no more than adding one large batch.
+
+        Args:
+            key_ids (numpy.ndarray): Id of the key of each value
+            value_ids (numpy.ndarray): Ids of the values
+        """
+        self.pending_keys.frombytes(np.asarray(key_ids, dtype=np.int32).tobytes())
+        self.pending_values.frombytes(np.asarray(value_ids, dtype=np.int32).tobytes())
+
+    def ids(self, key_id: int) -> np.ndarray:
+        """Get the value ids of a key, without copying them
+
+        Args:
+            key_id (int): Id of the key
+
+        Returns:
+            numpy.ndarray: The value ids, empty when the key has no values
+        """
+        row = self.rows.get(key_id)
+        if row is None:
+            return np.empty(0, dtype=np.int32)
+        return np.frombuffer(row, dtype=np.int32)
+
+    def pack(self) -> tuple:
+        """Pack the rows into flat arrays, which pickle and remap far faster than many small arrays
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray, numpy.ndarray): The key ids, the number of values of each key, and the values of every key in order
+        """
+        keys = np.fromiter(self.rows.keys(), dtype=np.int32, count=len(self.rows))
+        lengths = np.fromiter(map(len, self.rows.values()), dtype=np.int32, count=len(self.rows))
+        values = np.frombuffer(b''.join(map(array.tobytes, self.rows.values())), dtype=np.int32)
+        return keys, lengths, values
+
+    def extend_packed(self, keys: np.ndarray, lengths: np.ndarray, values: np.ndarray) -> None:
+        """Append packed rows to the rows of self
+
+        Args:
+            keys (numpy.ndarray): The key ids
+            lengths (numpy.ndarray): The number of values of each key
+            values (numpy.ndarray): The values of every key in order
+        """
+        values = ids_to_array(values)
+        ends = np.cumsum(lengths)
+        rows = self._rows
+        for key_id, start, end in zip(keys.tolist(), (ends - lengths).tolist(), ends.tolist()):
+            row = rows.get(key_id)
+            if row is None:
+                rows[key_id] = values[start:end]
+            else:
+                row.extend(values[start:end])
+
+    def merge(self, other, key_map: np.ndarray, value_map: np.ndarray) -> None:
+        """Append the values of another relationship
+
+        Args:
+            other (IdRelation): The relationship being merged
+            key_map (numpy.ndarray): Maps the key ids of other to key ids of self, returned by Interner.merge
+            value_map (numpy.ndarray): Maps the value ids of other to value ids of self
+        """
+        keys, lengths, values = other.pack()
+        if self.pending_keys:
+            self.flush()
+        self.extend_packed(key_map[keys], lengths, value_map[values])
+
+    def __getstate__(self):
+        return {'key_interner': self.key_interner, 'value_interner': self.value_interner, 'rows': self.pack()}
+
+    def __setstate__(self, state):
+        self.key_interner = state['key_interner']
+        self.value_interner = state['value_interner']
+        self._rows = {}
+        self.pending_keys = array(ID_TYPECODE)
+        self.pending_values = array(ID_TYPECODE)
+        self.extend_packed(*state['rows'])
+
+    def __getitem__(self, key: str) -> list:
+        key_id = self.key_interner.get_id(key)
+        if key_id is None or key_id not in self.rows:
+            raise KeyError(key)
+        return self.value_interner.lookup_many(self.rows[key_id])
+
+    def __contains__(self, key):
+        key_id = self.key_interner.get_id(key)
+        return key_id is not None and key_id in self.rows
+
+    def __iter__(self):
+        lookup = self.key_interner.lookup
+        return (lookup(key_id) for key_id in self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return 'IdRelation({})'.format(dict(self.items()))
+
+
+def id_relations(document_readers, visitor_documents) -> tuple:
+    """Get the document to reader relationships as IdRelations sharing interners, converting them when they are dicts of lists
+
+    Args:
+        document_readers (IdRelation | dict(str, list(str))): The readers of each document
+        visitor_documents (IdRelation | dict(str, list(str))): The documents read by each visitor
+
+    Returns:
+        (IdRelation, IdRelation): The document_readers and visitor_documents relationships
+    """
+    if isinstance(document_readers, IdRelation) and isinstance(visitor_documents, IdRelation):
+        return document_readers, visitor_documents
+    documents = Interner()
+    visitors = Interner()
+    return (IdRelation.from_dict(document_readers, documents, visitors),
+            IdRelation.from_dict(visitor_documents, visitors, documents))
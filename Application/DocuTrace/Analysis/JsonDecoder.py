@@ -0,0 +1,82 @@
+import json
+from collections import OrderedDict, namedtuple
+
+from DocuTrace.Utils.Logging import logger
+
+
+JsonDecoder = namedtuple('JsonDecoder', ['name', 'loads'])
+"""A JSON decoding backend. Every backend accepts bytes or str and raises a ValueError subclass on invalid input.
+
+Args:
+    name (str): The name of the backend
+    loads (bytes | str -> Any): Function to deserialize one JSON document
+"""
+
+
+def load_orjson():
+    import orjson
+    return orjson.loads
+
+
+def load_simdjson():
+    import simdjson
+    return simdjson.loads
+
+
+def load_ujson():
+    import ujson
+    return ujson.loads
+
+
+def load_json():
+    return json.loads
+
+
+# Ordered by preference, the first importable backend is used when none is requested
+decoder_loaders = OrderedDict()
+decoder_loaders['orjson'] = load_orjson
+decoder_loaders['simdjson'] = load_simdjson
+decoder_loaders['ujson'] = load_ujson
+decoder_loaders['json'] = load_json
+
+
+def available_decoders() -> list:
+    """List the names of the JSON decoders that can be imported
+
+    Returns:
+        list(str): Names of the importable decoders, in order of preference
+    """
+    available = []
+    for name, loader in decoder_loaders.items():
+        try:
+            loader()
+            available.append(name)
+        except ImportError:
+            continue
+    return available
+
+
+def get_decoder(name: str=None) -> JsonDecoder:
+    """Get a JSON decoder by name, or the fastest installed decoder when no name is given
+
+    Args:
+        name (str, optional): One of the keys of decoder_loaders. Defaults to None.
+
+    Returns:
+        JsonDecoder: The selected decoder, the stdlib json module is used when nothing faster is installed
+    """
+    if name is not None:
+        loader = decoder_loaders.get(name, None)
+        if loader is None:
+            logger.warning('Unknown JSON decoder: {}, expected one of {}'.format(name, list(decoder_loaders.keys())))
+        else:
+            try:
+                return JsonDecoder(name, loader())
+            except ImportError:
+                logger.warning('JSON decoder {} is not installed, selecting the fastest available decoder'.format(name))
+
+    for decoder_name, loader in decoder_loaders.items():
+        try:
+            return JsonDecoder(decoder_name, loader())
+        except ImportError:
+            continue
@@ -8,22 +8,20 @@ from DocuTrace.Utils.Logging import logger, debug
 
 WORK_DIR = config('WORK_DIR')
 
-def get_edges(node_dict):
-    """Produces a list of tuples representing the edges described in the node_dict
+def get_edges(read_graph, visitor_ids, document_ids):
+    """Produces a list of tuples representing the edges of the read graph between some readers and some documents
 
     Args:
-        node_dict (dict(str, list(str))): A dictionary where each key is a node and all the points it connects to are a list of values
+        read_graph (ReadGraph): The deduplicated graph of readers and documents
+        visitor_ids (numpy.ndarray): Ids of the readers
+        document_ids (numpy.ndarray): Ids of the documents
 
     Returns:
         list(str, str): A list of tuples describing the edges between 2 nodes
     """
-    edges = []
-    for node in node_dict:
-        unique = np.unique(node_dict[node])
-        node_dict[node] = unique.tolist()
-        for neighbour in node_dict[node]:
-            edges.append((node[-4:], neighbour[-4:]))
-    return edges
+    edge_visitors, edge_documents = read_graph.edges(visitor_ids, document_ids)
+    return [(visitor[-4:], document[-4:]) for visitor, document in zip(
+        read_graph.visitors.lookup_many(edge_visitors.tolist()), read_graph.documents.lookup_many(edge_documents.tolist()))]
 
 class Graphs:
     """Class to produce graphs using graphviz
@@ -79,8 +77,8 @@ class Graphs:
         """
         from DocuTrace.Analysis.ComputeData import top_n_sorted
 
-        _, reader_list = self.compute_data.find_relevant_docs(document_id, visitor)
-        reader_list = reader_list.tolist()
+        _, reader_ids = self.compute_data.find_relevant_ids(document_id, visitor)
+        reader_list = self.compute_data.visitors.lookup_many(reader_ids.tolist())
         relevant_docs = self.compute_data.also_likes(document_id, visitor, sort_fn=top_n_sorted, n=n)
 
         logger.debug('Length of relevant docs: {}'.format(len(relevant_docs)))
@@ -88,25 +86,10 @@ class Graphs:
         self.graph = Digraph(name='Also likes', filename='Also likes', format='png')
         self.graph.attr('graph', ranksep='0.75')
 
-        # Identify connections between nodes and docs
-        node_dict = {k: self.compute_data.visitor_documents.get(k, []) for k in reader_list}
-
-        # Remove duplicate entries in node_dict
-        for node in node_dict:
-            node_dict[node] = np.unique(node_dict[node]).tolist()
-
-        # Get all edges from node_dict
-        edges = get_edges(node_dict)
-
-
-        # Remove edges that point to docs not in relevant docs
-        clean_edges = []
-        relevant_docs.append(document_id)
-        for edge in edges:
-            if edge[1] in self.last_4_chars(relevant_docs):
-                clean_edges.append(edge)
-        edges = clean_edges
-        relevant_docs.remove(document_id)
+        # Edges from the readers to the relevant docs, each edge of the read graph is already unique
+        documents = self.compute_data.documents
+        document_ids = [documents.get_id(doc) for doc in relevant_docs + [document_id]]
+        edges = get_edges(self.compute_data.read_graph, reader_ids, np.array(document_ids, dtype=np.int32))
 
         # Build context subgraph
         with self.graph.subgraph() as context:
@@ -120,7 +103,7 @@ class Graphs:
             if visitor is not None:
                 readers.node(visitor[-4:], color='.3 .9 .7', style='filled')
 
-            for node in node_dict:
+            for node in reader_list:
                 readers.node(node[-4:])
 
         
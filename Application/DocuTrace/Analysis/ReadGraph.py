@@ -0,0 +1,233 @@
+import numpy as np
+
+from .Interning import Interner, IdRelation
+
+
+class CompressedRows:
+    """A sparse matrix of integer ids in compressed sparse row form, each row holds its distinct column ids in ascending order with a count for each.
+    The columns of row i are indices[indptr[i]:indptr[i + 1]], so a row is a slice of one contiguous array.
+
+    Args:
+        indptr (numpy.ndarray): The offset of the first column of each row, followed by the number of entries
+        indices (numpy.ndarray): The column ids of every row in order
+        counts (numpy.ndarray, optional): The count of each entry, None when counts are not kept. Defaults to None.
+    """
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, counts: np.ndarray=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+
+    @classmethod
+    def from_pairs(cls, row_ids: np.ndarray, column_ids: np.ndarray, n_rows: int=0, weights: np.ndarray=None, keep_counts: bool=True):
+        """Build the rows from (row id, column id) pairs, repeated pairs become one entry whose count is the number of repeats
+
+        Args:
+            row_ids (numpy.ndarray): The row id of each pair
+            column_ids (numpy.ndarray): The column id of each pair
+            n_rows (int, optional): The minimum number of rows, rows without pairs are empty. Defaults to 0.
+            weights (numpy.ndarray, optional): The count each pair stands for, one when None. Defaults to None.
+            keep_counts (bool, optional): Keep the count of each entry? Defaults to True.
+
+        Returns:
+            CompressedRows: The rows
+        """
+        pairs = (np.asarray(row_ids, dtype=np.int64) << 32) | np.asarray(column_ids, dtype=np.int64)
+        if weights is None:
+            pairs, counts = np.unique(pairs, return_counts=True)
+        else:
+            pairs, inverse = np.unique(pairs, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights, minlength=len(pairs))
+        return cls.from_packed(pairs, counts if keep_counts else None, n_rows=n_rows)
+
+    @classmethod
+    def from_packed(cls, pairs: np.ndarray, counts: np.ndarray=None, n_rows: int=0):
+        """Build the rows from distinct packed (row id << 32 | column id) pairs in ascending order
+
+        Args:
+            pairs (numpy.ndarray): The sorted packed pairs, each pair once
+            counts (numpy.ndarray, optional): The count of each pair, None when counts are not kept. Defaults to None.
+            n_rows (int, optional): The minimum number of rows, rows without pairs are empty. Defaults to 0.
+
+        Returns:
+            CompressedRows: The rows
+        """
+        rows = pairs >> 32
+        n_rows = max(n_rows, int(rows[-1]) + 1 if len(rows) else 0)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        indices = (pairs & 0xFFFFFFFF).astype(np.int32)
+        return cls(indptr, indices, None if counts is None else counts.astype(np.int32))
+
+    def row(self, row_id: int) -> np.ndarray:
+        """Get the column ids of a row, without copying them
+
+        Args:
+            row_id (int): Id of the row
+
+        Returns:
+            numpy.ndarray: The column ids, empty when the row has no entries
+        """
+        if row_id >= len(self):
+            return self.indices[:0]
+        return self.indices[self.indptr[row_id]:self.indptr[row_id + 1]]
+
+    def row_counts(self, row_id: int) -> np.ndarray:
+        """Get the counts of the entries of a row
+
+        Args:
+            row_id (int): Id of the row
+
+        Raises:
+            ValueError: When counts are not kept
+
+        Returns:
+            numpy.ndarray: The count of each column id returned by row
+        """
+        if self.counts is None:
+            raise ValueError('Counts are not kept')
+        if row_id >= len(self):
+            return self.counts[:0]
+        return self.counts[self.indptr[row_id]:self.indptr[row_id + 1]]
+
+    def degrees(self, row_ids: np.ndarray=None) -> np.ndarray:
+        """Get the number of entries of rows
+
+        Args:
+            row_ids (numpy.ndarray, optional): Ids of the rows, every row when None. Defaults to None.
+
+        Returns:
+            numpy.ndarray: The number of entries of each row
+        """
+        degrees = np.diff(self.indptr)
+        return degrees if row_ids is None else degrees[row_ids]
+
+    def gather(self, row_ids: np.ndarray) -> tuple:
+        """Concatenate the entries of many rows without a Python loop
+
+        Args:
+            row_ids (numpy.ndarray): Ids of the rows
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray | None): The column ids of every row in order, and their counts when counts are kept
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        starts = self.indptr[row_ids]
+        lengths = self.indptr[row_ids + 1] - starts
+        ends = np.cumsum(lengths)
+        positions = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+        return self.indices[positions], None if self.counts is None else self.counts[positions]
+
+    def row_ids(self) -> np.ndarray:
+        """Get the row id of every entry
+
+        Returns:
+            numpy.ndarray: The row id of each entry of indices
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.degrees())
+
+    def transpose(self, n_columns: int=0):
+        """Swap rows and columns
+
+        Args:
+            n_columns (int, optional): The minimum number of rows of the result. Defaults to 0.
+
+        Returns:
+            CompressedRows: The transposed rows, keeping the counts
+        """
+        return CompressedRows.from_pairs(self.indices, self.row_ids(), n_rows=n_columns, weights=self.counts, keep_counts=self.counts is not None)
+
+    @property
+    def n_entries(self) -> int:
+        return len(self.indices)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __repr__(self):
+        return 'CompressedRows(rows: {}, entries: {})'.format(len(self), self.n_entries)
+
+
+class ReadGraph:
+    """The deduplicated bipartite graph of readers and the documents they read, held in compressed sparse rows in both directions.
+    Each (document, reader) edge is stored once, with the number of times the reader read the document when read counts are kept.
+    It is built from the document_readers relationship once parsing is complete, so queries run on contiguous integer arrays.
+
+    Args:
+        documents (Interner): Interns the document ids
+        visitors (Interner): Interns the visitor uuids
+        readers (CompressedRows): The reader ids of each document id
+        documents_read (CompressedRows): The document ids of each reader id
+    """
+    def __init__(self, documents: Interner, visitors: Interner, readers: CompressedRows, documents_read: CompressedRows):
+        self.documents = documents
+        self.visitors = visitors
+        self.readers = readers
+        self.documents_read = documents_read
+
+    @classmethod
+    def from_edges(cls, documents: Interner, visitors: Interner, document_ids: np.ndarray, visitor_ids: np.ndarray, weights: np.ndarray=None, keep_counts: bool=True):
+        """Build the graph from one (document id, visitor id) pair per read
+
+        Args:
+            documents (Interner): Interns the document ids
+            visitors (Interner): Interns the visitor uuids
+            document_ids (numpy.ndarray): The document of each read
+            visitor_ids (numpy.ndarray): The reader of each read
+            weights (numpy.ndarray, optional): The number of reads each pair stands for, one when None. Defaults to None.
+            keep_counts (bool, optional): Keep the number of reads of each edge? Defaults to True.
+
+        Returns:
+            ReadGraph: The graph
+        """
+        readers = CompressedRows.from_pairs(document_ids, visitor_ids, n_rows=len(documents), weights=weights, keep_counts=keep_counts)
+        return cls(documents, visitors, readers, readers.transpose(n_columns=len(visitors)))
+
+    @classmethod
+    def from_relation(cls, document_readers: IdRelation, keep_counts: bool=True):
+        """Build the graph from the readers of each document
+
+        Args:
+            document_readers (IdRelation): The readers of each document, once per read
+            keep_counts (bool, optional): Keep the number of reads of each edge? Defaults to True.
+
+        Returns:
+            ReadGraph: The graph
+        """
+        keys, lengths, values = document_readers.pack()
+        return cls.from_edges(document_readers.key_interner, document_readers.value_interner, np.repeat(keys, lengths), values, keep_counts=keep_counts)
+
+    def edges(self, visitor_ids: np.ndarray, document_ids: np.ndarray) -> tuple:
+        """Find the edges between some readers and some documents
+
+        Args:
+            visitor_ids (numpy.ndarray): Ids of the readers
+            document_ids (numpy.ndarray): Ids of the documents
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The reader id and the document id of each edge, in reader order
+        """
+        visitor_ids = np.asarray(visitor_ids, dtype=np.int64)
+        read, _ = self.documents_read.gather(visitor_ids)
+        edge_visitors = np.repeat(visitor_ids, self.documents_read.degrees(visitor_ids))
+        mask = np.isin(read, document_ids)
+        return edge_visitors[mask], read[mask]
+
+    def merge(self, other, document_map: np.ndarray, visitor_map: np.ndarray):
+        """Combine with the graph of another collector, summing the read counts of shared edges
+
+        Args:
+            other (ReadGraph): The graph being merged
+            document_map (numpy.ndarray): Maps the document ids of other to document ids of self, returned by Interner.merge
+            visitor_map (numpy.ndarray): Maps the visitor ids of other to visitor ids of self
+
+        Returns:
+            ReadGraph: The combined graph
+        """
+        keep_counts = self.readers.counts is not None and other.readers.counts is not None
+        document_ids = np.concatenate((self.readers.row_ids(), document_map[other.readers.row_ids()]))
+        visitor_ids = np.concatenate((self.readers.indices, visitor_map[other.readers.indices]))
+        weights = np.concatenate((self.readers.counts, other.readers.counts)) if keep_counts else None
+        return ReadGraph.from_edges(self.documents, self.visitors, document_ids, visitor_ids, weights=weights, keep_counts=keep_counts)
+
+    def __repr__(self):
+        return 'ReadGraph(documents: {}, readers: {}, edges: {})'.format(len(self.readers), len(self.documents_read), self.readers.n_entries)
@@ -0,0 +1,461 @@
+from collections import Counter, namedtuple
+from hashlib import blake2b
+
+import numpy as np
+
+from .Interning import Interner
+
+
+# The number of items a heavy hitters summary monitors by default
+DEFAULT_CAPACITY = 1000
+# HyperLogLogs have 2 ** DEFAULT_PRECISION one byte registers, a relative standard error of 1.04 / sqrt(2 ** precision)
+DEFAULT_PRECISION = 8
+# Count-Min sketches have DEFAULT_DEPTH rows of DEFAULT_WIDTH counters
+DEFAULT_WIDTH = 1 << 16
+DEFAULT_DEPTH = 4
+
+HeavyHitter = namedtuple('HeavyHitter', ['item', 'count', 'error'])
+Estimate = namedtuple('Estimate', ['count', 'error'])
+
+
+def hash_strings(strings) -> np.ndarray:
+    """Hash strings to 64 bits, the same in every process unlike hash()
+
+    Args:
+        strings (iterable(str)): The strings
+
+    Returns:
+        numpy.ndarray: The uint64 hash of each string
+    """
+    digests = b''.join(blake2b(string.encode(), digest_size=8).digest() for string in strings)
+    return np.frombuffer(digests, dtype=np.uint64)
+
+
+def mix(hashes: np.ndarray, seed: int=0) -> np.ndarray:
+    """Derive independent hashes from 64 bit hashes with the splitmix64 finaliser, one set for each seed
+
+    Args:
+        hashes (numpy.ndarray): uint64 hashes
+        seed (int, optional): Selects the derived hash. Defaults to 0.
+
+    Returns:
+        numpy.ndarray: The derived uint64 hashes
+    """
+    hashes = hashes + np.uint64((seed + 1) * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF)
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def bit_lengths(values: np.ndarray) -> np.ndarray:
+    """Get the number of bits needed to represent each uint64, exactly, by splitting it into halves a float64 holds
+
+    Args:
+        values (numpy.ndarray): uint64 values
+
+    Returns:
+        numpy.ndarray: The bit length of each value
+    """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class HeavyHitters:
+    """A Misra-Gries summary of the most frequent items of a stream, using memory bounded by its capacity however many items are counted.
+    The count kept for an item is never more than its true count, and at most error_bound less, error_bound is never more than total / (capacity + 1).
+    Summaries of separate parts of a stream merge into a summary of the whole stream with the same guarantee.
+
+    Items are buffered in a Counter as they are added, and folded into the summary when the buffer holds capacity items or the summary is read.
+
+    Args:
+        capacity (int, optional): The most items monitored. Defaults to DEFAULT_CAPACITY.
+    """
+    def __init__(self, capacity: int=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.offset = 0
+        self.total = 0
+        self.pending = Counter()
+
+    def add(self, item, count: int=1) -> None:
+        """Count an item
+
+        Args:
+            item (Hashable): The item
+            count (int, optional): The number of times it occurred. Defaults to 1.
+        """
+        self.pending[item] += count
+        if len(self.pending) >= self.capacity:
+            self.consolidate()
+
+    def add_many(self, items, counts=None) -> None:
+        """Count many items
+
+        Args:
+            items (iterable(Hashable)): The items
+            counts (iterable(int), optional): The number of times each item occurred, once when None. Defaults to None.
+        """
+        if counts is None:
+            self.pending.update(items)
+        else:
+            for item, count in zip(items, counts):
+                self.pending[item] += count
+        if len(self.pending) >= self.capacity:
+            self.consolidate()
+
+    def consolidate(self) -> None:
+        """Fold the buffered counts into the summary
+        """
+        if self.pending:
+            pending = self.pending
+            self.pending = Counter()
+            self.combine(pending, 0, sum(pending.values()))
+
+    def merge(self, other) -> None:
+        """Add the counts of another summary, the merged error bound is at most the total of both streams / (capacity + 1)
+
+        Args:
+            other (HeavyHitters): The summary being merged
+        """
+        other.consolidate()
+        self.consolidate()
+        self.combine(other.counts, other.offset, other.total)
+
+    def combine(self, counts: dict, offset: int, total: int) -> None:
+        """Add counts to the summary, then subtract the count of the (capacity + 1)th most frequent item from every item,
+        so at most capacity items are left with a count above zero
+
+        Args:
+            counts (dict): The count of each item
+            offset (int): The most the counts are below the true counts
+            total (int): The number of items the counts are from
+        """
+        combined = dict(self.counts)
+        for item, count in counts.items():
+            combined[item] = combined.get(item, 0) + count
+        self.offset += offset
+        self.total += total
+        if len(combined) > self.capacity:
+            values = np.fromiter(combined.values(), dtype=np.int64, count=len(combined))
+            decrement = int(np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1])
+            combined = {item: count - decrement for item, count in combined.items() if count > decrement}
+            self.offset += decrement
+        self.counts = combined
+
+    @property
+    def error_bound(self) -> int:
+        """The most a count is below the true count, an item that is not monitored occurred at most this many times
+        """
+        self.consolidate()
+        return self.offset
+
+    def estimate(self, item) -> HeavyHitter:
+        """Get the count of an item
+
+        Args:
+            item (Hashable): The item
+
+        Returns:
+            HeavyHitter: The item, its count and the most the count is below the true count
+        """
+        self.consolidate()
+        return HeavyHitter(item, self.counts.get(item, 0), self.offset)
+
+    def top(self, n: int=10) -> list:
+        """Get the most frequent items, equal counts are ordered by item
+
+        Args:
+            n (int, optional): Number of items, at most capacity. Defaults to 10.
+
+        Returns:
+            list(HeavyHitter): The items, their counts and the most each count is below the true count
+        """
+        self.consolidate()
+        ordered = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+        return [HeavyHitter(item, count, self.offset) for item, count in ordered]
+
+    def __len__(self):
+        self.consolidate()
+        return len(self.counts)
+
+    def __repr__(self):
+        return 'HeavyHitters(capacity: {}, items: {}, total: {}, error_bound: {})'.format(self.capacity, len(self), self.total, self.error_bound)
+
+
+class CountMinSketch:
+    """A Count-Min sketch of the counts of hashed keys, a table of depth rows of width counters whose memory does not grow with the keys counted.
+    An estimate is never below the true count, and is over it by at most error_bound with probability confidence.
+    Sketches of the same width and depth merge by adding their tables.
+
+    Args:
+        width (int, optional): The counters in each row, the error bound is e / width of the total. Defaults to DEFAULT_WIDTH.
+        depth (int, optional): The rows, the bound holds with probability 1 - exp(-depth). Defaults to DEFAULT_DEPTH.
+    """
+    def __init__(self, width: int=DEFAULT_WIDTH, depth: int=DEFAULT_DEPTH):
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    @property
+    def width(self) -> int:
+        return self.table.shape[1]
+
+    @property
+    def depth(self) -> int:
+        return self.table.shape[0]
+
+    def columns(self, keys: np.ndarray) -> list:
+        """Find the counter of each key in each row
+
+        Args:
+            keys (numpy.ndarray): uint64 hashes of the keys
+
+        Returns:
+            list(numpy.ndarray): For each row, the column of each key
+        """
+        return [(mix(keys, row) % np.uint64(self.width)).astype(np.int64) for row in range(self.depth)]
+
+    def add_many(self, keys: np.ndarray, counts: np.ndarray=None) -> None:
+        """Count many keys
+
+        Args:
+            keys (numpy.ndarray): uint64 hashes of the keys
+            counts (numpy.ndarray, optional): The count of each key, one when None. Defaults to None.
+        """
+        for row, columns in enumerate(self.columns(keys)):
+            self.table[row] += np.bincount(columns, weights=counts, minlength=self.width).astype(np.int64)
+        self.total += len(keys) if counts is None else int(np.sum(counts))
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        """Estimate the counts of many keys
+
+        Args:
+            keys (numpy.ndarray): uint64 hashes of the keys
+
+        Returns:
+            numpy.ndarray: The estimated count of each key, never below the true count
+        """
+        return np.min([self.table[row, columns] for row, columns in enumerate(self.columns(keys))], axis=0)
+
+    def merge(self, other) -> None:
+        """Add the counts of another sketch
+
+        Args:
+            other (CountMinSketch): The sketch being merged
+
+        Raises:
+            ValueError: When the sketches differ in width or depth
+        """
+        if self.table.shape != other.table.shape:
+            raise ValueError('Count-Min sketches of different sizes cannot be merged: {} and {}'.format(self.table.shape, other.table.shape))
+        self.table += other.table
+        self.total += other.total
+
+    @property
+    def error_bound(self) -> int:
+        """The most an estimate is over the true count, with probability confidence
+        """
+        return int(np.ceil(np.e / self.width * self.total))
+
+    @property
+    def confidence(self) -> float:
+        """The probability an estimate is within error_bound of the true count
+        """
+        return 1 - np.exp(-self.depth)
+
+    def __repr__(self):
+        return 'CountMinSketch(width: {}, depth: {}, total: {}, error_bound: {})'.format(self.width, self.depth, self.total, self.error_bound)
+
+
+class HyperLogLogs:
+    """A HyperLogLog for each row id, held as one array of one byte registers per row, estimating the number of distinct hashes added to a row.
+    Each row uses 2 ** precision bytes however many hashes are added, estimates have a relative standard error of 1.04 / sqrt(2 ** precision).
+    HyperLogLogs merge by taking the largest of each register, so the union of rows can be estimated as well.
+
+    Args:
+        precision (int, optional): The number of hash bits selecting a register, between 4 and 16. Defaults to DEFAULT_PRECISION.
+    """
+    def __init__(self, precision: int=DEFAULT_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError('HyperLogLog precision must be between 4 and 16: {}'.format(precision))
+        self.precision = precision
+        self.registers = np.zeros((0, 1 << precision), dtype=np.uint8)
+
+    @property
+    def n_registers(self) -> int:
+        return self.registers.shape[1]
+
+    @property
+    def relative_error(self) -> float:
+        """The relative standard error of an estimate
+        """
+        return 1.04 / np.sqrt(self.n_registers)
+
+    def grow(self, n_rows: int) -> None:
+        """Add empty rows, so there are at least n_rows
+
+        Args:
+            n_rows (int): The number of rows needed
+        """
+        if n_rows > len(self.registers):
+            grown = np.zeros((max(n_rows, 2 * len(self.registers)), self.n_registers), dtype=np.uint8)
+            grown[:len(self.registers)] = self.registers
+            self.registers = grown
+
+    def add_many(self, row_ids: np.ndarray, hashes: np.ndarray) -> None:
+        """Add hashes to rows
+
+        Args:
+            row_ids (numpy.ndarray): The row of each hash
+            hashes (numpy.ndarray): uint64 hashes, the top precision bits select the register
+        """
+        if len(hashes) == 0:
+            return
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        self.grow(int(row_ids.max()) + 1)
+        suffix_bits = 64 - self.precision
+        registers = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+        ranks = suffix_bits - bit_lengths(hashes & np.uint64((1 << suffix_bits) - 1)) + 1
+        np.maximum.at(self.registers, (row_ids, registers), ranks.astype(np.uint8))
+
+    def merge(self, other, row_map: np.ndarray) -> None:
+        """Combine with the HyperLogLogs of another instance
+
+        Args:
+            other (HyperLogLogs): The HyperLogLogs being merged
+            row_map (numpy.ndarray): Maps the row ids of other to row ids of self, returned by Interner.merge
+
+        Raises:
+            ValueError: When the precisions differ
+        """
+        if self.precision != other.precision:
+            raise ValueError('HyperLogLogs of different precisions cannot be merged: {} and {}'.format(self.precision, other.precision))
+        rows = np.asarray(row_map[:len(other.registers)], dtype=np.int64)
+        if len(rows):
+            self.grow(int(rows.max()) + 1)
+            self.registers[rows] = np.maximum(self.registers[rows], other.registers[:len(rows)])
+
+    def estimate(self, registers: np.ndarray) -> np.ndarray:
+        """Estimate the distinct hashes of rows of registers, with linear counting when many registers are empty
+
+        Args:
+            registers (numpy.ndarray): Rows of registers
+
+        Returns:
+            numpy.ndarray: The estimate of each row
+        """
+        m = self.n_registers
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=1)
+        empty = np.count_nonzero(registers == 0, axis=1)
+        small = (raw <= 2.5 * m) & (empty > 0)
+        raw[small] = m * np.log(m / empty[small])
+        return raw
+
+    def count(self, row_id: int) -> float:
+        """Estimate the distinct hashes added to a row
+
+        Args:
+            row_id (int): Id of the row
+
+        Returns:
+            float: The estimate, zero for a row without hashes
+        """
+        if row_id >= len(self.registers):
+            return 0.0
+        return float(self.estimate(self.registers[row_id:row_id + 1])[0])
+
+    def union(self, row_ids: np.ndarray) -> float:
+        """Estimate the distinct hashes added to any of some rows
+
+        Args:
+            row_ids (numpy.ndarray): Ids of the rows
+
+        Returns:
+            float: The estimate
+        """
+        row_ids = [row_id for row_id in row_ids if row_id < len(self.registers)]
+        if not row_ids:
+            return 0.0
+        return float(self.estimate(self.registers[row_ids].max(axis=0, keepdims=True))[0])
+
+    def __len__(self):
+        return len(self.registers)
+
+    def __repr__(self):
+        return 'HyperLogLogs(rows: {}, precision: {})'.format(len(self), self.precision)
+
+
+class DistinctReaders:
+    """Estimates the distinct readers of each document with a HyperLogLog per document, instead of keeping every reader.
+    Readers are hashed rather than interned, so memory grows with documents but not with readers or reads.
+
+    Args:
+        documents (Interner): Interns the document ids
+        precision (int, optional): The precision of each HyperLogLog. Defaults to DEFAULT_PRECISION.
+    """
+    def __init__(self, documents: Interner, precision: int=DEFAULT_PRECISION):
+        self.documents = documents
+        self.sketches = HyperLogLogs(precision)
+
+    def add(self, document_id: int, uuid: str) -> None:
+        """Add a reader of a document
+
+        Args:
+            document_id (int): Id of the document
+            uuid (str): The visitor uuid of the reader
+        """
+        self.sketches.add_many(np.array([document_id]), hash_strings([uuid]))
+
+    def add_many(self, document_ids: np.ndarray, uuids: list) -> None:
+        """Add the readers of many documents, hashing each distinct uuid once
+
+        Args:
+            document_ids (numpy.ndarray): Id of the document of each read
+            uuids (list(str)): The visitor uuid of each read
+        """
+        unique_uuids = list(set(uuids))
+        hashes = dict(zip(unique_uuids, hash_strings(unique_uuids).tolist()))
+        self.sketches.add_many(document_ids, np.array([hashes[uuid] for uuid in uuids], dtype=np.uint64))
+
+    def merge(self, other, document_map: np.ndarray) -> None:
+        """Combine with the estimates of another DistinctReaders
+
+        Args:
+            other (DistinctReaders): The estimates being merged
+            document_map (numpy.ndarray): Maps the document ids of other to document ids of self, returned by Interner.merge
+        """
+        self.sketches.merge(other.sketches, document_map)
+
+    def estimate(self, doc_uuid: str) -> Estimate:
+        """Estimate the distinct readers of a document
+
+        Args:
+            doc_uuid (str): The document id
+
+        Returns:
+            Estimate: The estimated readers, and its standard error
+        """
+        document_id = self.documents.get_id(doc_uuid)
+        count = 0.0 if document_id is None else self.sketches.count(document_id)
+        return Estimate(int(round(count)), int(np.ceil(count * self.sketches.relative_error)))
+
+    def shared(self, doc_uuid: str, other_uuid: str) -> Estimate:
+        """Estimate the readers two documents have in common, from the estimates of each and of their union
+
+        Args:
+            doc_uuid (str): A document id
+            other_uuid (str): The other document id
+
+        Returns:
+            Estimate: The estimated shared readers, and the standard error of the union, which dominates the error
+        """
+        document_ids = [self.documents.get_id(doc_uuid), self.documents.get_id(other_uuid)]
+        if None in document_ids:
+            return Estimate(0, 0)
+        union = self.sketches.union(document_ids)
+        shared = self.sketches.count(document_ids[0]) + self.sketches.count(document_ids[1]) - union
+        return Estimate(max(int(round(shared)), 0), int(np.ceil(union * self.sketches.relative_error)))
+
+    def __repr__(self):
+        return 'DistinctReaders(documents: {}, precision: {})'.format(len(self.sketches), self.sketches.precision)
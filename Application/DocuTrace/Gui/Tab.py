@@ -308,17 +308,14 @@ class Tab(ttk.Frame):
         """Display reader profile information in the tab
         """
         n = self.get_n()
-        self.compute_data.sort(sort_countries=False,
-                                      sort_continents=False, sort_browsers=False)
 
         if n is None:
             n = 10
 
         profile_list = []
-        profile_iter = iter(self.compute_data.reader_profiles.values())
+        top_readers = self.compute_data.top_reads(n, to_print=False)
 
-        for i in range(0, n):
-            profile = next(profile_iter)
+        for i, profile in enumerate(top_readers.values()):
             display_string = '{:{width}} | {}'.format(i, profile, width=4)
             print(display_string)
             profile_list.append(display_string)
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+
+from DocuTrace.Utils.Logging import logger
+
+
+CACHE_FILE_NAME = 'lookups.sqlite3'
+DEFAULT_MAX_ENTRIES = 100000
+# Keys in each query, below the limit on host parameters of older sqlite versions
+QUERY_BATCH = 500
+DEFAULT_RESULT_CACHE_SIZE = 256
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LookupCache:
+    """A persistent cache of slow lookups, such as user agent string to browser family, kept in a sqlite database so it is reused by later runs.
+    Each namespace is loaded into memory the first time it is used, so a cached lookup costs a dict access.
+    Every process opens its own connection, so worker processes forked from the parent share the cache file.
+    When there are more than max_entries rows the least recently used are evicted.
+
+    Args:
+        path (str): Path to the database file, its directory is created when missing
+        max_entries (int, optional): The number of rows kept across every namespace. Defaults to DEFAULT_MAX_ENTRIES.
+    """
+    def __init__(self, path: str, max_entries: int=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = None
+        self.pid = None
+        self.namespaces = {}
+        self.touched = {}
+
+    def connect(self) -> sqlite3.Connection:
+        """Open the database for this process, creating it when missing
+
+        Returns:
+            sqlite3.Connection: The connection
+        """
+        if self.connection is not None and self.pid == os.getpid():
+            return self.connection
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.pid = os.getpid()
+        self.namespaces = {}
+        self.touched = {}
+        with self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS lookups (namespace TEXT, key TEXT, value TEXT, last_used REAL, PRIMARY KEY (namespace, key)) WITHOUT ROWID')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS lookups_last_used ON lookups (last_used)')
+        return self.connection
+
+    def load(self, namespace: str) -> dict:
+        """Get the cached values of a namespace, reading them from the database on first use
+
+        Args:
+            namespace (str): The kind of lookup
+
+        Returns:
+            dict(str, str): The cached values by key
+        """
+        connection = self.connect()
+        values = self.namespaces.get(namespace)
+        if values is None:
+            rows = connection.execute('SELECT key, value FROM lookups WHERE namespace = ?', (namespace,))
+            values = self.namespaces[namespace] = dict(rows)
+            self.touched[namespace] = set()
+            logger.debug('Lookup cache loaded: {} | Namespace: {} | Entries: {}'.format(self.path, namespace, len(values)))
+        return values
+
+    def lookup(self, namespace: str, keys: list, resolve_many) -> list:
+        """Get the values of keys, resolving and storing those that are not cached
+
+        Args:
+            namespace (str): The kind of lookup
+            keys (list(str)): The keys
+            resolve_many (list(str) -> list(str)): Resolves a list of keys that are not cached
+
+        Returns:
+            list(str): The value of each key
+        """
+        values = self.load(namespace)
+        missing = [key for key in dict.fromkeys(keys) if key not in values]
+        if missing:
+            resolved = dict(zip(missing, resolve_many(missing)))
+            values.update(resolved)
+            self.store(namespace, resolved)
+
+        touched = self.touched[namespace]
+        hits = [key for key in dict.fromkeys(keys) if key not in touched]
+        if hits:
+            touched.update(hits)
+            self.touch(namespace, hits)
+        return [values[key] for key in keys]
+
+    def get(self, namespace: str, key: str, resolve):
+        """Get the value of a single key, resolving and storing it when it is not cached
+
+        Args:
+            namespace (str): The kind of lookup
+            key (str): The key
+            resolve (str -> str): Resolves a key that is not cached
+
+        Returns:
+            str: The value
+        """
+        values = self.namespaces.get(namespace)
+        if values is not None and key in values and key in self.touched[namespace] and self.pid == os.getpid():
+            return values[key]
+        return self.lookup(namespace, [key], lambda missing: [resolve(missing_key) for missing_key in missing])[0]
+
+    def store(self, namespace: str, values: dict) -> None:
+        """Write resolved values, then evict the least recently used rows beyond max_entries
+
+        Args:
+            namespace (str): The kind of lookup
+            values (dict(str, str)): The resolved values by key
+        """
+        now = time.time()
+        connection = self.connect()
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?)', [(namespace, key, value, now) for key, value in values.items()])
+            n_rows = connection.execute('SELECT COUNT(*) FROM lookups').fetchone()[0]
+            if n_rows > self.max_entries:
+                connection.execute('DELETE FROM lookups WHERE (namespace, key) IN (SELECT namespace, key FROM lookups ORDER BY last_used LIMIT ?)',
+                                   (n_rows - self.max_entries,))
+                logger.debug('Lookup cache evicted: {} entries'.format(n_rows - self.max_entries))
+
+    def touch(self, namespace: str, keys: list) -> None:
+        """Mark keys as recently used, so they are evicted last
+
+        Args:
+            namespace (str): The kind of lookup
+            keys (list(str)): The keys
+        """
+        now = time.time()
+        connection = self.connect()
+        with connection:
+            for i in range(0, len(keys), QUERY_BATCH):
+                batch = keys[i:i + QUERY_BATCH]
+                connection.execute('UPDATE lookups SET last_used = ? WHERE namespace = ? AND key IN ({})'.format(', '.join('?' * len(batch))),
+                                   (now, namespace, *batch))
+
+    def close(self) -> None:
+        """Close the connection of this process
+        """
+        if self.connection is not None and self.pid == os.getpid():
+            self.connection.close()
+        self.connection = None
+        self.namespaces = {}
+        self.touched = {}
+
+    def __getstate__(self):
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['max_entries'])
+
+
+lookup_cache = None
+
+
+def set_lookup_cache(cache_dir: str, max_entries: int=DEFAULT_MAX_ENTRIES) -> LookupCache:
+    """Use a persistent lookup cache in cache_dir for the lookups of this process and the worker processes it starts
+
+    Args:
+        cache_dir (str | None): Directory holding the cache, None to stop caching
+        max_entries (int, optional): The number of rows kept. Defaults to DEFAULT_MAX_ENTRIES.
+
+    Returns:
+        LookupCache | None: The cache
+    """
+    global lookup_cache
+    if lookup_cache is not None:
+        lookup_cache.close()
+    lookup_cache = None if cache_dir is None else LookupCache(os.path.join(cache_dir, CACHE_FILE_NAME), max_entries=max_entries)
+    return lookup_cache
+
+
+def cached(namespace: str, key: str, resolve):
+    """Resolve a key through the lookup cache, when no cache is set the key is resolved directly
+
+    Args:
+        namespace (str): The kind of lookup
+        key (str): The key
+        resolve (str -> str): Resolves a key that is not cached
+
+    Returns:
+        str: The value
+    """
+    if lookup_cache is None:
+        return resolve(key)
+    return lookup_cache.get(namespace, key, resolve)
+
+
+def cached_many(namespace: str, keys: list, resolve_many) -> list:
+    """Resolve many keys through the lookup cache, when no cache is set the keys are resolved directly
+
+    Args:
+        namespace (str): The kind of lookup
+        keys (list(str)): The keys
+        resolve_many (list(str) -> list(str)): Resolves a list of keys that are not cached
+
+    Returns:
+        list(str): The value of each key
+    """
+    if lookup_cache is None:
+        return resolve_many(keys)
+    return lookup_cache.lookup(namespace, keys, resolve_many)
+
+
+class ResultCache:
+    """A bounded in memory cache of query results, evicting the least recently used result when full.
+    Its statistics are reported the way functools.lru_cache reports them.
+
+    Args:
+        maxsize (int, optional): The most results kept. Defaults to DEFAULT_RESULT_CACHE_SIZE.
+    """
+    def __init__(self, maxsize: int=DEFAULT_RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Get the result of a key, computing and keeping it when it is not cached
+
+        Args:
+            key (hashable): Identifies the query
+            compute (() -> Any): Computes the result
+
+        Returns:
+            Any: The result
+        """
+        try:
+            result = self.results[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return result
+
+        result = compute()
+        self.results[key] = result
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+        return result
+
+    def invalidate(self) -> None:
+        """Drop every result, keeping the statistics, used when the data the results were computed from changes
+        """
+        self.results.clear()
+
+    def clear(self) -> None:
+        """Drop every result and reset the statistics
+        """
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> CacheInfo:
+        """Get the statistics of the cache
+
+        Returns:
+            CacheInfo: The hits, misses, maximum size and current size
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.results))
+
+    def __len__(self):
+        return len(self.results)
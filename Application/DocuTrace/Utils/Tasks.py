@@ -8,6 +8,7 @@ from alive_progress import alive_bar
 
 from DocuTrace.Analysis.DataCollector import DataCollector
 from DocuTrace.Analysis.ComputeData import ComputeData, top_n_sorted
+from DocuTrace.Analysis.BatchAlsoLikes import write_also_likes, output_format
 from DocuTrace.Utils.Logging import debug, logger
 from DocuTrace.Utils.Validation import validate_user_uuid, str2bool, validate_task, validate_doc_uuid
 from DocuTrace.Utils.Exceptions import InvalidTaskIDError
@@ -16,6 +17,8 @@ from DocuTrace.Gui import main as gui
 """Provides functions to begin each task
 """
 
+DEFAULT_OUTPUT = 'also_likes.jsonl'
+
 def task_1(data_collector: DataCollector, args):
     logger.info(
         'Task 1: The core functionality of this application is written in python.')
@@ -83,8 +86,6 @@ def task_4(data_collector: DataCollector, args):
     try:
         n = get_n(args)
         compute = ComputeData(data_collector)
-        compute.sort(sort_countries=False,
-                    sort_continents=False, sort_browsers=False)
         gui.open(compute, n=n, start_tab='Task 4')
         # for i, profile in enumerate(compute.reader_profiles.values()):
         #     if i < 10:
@@ -101,7 +102,7 @@ def task_5d(data_collector: DataCollector, args):
         doc_uuid = get_doc_uuid(args)
         user_uuid = get_user_uuid(args)
         n = get_n(args)
-        compute = ComputeData(data_collector)
+        compute = ComputeData(data_collector, **get_index_options(args))
         also_likes = compute.also_likes(doc_uuid, user_uuid, sort_fn=top_n_sorted, n=n)
         gui.open(compute, doc_uuid, user_uuid, n, start_tab='Task 5d')
         # for i, doc in enumerate(also_likes):
@@ -117,7 +118,7 @@ def task_6(data_collector: DataCollector, args):
         doc_uuid = get_doc_uuid(args)
         user_uuid = get_user_uuid(args)
         n = get_n(args)
-        compute = ComputeData(data_collector)
+        compute = ComputeData(data_collector, **get_index_options(args))
         also_likes = compute.also_likes(doc_uuid, user_uuid, sort_fn=top_n_sorted, n=n)
         gui.open(compute, doc_uuid, user_uuid, n, start_tab='Task 6')
         # for i, doc in enumerate(also_likes):
@@ -133,7 +134,7 @@ def task_7(data_collector: DataCollector, args):
         doc_uuid = get_doc_uuid(args)
         user_uuid = get_user_uuid(args)
         n = get_n(args)
-        compute = ComputeData(data_collector)
+        compute = ComputeData(data_collector, **get_index_options(args))
         also_likes = compute.also_likes(
             doc_uuid, user_uuid, sort_fn=top_n_sorted, n=n)
         gui.open(compute, doc_uuid, user_uuid, n, start_tab='Task 6')
@@ -147,6 +148,71 @@ def task_8(data_collector: DataCollector, args):
     logger.info('Task 8: Command line, This is it!')
 
 
+def task_9(data_collector: DataCollector, args):
+    logger.info('Task 9: Also likes of every document, written to a file.')
+    try:
+        doc_uuid = args.doc_uuid if args is not None else None
+        user_uuid = args.user_uuid if args is not None else None
+        output = get_output(args)
+        n = get_n(args) or 10
+        compute = ComputeData(data_collector)
+        documents = 'all' if doc_uuid is None else [doc_uuid]
+        visitors = {doc_uuid: user_uuid} if doc_uuid is not None and user_uuid is not None else None
+        with open(output, 'w', newline='') as file:
+            n_documents = write_also_likes(compute.batch_also_likes(documents, visitors=visitors, n=n, max_workers=None), file, output_format(output))
+        print('Also likes of {} documents written to: {}'.format(n_documents, output))
+
+    except Exception as e:
+        logger.exception('Exception encountered during Task 9')
+
+
+def task_10(data_collector: DataCollector, args):
+    logger.info('Task 10: Most viewed and most read documents.')
+    try:
+        n = get_n(args) or 10
+        compute = ComputeData(data_collector)
+        print('Most viewed documents:')
+        compute.top_documents(n, summary='document_views')
+        print('Most read documents:')
+        compute.top_documents(n, summary='document_reads')
+
+    except Exception as e:
+        logger.exception('Exception encountered during Task 10')
+
+
+# Tasks computing also likes, they need the readers of each document which sketch mode does not keep
+also_likes_tasks = ['5d', '6', '7', '9']
+
+# DataCollector options, and the options each task needs when only that task is run.
+# Only tasks that never open the gui are listed, the gui shows a tab for every task so the other tasks need every collector.
+collector_options = ['count_doc_locations', 'count_browser', 'count_country', 'count_continent', 'build_reader_profiles', 'collect_doc_data', 'count_heavy_hitters']
+# Options that are off by default, they are turned on whenever their task is chosen
+optional_collector_options = ['count_heavy_hitters']
+task_collectors = {
+    '1': [],
+    '8': [],
+    '9': ['collect_doc_data'],
+    '10': ['count_heavy_hitters']
+}
+
+
+def task_collector_options(task_id: str, exit_early: bool) -> dict:
+    """Get the DataCollector options needed for a task, so data the task will not use is never decoded
+
+    Args:
+        task_id (str): The validated identifier of the task
+        exit_early (bool): True when only this task will be run
+
+    Returns:
+        dict(str, bool): Keyword arguments for DataCollector, empty when the default collectors are needed, as they are for every task opening the gui
+    """
+    if task_id not in task_collectors:
+        return {}
+    if not exit_early:
+        return {option: True for option in optional_collector_options if option in task_collectors[task_id]}
+    return {option: option in task_collectors[task_id] for option in collector_options}
+
+
 task_picker = OrderedDict()
 task_picker['1'] = task_1
 task_picker['2a'] = task_2a
@@ -158,6 +224,8 @@ task_picker['5d'] = task_5d
 task_picker['6'] = task_6
 task_picker['7'] = task_7
 task_picker['8'] = task_8
+task_picker['9'] = task_9
+task_picker['10'] = task_10
 
 
 def next_item(key, task_dict=task_picker) -> str:
@@ -183,7 +251,7 @@ def raise_invalid_task(*args, **kwargs):
     raise InvalidTaskIDError
 
 
-def tasks(data_collector: DataCollector, thread: Thread, task_id: str, args) -> None:
+def tasks(data_collector: DataCollector, thread: Thread, task_id: str, args, publisher=None) -> None:
     """Display a loading bar for the data processing, once processing is complete start the task based on the ArgParse parameters.
 
     Args:
@@ -191,20 +259,56 @@ def tasks(data_collector: DataCollector, thread: Thread, task_id: str, args) ->
         thread (Thread): The thread currently processing the file
         task_id (str): The validated identifier of the task to begin running
         args (Namespace): The CLI arguments
+        publisher (SnapshotPublisher, optional): When the file is being followed, tasks start after the initial load and use the latest snapshot. Defaults to None.
     """
     finished = False
     loading_event = Event()
     loading_bar = Thread(target=loading_data, args=(loading_event,), daemon=True)
     loading_bar.start()
-    thread.join()
+    if publisher is None:
+        thread.join()
+    else:
+        while not publisher.ready.wait(0.1) and thread.is_alive():
+            pass
     loading_event.set()
     loading_bar.join()
+    check_load(thread)
 
     if args.exit_early:
-        finished, task_id, args = begin_task(data_collector, task_id, args)
+        finished, task_id, args = begin_task(current_data(data_collector, publisher), task_id, args)
     else:
         while not finished:
-            finished, task_id, args = begin_task(data_collector, task_id, args)
+            check_load(thread)
+            finished, task_id, args = begin_task(current_data(data_collector, publisher), task_id, args)
+
+
+def check_load(thread: Thread) -> None:
+    """Stop the tasks when the thread processing the file has failed, rather than running them on incomplete data
+
+    Args:
+        thread (Thread): The thread processing the file
+
+    Raises:
+        RuntimeError: When the thread ended with an exception
+    """
+    error = getattr(thread, 'error', None)
+    if error is not None:
+        raise RuntimeError('Processing the data file failed: {}'.format(error)) from error
+
+
+def current_data(data_collector: DataCollector, publisher=None) -> DataCollector:
+    """Get the data a task should use, the latest snapshot when the file is being followed
+
+    Args:
+        data_collector (DataCollector): Instance of the DataCollector class used to process the file.
+        publisher (SnapshotPublisher, optional): The publisher of snapshots of a followed file. Defaults to None.
+
+    Returns:
+        DataCollector: The data collector, or its latest snapshot
+    """
+    if publisher is None or publisher.latest() is None:
+        return data_collector
+    return publisher.latest()
 
 
 def begin_task(data_collector: DataCollector, task_id: str, args) -> bool:
@@ -312,6 +416,48 @@ def get_n(args) -> int:
         return args.limit_data
 
 
+def get_output(args) -> str:
+    """Helper function to get the path of the output file
+
+    Args:
+        args (Namespace): The CLI arguments
+
+    Returns:
+        str: The output path
+    """
+    if args is None or getattr(args, 'output', None) is None:
+        return DEFAULT_OUTPUT
+    return args.output
+
+
+def get_index_options(args) -> dict:
+    """Helper function to get the also likes index options of ComputeData
+
+    Args:
+        args (Namespace): The CLI arguments
+
+    Returns:
+        dict: Keyword arguments for ComputeData, empty when no index was requested
+    """
+    if args is None or getattr(args, 'also_likes_index', None) is None:
+        return {}
+    return {'also_likes_index': True, 'index_top_k': args.also_likes_index or None}
+
+
+class LoadThread(Thread):
+    """A thread processing the data file, it keeps the exception that ended it so the tasks can stop instead of using incomplete data
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.error = None
+
+    def run(self):
+        try:
+            super().run()
+        except Exception as e:
+            self.error = e
+
+
 def loading_data(done_event: Event) -> None:
     """Display a loading bar while the data is being loaded
 
@@ -5,6 +5,7 @@ import argparse
 import regex
 
 from DocuTrace.Utils.Logging import logger
+from DocuTrace.Analysis.Compression import compression_of
 from DocuTrace.Utils.Exceptions import InvalidPathError, InvalidTaskIDError, InvalidUserUUIDError, InvalidDocUUIDError
 
 
@@ -118,6 +119,21 @@ def str2bool(v):
         raise argparse.ArgumentTypeError('Boolean value expected.')
 
 
+def is_json_path(path: str) -> bool:
+    """Check the path names a json file, optionally compressed with gzip, xz or zstd
+
+    Args:
+        path (str): A path provided by the user
+
+    Returns:
+        bool: True if the file extension is .json, or .json followed by a compression extension
+    """
+    path = path.lower()
+    if compression_of(path) is not None:
+        path, _ = os.path.splitext(path)
+    return path.endswith('.json')
+
+
 def validate_path(path: str) -> str:
     """Validate the path string
 
@@ -131,8 +147,8 @@ def validate_path(path: str) -> str:
         str: A valid path
     """
     attempts = 1
-    if not is_pathname_valid(path) or not path.lower().endswith('.json'):
-        while (not is_pathname_valid(path) or not path.lower().endswith('.json')) and attempts < MAX_TRIES:
+    if not is_pathname_valid(path) or not is_json_path(path):
+        while (not is_pathname_valid(path) or not is_json_path(path)) and attempts < MAX_TRIES:
             logger.warning('Invalid path to file detected. Please check and try again. If all else fails try and absolute path.')
             path = input('Please enter a valid path: ')
             attempts += 1
@@ -142,6 +158,32 @@ def validate_path(path: str) -> str:
     return path
 
 
+def validate_paths(paths: list) -> list:
+    """Validate a list of paths, directories and glob patterns, each is expanded into the files it names
+
+    Args:
+        paths (list(str)): Paths provided by the user
+
+    Raises:
+        InvalidPathError: When no json files are found
+
+    Returns:
+        list(str): Valid paths to files, largest first
+    """
+    from DocuTrace.Analysis.FileRead import resolve_paths
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path) or any(char in path for char in '*?['):
+            files += resolve_paths(path)
+        else:
+            files.append(validate_path(path))
+
+    if not files:
+        raise InvalidPathError('No json files found in: {}'.format(paths))
+    return resolve_paths(files)
+
+
 def validate_task(task: str) -> str:
     """Validate the task identifying string
 
@@ -1,12 +1,18 @@
 #!/usr/bin/env python
 import sys, argparse
-from threading import Thread
+from argparse import ArgumentTypeError
+from decouple import config
+from DocuTrace.Analysis.Columnar import ColumnarCollector
+from DocuTrace.Analysis.Compression import compression_of
 from DocuTrace.Analysis.ComputeData import ComputeData
 from DocuTrace.Analysis.DataCollector import DataCollector
+from DocuTrace.Analysis.FileRead import SnapshotPublisher
+from DocuTrace.Analysis.JsonDecoder import decoder_loaders
+from DocuTrace.Utils.Cache import set_lookup_cache
 from DocuTrace.Utils.Logging import logger
-from DocuTrace.Utils.Validation import str2bool, validate_path, validate_task
+from DocuTrace.Utils.Validation import str2bool, validate_paths, validate_task
 from DocuTrace.Utils.Exceptions import InvalidPathError, InvalidTaskIDError
-from DocuTrace.Utils.Tasks import tasks
+from DocuTrace.Utils.Tasks import LoadThread, tasks, task_collector_options, also_likes_tasks
 
 
 def main():
@@ -20,14 +26,37 @@ def run(args):
         logger.info('Verbosity set to display info messages.')
         logger.debug('Verbosity set to display debug messages.')
 
-        path = validate_path(args.filepath)
-
-        data_collector = DataCollector(path)
-        load = Thread(target=process_file, args=(data_collector,), daemon=True)
+        path = validate_paths(args.filepath)
+        task = validate_task(args.task_id)
+        if args.resume and args.checkpoint is None:
+            raise ArgumentTypeError('--resume requires a --checkpoint file')
+        if args.cache_dir:
+            set_lookup_cache(args.cache_dir)
+
+        collector_options = task_collector_options(task, args.exit_early)
+        if args.sketch:
+            if args.columnar:
+                raise ArgumentTypeError('--sketch cannot be used with --columnar')
+            if task in also_likes_tasks:
+                raise ArgumentTypeError('--sketch cannot be used with task {}, also likes need the readers of each document'.format(task))
+            collector_options['sketch'] = True
+        if args.follow:
+            if len(path) != 1 or compression_of(path[0]) is not None:
+                raise ArgumentTypeError('--follow reads a single uncompressed file, got: {}'.format(path))
+            if args.checkpoint is not None or args.resume or args.mmap:
+                raise ArgumentTypeError('--follow cannot be used with --checkpoint, --resume or --mmap')
+
+        collector_class = ColumnarCollector if args.columnar else DataCollector
+        data_collector = collector_class(path, **collector_options)
+        if args.follow:
+            publisher = SnapshotPublisher()
+            load = LoadThread(target=follow_file, args=(data_collector, publisher, args), daemon=True)
+        else:
+            publisher = None
+            load = LoadThread(target=process_file, args=(data_collector, args), daemon=True)
         load.start()
 
-        task = validate_task(args.task_id)
-        tasks(data_collector, load, task, args)
+        tasks(data_collector, load, task, args, publisher=publisher)
 
 
 
@@ -50,7 +79,7 @@ def run(args):
 def parse_args():
     """Parse the args provided to this namespace
 
-    usage: ``main.py [-h] [-u USER_UUID] [-d DOC_UUID] [-t TASK_ID] -f FILEPATH [-n [LIMIT_DATA]] [-v [VERBOSE]] [-e [EXIT_EARLY]]``
+    usage: ``main.py [-h] [-u USER_UUID] [-d DOC_UUID] [-t TASK_ID] -f FILEPATH [FILEPATH ...] [-n [LIMIT_DATA]] [-v [VERBOSE]] [-e [EXIT_EARLY]] [-m [MMAP]] [-j JSON_DECODER] [-F [FOLLOW]] [-c CHECKPOINT] [-r [RESUME]] [-C [COLUMNAR]] [-D CACHE_DIR] [-I [ALSO_LIKES_INDEX]] [-o OUTPUT] [-S [SKETCH]]``
 
     **Command line interface for DocuTrace.**
     
@@ -67,17 +96,37 @@ def parse_args():
                             
     -t TASK_ID, --task_id TASK_ID               Specifies the task id
                             
-    -f FILEPATH, --filepath FILEPATH            Specifies the file name
+    -f FILEPATH, --filepath FILEPATH            Specifies the file names, directories or glob patterns, .json files may be compressed with gzip (.gz), xz (.xz) or zstd (.zst)
                             
 
     Secondary parameters:
 
-    -n LIMIT_DATA, --limit_data LIMIT_DATA      Limits the number of displayed data points for tasks 2a, 2b, 3a, 3b, 4d, and 5.
+    -n LIMIT_DATA, --limit_data LIMIT_DATA      Limits the number of displayed data points for tasks 2a, 2b, 3a, 3b, 4d, 5 and 10.
                             
     -v VERBOSE, --verbose VERBOSE               Set the verbosity level, 20 for INFO, 10 for DEBUG. Default is 30: WARN
                             
     -e EXIT_EARLY, --exit_early EXIT_EARLY      Exit the program after running only the specified task.
 
+    -m MMAP, --mmap MMAP                        Memory map the file, each worker process parses its own byte ranges.
+
+    -j JSON_DECODER, --json_decoder JSON_DECODER    Select the JSON decoder: orjson, simdjson, ujson or json. Defaults to the fastest installed.
+
+    -F FOLLOW, --follow FOLLOW                  Keep reading lines appended to a single uncompressed file, tasks use a snapshot that is refreshed as the file grows. Cannot be used with -c, -r or -m.
+
+    -c CHECKPOINT, --checkpoint CHECKPOINT      Periodically save reading progress to this file.
+
+    -r RESUME, --resume RESUME                  Continue reading from the checkpoint instead of the start of the file.
+
+    -C COLUMNAR, --columnar COLUMNAR            Store events in a columnar table and derive the statistics when reading ends, faster for large files.
+
+    -D CACHE_DIR, --cache_dir CACHE_DIR         Directory of a persistent cache of user agent and country lookups reused by later runs, defaults to DOCUTRACE_CACHE_DIR when set in the environment or .env file.
+
+    -I ALSO_LIKES_INDEX, --also_likes_index ALSO_LIKES_INDEX    Precompute the co-readers of every pair of documents for tasks 5d, 6 and 7, optionally keeping only the top k co-read documents of each.
+
+    -o OUTPUT, --output OUTPUT                  File task 9 writes the also likes of every document to, as CSV when it ends in .csv, otherwise as JSON lines. Defaults to also_likes.jsonl.
+
+    -S SKETCH, --sketch SKETCH                  Estimate document locations and distinct readers with fixed size sketches instead of exact counts, for tasks 2a and 2b when exact counts are not required. Not available for the also likes tasks 5d, 6, 7 and 9.
+
     Returns:
         ArgumentParser: Parsed arguments
     """
@@ -86,21 +135,56 @@ def parse_args():
     args.add_argument('-u', '--user_uuid', help='Specifies the user uuid', required=False, default=None, type=str)
     args.add_argument('-d', '--doc_uuid',help='Specifies the document uuid', required=False, default=None, type=str)
     args.add_argument('-t', '--task_id', help='Specifies the task id', required=False, type=str)
-    args.add_argument('-f', '--filepath', help='Specifies the file name', required=True, type=str)
+    args.add_argument('-f', '--filepath', help='Specifies the file names, directories or glob patterns, .json files may be compressed with gzip (.gz), xz (.xz) or zstd (.zst)', required=True, type=str, nargs='+')
 
     secondary_args = parser.add_argument_group('Secondary parameters')
-    secondary_args.add_argument('-n', '--limit_data', help='Limits the number of displayed data points for tasks 2a, 2b, 3a, 3b, 4d, and 5.', type=int, required=False, default=None, const=20, nargs='?')
+    secondary_args.add_argument('-n', '--limit_data', help='Limits the number of displayed data points for tasks 2a, 2b, 3a, 3b, 4d, 5 and 10.', type=int, required=False, default=None, const=20, nargs='?')
     secondary_args.add_argument('-v', '--verbose', type=int, required=False, default=30, nargs='?',
                                 const=20, help='Set the verbosity level, 20 for INFO, 10 for DEBUG. Default is 30: WARN')
     secondary_args.add_argument('-e', '--exit_early', type=str2bool, default=True, const=False,
                                 nargs='?', help='Continue the program after running only the specified task.')
+    secondary_args.add_argument('-m', '--mmap', type=str2bool, default=False, const=True,
+                                nargs='?', help='Memory map the file, each worker process parses its own byte ranges.')
+    secondary_args.add_argument('-j', '--json_decoder', type=str, required=False, default=None, choices=list(decoder_loaders.keys()),
+                                help='Select the JSON decoder. Defaults to the fastest installed.')
+    secondary_args.add_argument('-F', '--follow', type=str2bool, default=False, const=True,
+                                nargs='?', help='Keep reading lines appended to a single uncompressed file, tasks use a snapshot that is refreshed as the file grows. Cannot be used with -c, -r or -m.')
+    secondary_args.add_argument('-c', '--checkpoint', type=str, required=False, default=None,
+                                help='Periodically save reading progress to this file.')
+    secondary_args.add_argument('-r', '--resume', type=str2bool, default=False, const=True,
+                                nargs='?', help='Continue reading from the checkpoint instead of the start of the file.')
+    secondary_args.add_argument('-C', '--columnar', type=str2bool, default=False, const=True,
+                                nargs='?', help='Store events in a columnar table and derive the statistics when reading ends, faster for large files.')
+    secondary_args.add_argument('-D', '--cache_dir', type=str, required=False, default=config('DOCUTRACE_CACHE_DIR', default=None),
+                                help='Directory of a persistent cache of user agent and country lookups reused by later runs, defaults to DOCUTRACE_CACHE_DIR when set in the environment or .env file.')
+    secondary_args.add_argument('-I', '--also_likes_index', type=int, required=False, default=None, const=0, nargs='?',
+                                help='Precompute the co-readers of every pair of documents for tasks 5d, 6 and 7, optionally keeping only the top k co-read documents of each.')
+    secondary_args.add_argument('-o', '--output', type=str, required=False, default=None,
+                                help='File task 9 writes the also likes of every document to, as CSV when it ends in .csv, otherwise as JSON lines. Defaults to also_likes.jsonl.')
+    secondary_args.add_argument('-S', '--sketch', type=str2bool, default=False, const=True,
+                                nargs='?', help='Estimate document locations and distinct readers with fixed size sketches instead of exact counts, for tasks 2a and 2b when exact counts are not required. Not available for the also likes tasks 5d, 6, 7 and 9.')
     return parser.parse_args()
 
 
-def process_file(data_collector):
+def process_file(data_collector, args):
     """Begin processing this file.
+
+    Args:
+        data_collector (DataCollector): The data collector to populate
+        args (Namespace): The CLI arguments
+    """
+    data_collector.gather_data(use_mmap=args.mmap, decoder=args.json_decoder, checkpoint=args.checkpoint, resume=args.resume)
+
+
+def follow_file(data_collector, publisher, args):
+    """Process this file, then keep processing lines appended to it.
+
+    Args:
+        data_collector (DataCollector): The data collector to populate
+        publisher (SnapshotPublisher): Receives snapshots of the data collector as the file grows
+        args (Namespace): The CLI arguments
     """
-    data_collector.gather_data()
+    data_collector.follow_data(publisher=publisher, decoder=args.json_decoder)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,23 @@
+import pytest
+
+
+@pytest.fixture
+def mock_lines():
+    """Lines of a sample event file, each from the same country"""
+    return ['{"visitor_country": "MX", "n": %d}\n' % i for i in range(50)]
+
+
+@pytest.fixture
+def write_lines(tmp_path):
+    """Write lines to a file in the temporary directory of the test, returning a function that takes the lines and gives the path"""
+    def write(lines, name='sample.json'):
+        path = tmp_path / name
+        path.write_text(''.join(lines))
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def mock_file(write_lines, mock_lines):
+    """Path to a sample event file holding mock_lines"""
+    return write_lines(mock_lines)
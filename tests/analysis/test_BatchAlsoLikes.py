@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+import numpy as np
+import pytest
+from DocuTrace.Analysis.BatchAlsoLikes import batch_also_likes, write_also_likes, output_format, top_order
+from DocuTrace.Analysis.ComputeData import ComputeData, sort_dict_by_value
+from DocuTrace.Analysis.DataCollector import DataCollector
+
+
+def _collector(n_reads=400, n_documents=15, n_visitors=12):
+    collector = DataCollector()
+    rng = np.random.default_rng(1)
+    for document, visitor in zip(rng.integers(0, n_documents, size=n_reads).tolist(), rng.integers(0, n_visitors, size=n_reads).tolist()):
+        collector.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'doc{}'.format(document), 'visitor_uuid': 'visitor{}'.format(visitor)})
+    collector.finalise()
+    return collector
+
+
+def test_batch_matches_also_likes():
+    compute = ComputeData(_collector())
+    results = list(compute.batch_also_likes(n=None))
+    assert len(results) == len(compute.document_readers)
+    for document, visitor, also_likes in results:
+        assert visitor is None
+        counts = compute.find_also_likes_counts(document)
+        assert dict(also_likes) == counts
+        assert [also_liked for also_liked, _ in also_likes] == sort_dict_by_value(counts)
+
+
+def test_batch_visitors_and_blocks():
+    compute = ComputeData(_collector())
+    visitors = {'doc1': 'visitor3', 'doc4': 'visitor0', 'doc7': 'unknown'}
+    results = list(batch_also_likes(compute.read_graph, ['doc1', 'doc4', 'missing', 'doc7'], visitors=visitors, n=3, block_size=1))
+    assert [(document, visitor) for document, visitor, _ in results] == [('doc1', 'visitor3'), ('doc4', 'visitor0'), ('doc7', None)]
+    for document, visitor, also_likes in results:
+        expected = compute.also_likes(document, visitor)[:3]
+        assert [also_liked for also_liked, _ in also_likes] == expected
+
+
+def test_batch_process_pool():
+    compute = ComputeData(_collector())
+    assert list(batch_also_likes(compute.read_graph, max_workers=2, block_size=50)) == list(compute.batch_also_likes())
+
+
+def test_top_order():
+    owners = np.array([0, 0, 0, 1])
+    counts = np.array([1, 3, 3, 2])
+    ranks = np.array([0, 2, 1, 0])
+    assert top_order(owners, counts, ranks, 2).tolist() == [2, 1, 0, 3]
+    assert top_order(owners[:0], counts[:0], ranks[:0], 0).tolist() == []
+
+
+def test_write_also_likes():
+    results = [('doc1', None, [('doc2', 2), ('doc3', 1)]), ('doc2', 'a', [])]
+    file = io.StringIO()
+    assert write_also_likes(results, file) == 2
+    lines = [json.loads(line) for line in file.getvalue().splitlines()]
+    assert lines[0] == {'document': 'doc1', 'visitor': None, 'also_likes': [{'document': 'doc2', 'readers': 2}, {'document': 'doc3', 'readers': 1}]}
+    assert lines[1]['also_likes'] == []
+
+    file = io.StringIO()
+    assert write_also_likes(results, file, 'csv') == 2
+    rows = list(csv.reader(io.StringIO(file.getvalue())))
+    assert rows == [['document', 'visitor', 'rank', 'also_likes', 'readers'], ['doc1', '', '1', 'doc2', '2'], ['doc1', '', '2', 'doc3', '1']]
+
+    with pytest.raises(ValueError):
+        write_also_likes(results, io.StringIO(), 'xml')
+
+
+def test_output_format():
+    assert output_format('out.CSV') == 'csv'
+    assert output_format('out.jsonl') == 'jsonl'
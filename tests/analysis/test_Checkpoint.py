@@ -0,0 +1,86 @@
+import pickle
+import pytest
+from unittest.mock import patch
+from DocuTrace.Analysis.Checkpoint import Checkpoint
+from DocuTrace.Analysis.DataCollector import DataCollector
+from DocuTrace.Analysis.FileRead import parse_lines, partition_file
+
+
+def _interrupt_after(n_chunks):
+    calls = []
+    def interrupting_parse_lines(*args, **kwargs):
+        if len(calls) >= n_chunks:
+            raise KeyboardInterrupt
+        calls.append(1)
+        parse_lines(*args, **kwargs)
+    return interrupting_parse_lines
+
+
+def test_resume_after_interrupt(tmp_path, mock_file, mock_lines):
+    path = mock_file
+    checkpoint = str(tmp_path / 'checkpoint')
+
+    with patch('DocuTrace.Analysis.FileRead.parse_lines', new=_interrupt_after(3)):
+        with pytest.raises(KeyboardInterrupt):
+            DataCollector(path).gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint, checkpoint_interval=0)
+
+    with open(checkpoint, 'rb') as f:
+        saved = pickle.load(f)
+    assert len(saved['done']) == 3
+    assert 0 < saved['data_collector'].countries['MX'] < len(mock_lines)
+
+    data_collector = DataCollector(path)
+    data_collector.gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint, resume=True)
+    assert data_collector.countries['MX'] == len(mock_lines)
+
+
+def test_resume_through_other_path(tmp_path, monkeypatch, mock_file, mock_lines):
+    path = mock_file
+    checkpoint = str(tmp_path / 'checkpoint')
+
+    with patch('DocuTrace.Analysis.FileRead.parse_lines', new=_interrupt_after(3)):
+        with pytest.raises(KeyboardInterrupt):
+            DataCollector(path).gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint, checkpoint_interval=0)
+
+    monkeypatch.chdir(tmp_path)
+    data_collector = DataCollector('sample.json')
+    data_collector.gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint, resume=True)
+    assert data_collector.countries['MX'] == len(mock_lines)
+
+
+def test_resume_completed_checkpoint(tmp_path, mock_file, mock_lines):
+    path = mock_file
+    checkpoint = str(tmp_path / 'checkpoint')
+    DataCollector(path).gather_data(concurrent=True, max_workers=2, chunk_size=100, checkpoint=checkpoint, checkpoint_interval=0)
+
+    with open(checkpoint, 'rb') as f:
+        saved = pickle.load(f)
+    assert set(saved['done']) == set(partition_file(path, chunk_size=100))
+
+    data_collector = DataCollector(path)
+    with patch('DocuTrace.Analysis.FileRead.parse_lines', new=_interrupt_after(0)):
+        data_collector.gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint, resume=True)
+    assert data_collector.countries['MX'] == len(mock_lines)
+
+
+def test_resume_changed_file(tmp_path, mock_file, mock_lines):
+    path = mock_file
+    checkpoint = str(tmp_path / 'checkpoint')
+    DataCollector(path).gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint)
+
+    with open(path, 'a') as f:
+        f.write('{"visitor_country": "GB"}\n')
+    data_collector = DataCollector(path)
+    data_collector.gather_data(concurrent=False, chunk_size=100, checkpoint=checkpoint, resume=True)
+    assert data_collector.countries == {'MX': len(mock_lines), 'GB': 1}
+
+
+def test_resume_without_checkpoint(tmp_path, mock_file):
+    path = mock_file
+    checkpoint = Checkpoint(str(tmp_path / 'missing'), resume=True)
+    assert checkpoint.start(DataCollector(path), [path], 100) == set()
+
+
+def test_checkpoint_due():
+    assert Checkpoint('path', interval=0).due()
+    assert not Checkpoint('path', interval=60).due()
@@ -0,0 +1,37 @@
+from DocuTrace.Analysis.ChunkSize import ChunkSizeTuner, ChunkStats
+
+
+def test_tuner_initial_size():
+    tuner = ChunkSizeTuner(1000)
+    assert tuner() == 1000
+    tuner.observe_queue(0)
+    assert tuner() == 1000
+
+
+def test_tuner_follows_throughput():
+    tuner = ChunkSizeTuner(1000, min_size=10, max_size=10 ** 9, target_seconds=0.5, smoothing=1)
+    tuner.record(ChunkStats(4000, 1.0))
+    assert tuner() == 2000
+    tuner.record(ChunkStats(8000, 1.0))
+    assert tuner() == 4000
+
+
+def test_tuner_starved_queue():
+    tuner = ChunkSizeTuner(1000, min_size=10, max_size=10 ** 9, target_seconds=1, smoothing=1)
+    tuner.record(ChunkStats(4000, 1.0))
+    tuner.observe_queue(0)
+    assert tuner() == 2000
+    tuner.observe_queue(3)
+    assert tuner() == 4000
+    tuner.observe_queue(None)
+    assert tuner() == 4000
+
+
+def test_tuner_bounds():
+    tuner = ChunkSizeTuner(1000, min_size=100, max_size=5000, target_seconds=1, smoothing=1)
+    tuner.record(ChunkStats(10 ** 6, 1.0))
+    assert tuner() == 5000
+    tuner.record(ChunkStats(1, 1.0))
+    assert tuner() == 100
+    tuner.record(ChunkStats(0, 0))
+    assert tuner() == 100
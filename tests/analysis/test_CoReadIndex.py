@@ -0,0 +1,69 @@
+import numpy as np
+from DocuTrace.Analysis.CoReadIndex import CoReadIndex, block_bounds
+from DocuTrace.Analysis.ComputeData import ComputeData
+from DocuTrace.Analysis.DataCollector import DataCollector
+from DocuTrace.Analysis.Interning import Interner, IdRelation
+from DocuTrace.Analysis.ReadGraph import ReadGraph
+
+document_readers = {
+    '123': ['a', 'c'],
+    '456': ['a', 'b', 'c', 'a'],
+    '789': ['b', 'c'],
+    '000': ['d']
+}
+
+
+def _index(top_k=None, block_size=1 << 22):
+    graph = ReadGraph.from_relation(IdRelation.from_dict(document_readers, Interner(), Interner()))
+    return graph, CoReadIndex(graph, top_k=top_k, block_size=block_size)
+
+
+def _counts(graph, index, document, visitor=None):
+    visitor_id = None if visitor is None else graph.visitors.get_id(visitor)
+    documents, counts = index.counts(graph.documents.get_id(document), visitor_id)
+    return dict(zip(graph.documents.lookup_many(documents.tolist()), counts.tolist()))
+
+
+def test_block_bounds():
+    assert block_bounds(np.array([4, 4, 9, 1, 1]), 8) == [(0, 2), (2, 3), (3, 5)]
+    assert block_bounds(np.array([], dtype=np.int64), 8) == []
+
+
+def test_co_read_counts():
+    graph, index = _index()
+    assert _counts(graph, index, '456') == {'123': 2, '789': 2}
+    assert _counts(graph, index, '123') == {'456': 2, '789': 1}
+    assert _counts(graph, index, '000') == {}
+
+
+def test_co_read_counts_blocks():
+    graph, index = _index()
+    _, blocked = _index(block_size=1)
+    assert blocked.neighbours.indices.tolist() == index.neighbours.indices.tolist()
+    assert blocked.neighbours.counts.tolist() == index.neighbours.counts.tolist()
+
+
+def test_co_read_counts_exclude_visitor():
+    graph, index = _index()
+    assert _counts(graph, index, '456', 'a') == {'123': 1, '789': 2}
+    assert _counts(graph, index, '123', 'b') == {'456': 2, '789': 1}
+    assert _counts(graph, index, '789', 'c') == {'456': 1}
+
+
+def test_co_read_top_k():
+    graph, index = _index(top_k=1)
+    assert _counts(graph, index, '123') == {'456': 2}
+    assert _counts(graph, index, '456') == {'123': 2}
+
+
+def test_index_matches_read_graph():
+    collector = DataCollector()
+    rng = np.random.default_rng(0)
+    for document, visitor in rng.integers(0, 12, size=(300, 2)).tolist():
+        collector.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'doc{}'.format(document), 'visitor_uuid': 'visitor{}'.format(visitor)})
+    collector.finalise()
+    compute = ComputeData(collector)
+    indexed = ComputeData(collector, also_likes_index=True)
+    for document in collector.document_readers:
+        for visitor in [None, 'visitor0', 'visitor5', 'unknown']:
+            assert indexed.find_also_likes_counts(document, visitor) == compute.find_also_likes_counts(document, visitor)
@@ -0,0 +1,116 @@
+import json
+from DocuTrace.Analysis.Columnar import ColumnarCollector
+from DocuTrace.Analysis.DataCollector import DataCollector
+
+iphone = 'Mozilla/5.0 (iPhone; CPU iPhone OS 5_1 like Mac OS X) AppleWebKit/534.46 (KHTML, like Gecko) Version/5.1 Mobile/9B179 Safari/7534.48.3'
+firefox = 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:27.0) Gecko/20100101 Firefox/27.0'
+mock_events = [
+    {'ts': 1, 'visitor_uuid': 'a', 'subject_doc_id': 'doc1', 'visitor_country': 'MX', 'visitor_useragent': iphone, 'event_type': 'read'},
+    {'ts': 2, 'visitor_uuid': 'b', 'subject_doc_id': 'doc1', 'visitor_country': 'GB', 'visitor_useragent': firefox, 'event_type': 'read'},
+    {'ts': 3, 'visitor_uuid': 'a', 'subject_doc_id': 'doc2', 'visitor_country': 'MX', 'visitor_useragent': iphone, 'event_type': 'read'},
+    {'ts': 4, 'visitor_uuid': 'a', 'subject_doc_id': 'doc2', 'visitor_country': 'MX', 'visitor_useragent': iphone, 'event_type': 'pagereadtime', 'event_readtime': 500},
+    {'ts': 5, 'visitor_uuid': 'b', 'visitor_country': 'US', 'visitor_useragent': firefox, 'event_type': 'pagereadtime', 'event_readtime': 250},
+    {'ts': 6, 'visitor_uuid': 'a', 'subject_doc_id': 'doc1', 'visitor_country': 'MX', 'visitor_useragent': iphone, 'event_type': 'pagereadtime', 'event_readtime': 100},
+    {'ts': 7, 'visitor_uuid': 'c', 'subject_doc_id': 'doc3', 'visitor_country': 'GB', 'event_type': 'impression'},
+]
+
+
+def _event_lines(events=mock_events):
+    return [json.dumps(event) + '\n' for event in events]
+
+
+def _assert_same_data(columnar, expected):
+    assert columnar.countries == expected.countries
+    assert columnar.continents == expected.continents
+    assert columnar.browser_families == expected.browser_families
+    assert columnar.reader_profiles == expected.reader_profiles
+    assert dict(columnar.document_readers) == dict(expected.document_readers)
+    assert dict(columnar.visitor_documents) == dict(expected.visitor_documents)
+    assert columnar.doc_locations.keys() == expected.doc_locations.keys()
+    for doc_uuid, location in expected.doc_locations.items():
+        assert columnar.doc_locations[doc_uuid].countries == location.countries
+        assert columnar.doc_locations[doc_uuid].continents == location.continents
+
+
+def test_matches_data_collector(write_lines):
+    path = write_lines(_event_lines())
+    expected = DataCollector(path)
+    expected.gather_data(concurrent=False)
+    columnar = ColumnarCollector(path)
+    columnar.gather_data(concurrent=False)
+    assert len(columnar) == len(mock_events)
+    _assert_same_data(columnar, expected)
+
+
+def test_concurrent_matches_data_collector(write_lines):
+    path = write_lines(_event_lines(mock_events * 20))
+    expected = DataCollector(path)
+    expected.gather_data(concurrent=False)
+    columnar = ColumnarCollector(path)
+    columnar.gather_data(concurrent=True, max_workers=2, chunk_size=500)
+    assert len(columnar) == len(mock_events) * 20
+    assert columnar.countries == expected.countries
+    assert columnar.reader_profiles == expected.reader_profiles
+    assert {doc: sorted(readers) for doc, readers in columnar.document_readers.items()} == \
+        {doc: sorted(readers) for doc, readers in expected.document_readers.items()}
+
+
+def test_merge():
+    own = ColumnarCollector()
+    other = ColumnarCollector()
+    own.collect_chunk(mock_events[:3])
+    other.collect_chunk(mock_events[3:])
+    own.merge(other)
+    own.finalise()
+    assert len(own) == len(mock_events)
+    assert own.countries == {'MX': 4, 'GB': 2, 'US': 1}
+    assert own.reader_profiles['a'].read_time == 600
+    assert own.column('ts').tolist() == list(range(1, 8))
+
+
+def test_missing_values():
+    columnar = ColumnarCollector()
+    columnar.collect_chunk([{'ts': 1, 'event_type': 'read'}])
+    columnar.finalise()
+    assert columnar.countries == {}
+    assert columnar.browser_families == {}
+    assert dict(columnar.document_readers) == {}
+
+
+def test_derive_options():
+    columnar = ColumnarCollector(count_browser=False, build_reader_profiles=False)
+    columnar.collect_chunk(mock_events)
+    columnar.finalise()
+    assert columnar.browser_families == {}
+    assert len(columnar.reader_profiles) == 0
+    assert columnar.countries['MX'] == 4
+
+
+def test_clear():
+    columnar = ColumnarCollector()
+    columnar.collect_chunk(mock_events)
+    columnar.finalise()
+    columnar.clear()
+    assert len(columnar) == 0
+    assert len(columnar.user_agents) == 0
+
+
+def test_collect_chunk_boundaries():
+    whole = ColumnarCollector()
+    whole.collect_chunk(mock_events)
+    chunked = ColumnarCollector()
+    for event in mock_events:
+        chunked.collect_chunk([event])
+    for name in whole.columns:
+        assert chunked.column(name).tolist() == whole.column(name).tolist()
+
+
+def test_heavy_hitters_match_data_collector(write_lines):
+    path = write_lines(_event_lines(mock_events * 5))
+    expected = DataCollector(path, count_heavy_hitters=True)
+    expected.gather_data(concurrent=True, max_workers=2, chunk_size=500)
+    columnar = ColumnarCollector(path, count_heavy_hitters=True)
+    columnar.gather_data(concurrent=False)
+    for name in ('document_views', 'document_reads', 'user_agents'):
+        assert columnar.heavy_hitters[name].top() == expected.heavy_hitters[name].top()
+    assert columnar.heavy_hitters['document_reads'].top(1)[0] == ('doc1', 10, 0)
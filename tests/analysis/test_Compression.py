@@ -0,0 +1,96 @@
+import gzip
+import lzma
+import struct
+import zlib
+import pytest
+from DocuTrace.Analysis.Compression import compression_of, frame_index, partition_frames, read_frame_range, FrameRange
+from DocuTrace.Analysis.DataCollector import DataCollector
+from DocuTrace.Utils.Validation import is_json_path
+
+lines = [('{"visitor_country": "%s", "n": %d}' % (['MX', 'GB', 'CA'][i % 3], i)).encode() for i in range(60)]
+data = b'\n'.join(lines) + b'\n'
+
+
+def write_bgzf(path, block_size):
+    with open(path, 'wb') as f:
+        for i in range(0, len(data), block_size):
+            block = data[i:i + block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            deflated = compressor.compress(block) + compressor.flush()
+            header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff' + struct.pack('<H', 6) + b'BC' + struct.pack('<HH', 2, 25 + len(deflated))
+            f.write(header + deflated + struct.pack('<II', zlib.crc32(block), len(block)))
+
+
+def write_seekable_zstd(path, block_size):
+    zstandard = pytest.importorskip('zstandard')
+    frames = [zstandard.ZstdCompressor().compress(data[i:i + block_size]) for i in range(0, len(data), block_size)]
+    sizes = [len(data[i:i + block_size]) for i in range(0, len(data), block_size)]
+    table = b''.join(struct.pack('<II', len(frame), size) for frame, size in zip(frames, sizes))
+    footer = struct.pack('<IBI', len(frames), 0, 0x8F92EAB1)
+    with open(path, 'wb') as f:
+        f.write(b''.join(frames))
+        f.write(struct.pack('<II', 0x184D2A5E, len(table) + len(footer)) + table + footer)
+
+
+def read_all(path, codec, chunk_size):
+    result = []
+    for frame_range in partition_frames(path, codec, chunk_size=chunk_size):
+        result += read_frame_range(frame_range)
+    return result
+
+
+def test_compression_of():
+    assert compression_of('a.json.gz') == 'gzip'
+    assert compression_of('a.JSON.XZ') == 'xz'
+    assert compression_of('a.json.zst') == 'zstd'
+    assert compression_of('a.json') is None
+
+
+def test_is_json_path():
+    assert is_json_path('a.json')
+    assert is_json_path('a.json.gz')
+    assert is_json_path('a.json.zst')
+    assert not is_json_path('a.txt.gz')
+    assert not is_json_path('a.gz')
+
+
+@pytest.mark.parametrize('block_size', [7, 40, 100, 5000])
+@pytest.mark.parametrize('chunk_size', [1, 50, 200])
+def test_bgzf_frame_ranges(tmp_path, block_size, chunk_size):
+    path = str(tmp_path / 'bgzf_{}_{}.json.gz'.format(block_size, chunk_size))
+    write_bgzf(path, block_size)
+    assert len(frame_index(path, 'gzip')) == -(-len(data) // block_size)
+    assert read_all(path, 'gzip', chunk_size) == lines
+
+
+@pytest.mark.parametrize('block_size', [7, 40, 100])
+@pytest.mark.parametrize('chunk_size', [1, 50])
+def test_seekable_zstd_frame_ranges(tmp_path, block_size, chunk_size):
+    path = str(tmp_path / 'seekable_{}_{}.json.zst'.format(block_size, chunk_size))
+    write_seekable_zstd(path, block_size)
+    assert read_all(path, 'zstd', chunk_size) == lines
+
+
+def test_plain_gzip_has_no_frame_index(tmp_path):
+    path = str(tmp_path / 'plain.json.gz')
+    with gzip.open(path, 'wb') as f:
+        f.write(data)
+    assert frame_index(path, 'gzip') is None
+    assert partition_frames(path, 'gzip') is None
+
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_gather_data_compressed(tmp_path, concurrent):
+    gz_path = str(tmp_path / 'plain.json.gz')
+    with gzip.open(gz_path, 'wb') as f:
+        f.write(data)
+    xz_path = str(tmp_path / 'plain.json.xz')
+    with lzma.open(xz_path, 'wb') as f:
+        f.write(data)
+    bgzf_path = str(tmp_path / 'blocked.json.gz')
+    write_bgzf(bgzf_path, 64)
+
+    for path in [gz_path, xz_path, bgzf_path]:
+        data_collector = DataCollector(path)
+        data_collector.gather_data(concurrent=concurrent, max_workers=2, chunk_size=100)
+        assert data_collector.countries == {'MX': 20, 'GB': 20, 'CA': 20}
@@ -1,5 +1,6 @@
-from DocuTrace.Analysis.ComputeData import ComputeData, sort_dict_by_value, top_n_sorted, country_name, continent_name
-from DocuTrace.Analysis.DataCollector import ReadingData, DataCollector
+import pytest
+from DocuTrace.Analysis.ComputeData import ComputeData, sort_dict_by_value, top_n_sorted, top_n_items, country_name, continent_name
+from DocuTrace.Analysis.DataCollector import ReadingData, DataCollector, BrowserData
 
 dc = DataCollector()
 dc.countries = {
@@ -105,6 +106,19 @@ def test_also_likes_top_10():
     pass
 
 
+def test_also_likes_unknown_document():
+    compute = ComputeData(dc)
+    with pytest.raises(KeyError):
+        compute.also_likes('000')
+
+
+def test_find_relevant_docs():
+    compute = ComputeData(dc)
+    docs, readers = compute.find_relevant_docs('456', 'a')
+    assert docs.tolist() == ['789']
+    assert readers.tolist() == ['b']
+
+
 def test_sort():
     compute = ComputeData(dc)
     compute.countries = countries
@@ -121,3 +135,134 @@ def test_top_reads():
         '745409913574d4c6': ReadingData('745409913574d4c6', 1000),
         '9a83c97f415601a6': ReadingData('9a83c97f415601a6', 750)
     }
+
+
+def test_top_documents():
+    views = DataCollector(count_heavy_hitters=True)
+    views.count_chunk_heavy_hitters([{'subject_doc_id': '123', 'event_type': 'read'}, {'subject_doc_id': '456', 'event_type': 'impression'},
+                                     {'subject_doc_id': '456', 'event_type': 'impression'}])
+    compute = ComputeData(views)
+    assert [(hitter.item, hitter.count) for hitter in compute.top_documents(2, to_print=False)] == [('456', 2), ('123', 1)]
+    assert [hitter.item for hitter in compute.top_documents(2, summary='document_reads', to_print=False)] == ['123']
+    with pytest.raises(KeyError):
+        ComputeData(dc).top_documents(to_print=False)
+
+
+def test_sketch_mode():
+    events = [{'event_type': 'read', 'subject_doc_id': '123', 'visitor_uuid': visitor, 'visitor_country': 'GB'} for visitor in ('a', 'b', 'a')]
+    exact = DataCollector()
+    sketched = DataCollector(sketch=True)
+    for views in (exact, sketched):
+        for fn in views.data_fns:
+            fn(events)
+        views.finalise()
+    assert ComputeData(exact).count_readers('123') == (2, 0)
+    compute = ComputeData(sketched)
+    assert compute.count_readers('123').count == 2
+    data, titles, _, _ = compute.construct_document_counts_figure('123')
+    assert data == [{'Europe': 3}, {'GB': 3}]
+    assert titles[0].startswith('Document views from each continent (estimates, at most 1 over')
+    assert titles[0].endswith(', 2 ± 1 distinct readers)')
+    with pytest.raises(ValueError):
+        compute.also_likes('123')
+    with pytest.raises(ValueError):
+        compute.batch_also_likes()
+
+
+def test_also_likes_repeat_reads():
+    repeats = DataCollector()
+    for document, visitor in [('123', 'a'), ('123', 'a'), ('456', 'a'), ('456', 'a'), ('456', 'a'), ('456', 'b'), ('123', 'b')]:
+        repeats.collect_document_readers({'event_type': 'read', 'subject_doc_id': document, 'visitor_uuid': visitor})
+    repeats.finalise()
+    compute = ComputeData(repeats)
+    assert compute.find_also_likes_counts('123') == {'456': 2}
+    assert compute.find_also_likes_counts('123', count_reads=True) == {'456': 4}
+    docs, readers = compute.find_relevant_docs('123')
+    assert docs.tolist() == ['456', '456']
+    assert readers.tolist() == ['a', 'b']
+
+
+def test_also_likes_cache():
+    collector = DataCollector()
+    for document, visitor in [('123', 'a'), ('456', 'a'), ('456', 'b'), ('789', 'b')]:
+        collector.collect_document_readers({'event_type': 'read', 'subject_doc_id': document, 'visitor_uuid': visitor})
+    collector.finalise()
+    compute = ComputeData(collector, cache_size=8)
+    assert compute.also_likes('456', n=10, sort_fn=top_n_sorted) == ['123', '789']
+    compute.also_likes('456', n=10, sort_fn=top_n_sorted).append('mutated')
+    assert compute.also_likes('456', n=10, sort_fn=top_n_sorted) == ['123', '789']
+    assert compute.also_likes('456', 'a', n=10, sort_fn=top_n_sorted) == ['789']
+    assert compute.cache_info().hits == 2
+    assert compute.cache_info().misses == 2
+
+    other = DataCollector()
+    other.collect_document_readers({'event_type': 'read', 'subject_doc_id': '000', 'visitor_uuid': 'a'})
+    collector.merge(other)
+    collector.finalise()
+    assert compute.also_likes('456', n=10, sort_fn=top_n_sorted) == ['000', '123', '789']
+    assert compute.cache_info().currsize == 1
+    assert compute.cache_info().hits == 2
+    assert compute.cache_info().misses == 3
+
+
+def test_snapshot_swapped_on_refresh():
+    collector = DataCollector()
+    collector.count_countries({'visitor_country': 'MX'})
+    compute = ComputeData(collector)
+    snapshot = DataCollector()
+    snapshot.count_countries({'visitor_country': 'GB'})
+    compute.receive_snapshot(snapshot)
+    assert compute.countries == {'MX': 1}
+    compute.refresh()
+    assert compute.countries == {'GB': 1}
+    assert compute.data_collector is snapshot
+    assert compute.pending_snapshot is None
+
+
+def test_top_n_items():
+    collection = {'a': 2, 'b': 5, 'c': 2, 'd': 1}
+    assert list(top_n_items(collection, 3).items()) == sorted(collection.items(), key=lambda item: item[1], reverse=True)[:3]
+    assert list(top_n_items(collection, 2, reverse=False).items()) == [('d', 1), ('a', 2)]
+    assert top_n_sorted(collection, 2) == ['b', 'a']
+
+
+def test_sort_memoised():
+    compute = ComputeData(dc)
+    compute.countries = dict(countries)
+    compute.sort(reverse=True)
+    sorted_countries = compute.countries
+    compute.sort(reverse=True)
+    assert compute.countries is sorted_countries
+    compute.countries = {'MX': 1, 'GB': 3}
+    compute.sort(reverse=True)
+    assert list(compute.countries) == ['GB', 'MX']
+
+
+def test_top_views_dropped_on_assignment():
+    compute = ComputeData(dc)
+    compute.countries = dict(countries)
+    assert compute.top('countries', 2) == {'CA': 15, 'MX': 10}
+    assert compute.top('countries', 2) is compute.top('countries', 2)
+    compute.countries = {'GB': 1}
+    assert compute.top('countries', 2) == {'GB': 1}
+
+
+def test_construct_counts_figure_top_n():
+    compute = ComputeData(dc)
+    compute.countries = dict(countries)
+    data, _, _, _ = compute.construct_counts_figure(show_continents=False, show_browsers=False, n_countries=2)
+    assert data == [{'CA': 15, 'MX': 10}]
+    # Only the plotted top n is selected, the dict itself is left in its order
+    assert list(compute.countries.values()) == [10, 8, 15]
+    data, _, _, _ = compute.construct_counts_figure(show_continents=False, show_browsers=False, reverse=False)
+    assert list(data[0].values()) == [8, 10, 15]
+
+
+def test_browser_names_memoised():
+    compute = ComputeData(dc)
+    compute.browser_families = {'Firefox': BrowserData('Firefox', 'Mozilla/5.0 Firefox/27.0', 3)}
+    short_browsers = compute.short_browsers()
+    assert short_browsers == {'Firefox': 3}
+    assert compute.short_browsers() is short_browsers
+    compute.browser_families = {'Chrome': BrowserData('Chrome', 'Mozilla/5.0 Chrome/32.0', 2)}
+    assert compute.short_browsers() == {'Chrome': 2}
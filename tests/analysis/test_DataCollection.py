@@ -1,6 +1,10 @@
+import pickle
+import numpy as np
 import pytest
 from unittest.mock import patch, mock_open
-from DocuTrace.Analysis.DataCollector import DataCollector, ReadingData
+from user_agents import parse as ua_parse
+from DocuTrace.Analysis.DataCollector import DataCollector, DocumentLocations, DocumentLocationSketch, ReaderProfiles, ReadingData, resolve_browser_families
+from DocuTrace.Analysis.Interning import Interner
 
 mock_file_content = '{"visitor_uuid": "745409913574d4c6", "env_doc_id": "130705172251-3a2a725b2bbd5aa3f2af810acf0aeabb", "visitor_country": "MX", "event_readtime": 797, "visitor_useragent":"Mozilla/5.0 (iPhone; CPU iPhone OS 5_1 like Mac OS X) AppleWebKit/534.46 (KHTML, like Gecko) Version/5.1 Mobile/9B179 Safari/7534.48.3"}'
 json_dict = {
@@ -68,3 +72,210 @@ def test_collect_document_readers():
     views.collect_document_readers(json_dict)
     assert views.document_readers['130705172251-3a2a725b2bbd5aa3f2af810acf0aeabb'] == ['745409913574d4c6']
     assert views.visitor_documents['745409913574d4c6'] == ['130705172251-3a2a725b2bbd5aa3f2af810acf0aeabb']
+
+
+def test_data_fn_declarations():
+    views = DataCollector()
+    assert views.collect_document_readers.event_types == ('read',)
+    assert views.collect_reading_data.event_types == ('pagereadtime',)
+    assert 'visitor_uuid' in views.collect_reading_data.fields
+    assert views.count_countries.fields == ('visitor_country',)
+    assert not hasattr(views.count_browsers, 'event_types')
+
+
+def test_merge_interned_readers():
+    views = DataCollector()
+    views.collect_document_readers(json_dict)
+    other = DataCollector()
+    other.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'other_doc', 'visitor_uuid': 'other_visitor'})
+    other.collect_document_readers(json_dict)
+    views.merge(other)
+    assert views.document_readers['130705172251-3a2a725b2bbd5aa3f2af810acf0aeabb'] == ['745409913574d4c6', '745409913574d4c6']
+    assert views.document_readers['other_doc'] == ['other_visitor']
+    assert views.visitor_documents['745409913574d4c6'] == ['130705172251-3a2a725b2bbd5aa3f2af810acf0aeabb'] * 2
+    assert len(views.visitors) == 2
+
+
+def test_chunk_fns_match_event_fns():
+    events = [json_dict, dict(json_dict, event_type='pagereadtime'), dict(json_dict, visitor_uuid='other', visitor_country='GB', event_readtime=3),
+              dict(json_dict, event_type='pagereadtime', event_readtime=3), {'event_type': 'read'}, ['not', 'an', 'event']]
+    per_event = DataCollector()
+    for event in events:
+        for fn in [per_event.find_doc_locations, per_event.count_countries, per_event.count_continents, per_event.count_browsers,
+                   per_event.collect_reading_data, per_event.collect_document_readers]:
+            if type(event) is dict:
+                fn(event)
+    chunked = DataCollector()
+    for fn in chunked.data_fns:
+        assert fn.takes_chunk
+        fn(events)
+    chunked.finalise()
+    assert chunked.countries == per_event.countries
+    assert chunked.continents == per_event.continents
+    assert chunked.browser_families['Mobile Safari'].count == per_event.browser_families['Mobile Safari'].count == 4
+    assert [(p.uuid, p.read_time, p.reads) for p in chunked.reader_profiles.values()] == [(p.uuid, p.read_time, p.reads) for p in per_event.reader_profiles.values()]
+    assert dict(chunked.document_readers) == dict(per_event.document_readers)
+    assert dict(chunked.visitor_documents) == dict(per_event.visitor_documents)
+    for doc_uuid, location in per_event.doc_locations.items():
+        assert chunked.doc_locations[doc_uuid].countries == location.countries
+        assert chunked.doc_locations[doc_uuid].continents == location.continents
+
+
+def test_chunk_fn_declarations():
+    views = DataCollector()
+    assert views.collect_chunk_document_readers.event_types == ('read',)
+    assert views.collect_chunk_reading_data.event_types == ('pagereadtime',)
+    assert views.count_chunk_countries.fields == ('visitor_country',)
+    assert not hasattr(views.count_chunk_user_agents, 'event_types')
+
+
+def test_resolve_user_agents_once():
+    views = DataCollector()
+    views.count_chunk_user_agents([json_dict, json_dict])
+    assert views.browser_families == {}
+    other = DataCollector()
+    other.count_chunk_user_agents([json_dict, {'visitor_useragent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:27.0) Gecko/20100101 Firefox/27.0'}])
+    views.merge(other)
+    with patch('DocuTrace.Analysis.DataCollector.ua_parse', wraps=ua_parse) as parse:
+        views.finalise()
+        assert parse.call_count == 2
+        assert views.browser_families['Mobile Safari'].count == 3
+        assert views.browser_families['Firefox'].count == 1
+        views.count_chunk_user_agents([json_dict])
+        views.finalise()
+        assert parse.call_count == 2
+    assert views.browser_families['Mobile Safari'].count == 4
+    assert views.user_agent_counts == {}
+
+
+def test_resolve_browser_families_pool():
+    ua_strings = [json_dict['visitor_useragent'], 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:27.0) Gecko/20100101 Firefox/27.0', 'curl/7.30.0']
+    with patch('DocuTrace.Analysis.DataCollector.PARALLEL_USER_AGENTS', 1):
+        assert resolve_browser_families(ua_strings, max_workers=2) == resolve_browser_families(ua_strings) == ['Mobile Safari', 'Firefox', 'curl']
+
+
+def test_continents_derived_after_merge():
+    views = DataCollector()
+    views.count_chunk_continents([json_dict, json_dict])
+    assert views.continents == {}
+    other = DataCollector()
+    other.count_chunk_continents([dict(json_dict, visitor_country='GB'), json_dict])
+    views.merge(other)
+    views.finalise()
+    assert views.continents == {'North America': 3, 'Europe': 1}
+    assert views.continent_country_counts == {}
+
+
+def test_document_locations():
+    documents, countries = Interner(['doc1', 'doc2']), Interner(['MX', 'GB', 'US'])
+    locations = DocumentLocations(documents, countries)
+    locations.add(0, 0)
+    locations.add_many(np.array([0, 0, 1]), np.array([1, 1, 2]))
+    assert locations['doc1'].countries == {'GB': 2, 'MX': 1}
+    assert list(locations['doc1'].continents.items()) == [('Europe', 2), ('North America', 1)]
+    assert locations.country_counts('doc2') == {'US': 1}
+    assert set(locations) == {'doc1', 'doc2'} and len(locations) == 2
+    assert 'doc3' not in locations
+    assert locations.get('doc3') is None
+
+    locations = pickle.loads(pickle.dumps(locations))
+    assert locations['doc1'].countries == {'GB': 2, 'MX': 1}
+
+
+def test_merge_document_locations():
+    views = DataCollector()
+    views.find_doc_locations(json_dict)
+    other = DataCollector()
+    other.find_doc_locations(dict(json_dict, subject_doc_id='other_doc', visitor_country='GB'))
+    other.find_doc_locations(json_dict)
+    views.merge(other)
+    assert views.doc_locations['130705172251-3a2a725b2bbd5aa3f2af810acf0aeabb'].countries == {'MX': 2}
+    assert views.doc_locations['other_doc'].continents == {'Europe': 1}
+
+
+def test_read_graph_after_merge():
+    views = DataCollector()
+    other = DataCollector()
+    views.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'doc', 'visitor_uuid': 'a'})
+    other.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'doc', 'visitor_uuid': 'a'})
+    other.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'other_doc', 'visitor_uuid': 'b'})
+    views.finalise()
+    other.finalise()
+    views.merge(other)
+    assert views.read_graph.readers.row(0).tolist() == [0]
+    assert views.read_graph.readers.row_counts(0).tolist() == [2]
+    views.collect_document_readers({'event_type': 'read', 'subject_doc_id': 'doc', 'visitor_uuid': 'b'})
+    assert views.read_graph is None
+    views.finalise()
+    assert views.read_graph.readers.row(0).tolist() == [0, 1]
+
+
+def test_reader_profiles():
+    visitors = Interner()
+    profiles = ReaderProfiles(visitors)
+    profiles.add(visitors.intern('b'), 10)
+    profiles.add_many(visitors.intern_many(['a', 'b', 'c', 'd']), [30, 5, 15, 30])
+    assert list(profiles) == ['b', 'a', 'c', 'd']
+    assert profiles['b'] == ReadingData('b', 15, 2)
+    assert profiles['b'].reads == 2
+    assert 'e' not in profiles
+    with pytest.raises(KeyError):
+        profiles['e']
+    assert list(profiles.top(3)) == ['a', 'd', 'b']
+    assert list(profiles.top(2, reverse=False)) == ['b', 'c']
+    assert profiles.top(0) == {}
+    assert list(profiles.top(10)) == [uuid for uuid, _ in sorted(profiles.items(), key=lambda item: item[1], reverse=True)]
+    assert list(profiles.sorted()) == ['a', 'd', 'b', 'c']
+    profiles = pickle.loads(pickle.dumps(profiles))
+    assert profiles['d'].read_time == 30
+
+
+def test_merge_reader_profiles():
+    views = DataCollector()
+    other = DataCollector()
+    views.collect_reading_data({'event_type': 'pagereadtime', 'event_readtime': 100, 'visitor_uuid': 'a'})
+    other.collect_reading_data({'event_type': 'pagereadtime', 'event_readtime': 50, 'visitor_uuid': 'b'})
+    other.collect_reading_data({'event_type': 'pagereadtime', 'event_readtime': 20, 'visitor_uuid': 'a'})
+    views.merge(other)
+    assert [(p.uuid, p.read_time, p.reads) for p in views.reader_profiles.values()] == [('a', 120, 2), ('b', 50, 1)]
+
+
+def test_heavy_hitters():
+    events = [json_dict, dict(json_dict, event_type='pagereadtime'), dict(json_dict, subject_doc_id='other_doc'), {'event_type': 'read'}]
+    per_event = DataCollector(count_heavy_hitters=True)
+    for event in events:
+        per_event.count_heavy_hitters(event)
+    chunked = DataCollector(count_heavy_hitters=True)
+    chunked.count_chunk_heavy_hitters(events)
+    other = DataCollector(count_heavy_hitters=True)
+    other.count_chunk_heavy_hitters(events)
+    chunked.merge(other)
+    for name in ('document_views', 'document_reads', 'user_agents'):
+        assert [(hitter.item, hitter.count * 2) for hitter in per_event.heavy_hitters[name].top()] == [(hitter.item, hitter.count) for hitter in chunked.heavy_hitters[name].top()]
+    assert chunked.heavy_hitters['document_views'].top(1)[0].count == 4
+    assert chunked.heavy_hitters['document_reads'].estimate('other_doc').count == 2
+    assert DataCollector().heavy_hitters == {}
+
+
+def test_sketch_mode():
+    events = [json_dict, dict(json_dict, visitor_uuid='other', visitor_country='GB'), dict(json_dict, subject_doc_id='other_doc'), json_dict]
+    per_event = DataCollector(sketch=True)
+    for event in events:
+        per_event.find_doc_locations(event)
+        per_event.sketch_document_readers(event)
+    chunked = DataCollector(sketch=True)
+    for fn in chunked.data_fns:
+        fn(events)
+    other = pickle.loads(pickle.dumps(chunked))
+    chunked.merge(other)
+    doc_uuid = json_dict['subject_doc_id']
+    assert isinstance(chunked.doc_locations, DocumentLocationSketch)
+    assert per_event.doc_locations[doc_uuid].countries == {'MX': 2, 'GB': 1}
+    assert chunked.doc_locations[doc_uuid].countries == {'MX': 4, 'GB': 2}
+    assert chunked.doc_locations[doc_uuid].continents == {'North America': 4, 'Europe': 2}
+    assert sorted(chunked.doc_locations) == sorted([doc_uuid, 'other_doc'])
+    assert chunked.doc_locations.error_bound == 1
+    assert per_event.distinct_readers.estimate(doc_uuid).count == chunked.distinct_readers.estimate(doc_uuid).count == 2
+    assert len(chunked.document_readers) == 0
+    chunked.clear()
+    assert isinstance(chunked.doc_locations, DocumentLocationSketch) and chunked.distinct_readers.estimate(doc_uuid).count == 0
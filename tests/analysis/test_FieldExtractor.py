@@ -0,0 +1,40 @@
+import json
+from DocuTrace.Analysis.FieldExtractor import FieldExtractor, build_extractor
+from DocuTrace.Analysis.DataCollector import DataCollector
+
+line = b'{ "ts": 1393631989, "visitor_uuid": "745409913574d4c6", "visitor_username": null, "visitor_country": "MX", "event_type": "read", "subject_page": 23, "event_readtime": 797 }'
+
+
+def test_extract_fields():
+    extractor = FieldExtractor(['visitor_uuid', 'visitor_country', 'event_readtime', 'visitor_username'])
+    assert extractor.extract(line) == {
+        'visitor_uuid': '745409913574d4c6',
+        'visitor_country': 'MX',
+        'event_readtime': 797,
+        'visitor_username': None
+    }
+
+
+def test_extract_matches_json():
+    fields = ['ts', 'visitor_uuid', 'visitor_username', 'visitor_country', 'event_type', 'subject_page', 'event_readtime']
+    assert FieldExtractor(fields).extract(line) == json.loads(line)
+    assert FieldExtractor(fields).extract(line.decode()) == json.loads(line)
+
+
+def test_extract_missing_field():
+    extractor = FieldExtractor(['visitor_country', 'subject_doc_id'])
+    assert extractor.extract(line) == {'visitor_country': 'MX'}
+
+
+def test_extract_fallback():
+    extractor = FieldExtractor(['visitor_country'])
+    assert extractor.extract(b'{"visitor_country": "M\\u0058"}') is None
+    assert extractor.extract(b'{"visitor_country": {"code": "MX"}}') is None
+    assert extractor.extract(b'{"visitor_country": ["MX"]}') is None
+
+
+def test_build_extractor():
+    extractor = build_extractor(DataCollector().data_fns)
+    assert 'visitor_useragent' in extractor.fields
+    assert 'event_readtime' in extractor.fields
+    assert build_extractor([lambda json: None]) is None
@@ -1,5 +1,13 @@
-from DocuTrace.Analysis.FileRead import stream_read_json, ParseFile
+import os
+import threading
+import time
+from DocuTrace.Analysis.FileRead import stream_read_json, ParseFile, partition_file, MappedFiles, tree_merge, build_prefilter, EventPrefilter, parse_lines, resolve_paths, \
+    complete_lines_end, FileFollower, SnapshotPublisher, stream_file_chunks, JsonProcessContextManager
+from DocuTrace.Analysis.ChunkSize import ChunkSizeTuner
+from DocuTrace.Analysis.ComputeData import ComputeData
 from DocuTrace.Analysis.DataCollector import DataCollector
+from DocuTrace.Analysis.FieldExtractor import FieldExtractor
+from DocuTrace.Utils.Exceptions import InvalidPathError
 import pytest
 from unittest.mock import patch, mock_open
 
@@ -96,3 +104,285 @@ def test_raise_attributeerr_ParseFile():
             assert json.get(key_list[0]) == 'MX'
         with pytest.raises(AttributeError):
             parser.parse_file(DataCollector(), [test_fn])
+
+
+def test_partition_file_newline_aligned(mock_file, mock_lines):
+    path = mock_file
+    ranges = partition_file(path, chunk_size=100)
+    assert len(ranges) > 1
+    assert ranges[0].offset == 0
+    assert sum(r.length for r in ranges) == len(''.join(mock_lines))
+    with open(path, 'rb') as f:
+        data = f.read()
+    for r in ranges:
+        assert data[r.offset + r.length - 1:r.offset + r.length] == b'\n'
+
+
+def test_partition_file_empty(tmp_path):
+    path = tmp_path / 'empty.json'
+    path.write_text('')
+    assert partition_file(str(path)) == []
+
+
+def test_mapped_files_read(mock_file, mock_lines):
+    path = mock_file
+    mapped_files = MappedFiles()
+    lines = []
+    for r in partition_file(path, chunk_size=100):
+        lines += mapped_files.read(r)
+    mapped_files.close()
+    assert lines == [line.rstrip().encode() for line in mock_lines]
+
+
+def test_mmap_parse_file(mock_file, mock_lines):
+    path = mock_file
+    data_collector = DataCollector(path)
+    ParseFile(path, chunk_size=100, use_mmap=True).parse_file(data_collector, concurrent=False)
+    assert data_collector.countries['MX'] == len(mock_lines)
+
+
+def test_mmap_parse_file_concurrent(mock_file, mock_lines):
+    path = mock_file
+    data_collector = DataCollector(path)
+    ParseFile(path, chunk_size=100, use_mmap=True).parse_file(data_collector, concurrent=True, max_workers=2)
+    assert data_collector.countries['MX'] == len(mock_lines)
+
+
+def test_mmap_parse_file_merge_every(mock_file, mock_lines):
+    path = mock_file
+    data_collector = DataCollector(path)
+    ParseFile(path, chunk_size=100, use_mmap=True).parse_file(data_collector, concurrent=True, max_workers=2, merge_every=2)
+    assert data_collector.countries['MX'] == len(mock_lines)
+
+
+def test_tree_merge():
+    partials = []
+    for country in ['MX', 'GB', 'MX', 'CA', 'MX']:
+        data_collector = DataCollector()
+        data_collector.count_countries({'visitor_country': country})
+        partials.append(data_collector)
+    merged = tree_merge(partials)
+    assert merged.countries == {'MX': 3, 'GB': 1, 'CA': 1}
+    assert tree_merge([]) is None
+
+
+def test_build_prefilter_event_types():
+    data_collector = DataCollector(count_doc_locations=False, count_browser=False, count_country=False, count_continent=False)
+    prefilter = build_prefilter(data_collector.data_fns)
+    assert prefilter.event_types == ['pagereadtime', 'read']
+
+
+def test_build_prefilter_all_events():
+    assert build_prefilter(DataCollector().data_fns) is None
+
+
+def test_prefilter_search():
+    prefilter = EventPrefilter(['read'])
+    search = prefilter.search_fn(bytes)
+    assert search(b'{"event_type": "read", "visitor_uuid": "a"}')
+    assert search(b'{"event_type":"read"}')
+    assert not search(b'{"event_type": "impression", "env_type": "reader"}')
+    assert prefilter.search_fn(str)('{"event_type": "read"}')
+
+
+def test_parse_lines_prefilter():
+    seen = []
+    lines = [b'{"event_type": "read"}', b'{"event_type": "impression"}', b'{"event_type": "pagereadtime"}']
+    parse_lines(lines, [seen.append], prefilter=EventPrefilter(['read', 'pagereadtime']))
+    assert seen == [{'event_type': 'read'}, {'event_type': 'pagereadtime'}]
+
+
+def test_parse_lines_extractor_stats():
+    seen = []
+    stats = {}
+    lines = [b'{"visitor_country": "MX"}', b'{"visitor_country": "M\\u0058"}']
+    parse_lines(lines, [seen.append], extractor=FieldExtractor(['visitor_country']), stats=stats)
+    assert seen == [{'visitor_country': 'MX'}, {'visitor_country': 'MX'}]
+    assert stats == {'fast_path': 1, 'fallback': 1}
+
+
+def test_parse_lines_chunk_fn():
+    seen = []
+    def chunk_fn(events):
+        seen.append(events)
+    chunk_fn.takes_chunk = True
+    per_event = []
+    parse_lines([b'{"n": 1}', b'not json', b'{"n": 2}'], [chunk_fn, per_event.append])
+    assert seen == [[{'n': 1}, {'n': 2}]]
+    assert per_event == [{'n': 1}, {'n': 2}]
+
+
+def test_parse_lines_data_function_error():
+    data_collector = DataCollector()
+    lines = [b'{"event_type": "pagereadtime", "visitor_uuid": "a", "event_readtime": "abc", "visitor_country": "MX"}']
+    parse_lines(lines, data_collector.data_fns)
+    assert data_collector.countries == {'MX': 1}
+    assert len(data_collector.reader_profiles) == 0
+
+
+@pytest.fixture
+def rotated_files(tmp_path, mock_lines):
+    directory = tmp_path / 'logs'
+    directory.mkdir()
+    for i in range(4):
+        (directory / 'issuu_{}.json'.format(i)).write_text(''.join(mock_lines[:10 * (i + 1)]))
+    (directory / 'notes.txt').write_text('not json')
+    return directory
+
+
+def test_resolve_paths_directory_largest_first(rotated_files):
+    directory = rotated_files
+    paths = resolve_paths(str(directory))
+    assert [os.path.basename(p) for p in paths] == ['issuu_3.json', 'issuu_2.json', 'issuu_1.json', 'issuu_0.json']
+
+
+def test_resolve_paths_glob_and_list(rotated_files):
+    directory = rotated_files
+    assert len(resolve_paths(str(directory / 'issuu_[01].json'))) == 2
+    paths = resolve_paths([str(directory / 'issuu_0.json'), str(directory / 'issuu_2.json'), str(directory / 'issuu_0.json')])
+    assert [os.path.basename(p) for p in paths] == ['issuu_2.json', 'issuu_0.json']
+
+
+def test_resolve_paths_missing_file(rotated_files):
+    directory = rotated_files
+    with pytest.raises(InvalidPathError):
+        resolve_paths([str(directory / 'issuu_0.json'), str(directory / 'missing.json')])
+
+
+@pytest.mark.parametrize('concurrent', [False, True])
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_parse_multiple_files(concurrent, use_mmap, rotated_files):
+    directory = rotated_files
+    data_collector = DataCollector(str(directory))
+    data_collector.gather_data(concurrent=concurrent, max_workers=2, chunk_size=100, use_mmap=use_mmap)
+    assert data_collector.countries['MX'] == 100
+
+
+def test_partition_file_limit(mock_file, mock_lines):
+    path = mock_file
+    with open(path, 'a') as f:
+        f.write('{"visitor_country": ')
+    limit = complete_lines_end(path)
+    assert limit == len(''.join(mock_lines))
+    ranges = partition_file(path, chunk_size=100, limit=limit)
+    assert sum(r.length for r in ranges) == limit
+
+
+def test_file_follower_appended_lines(mock_file):
+    path = mock_file
+    follower = FileFollower(path, offset=complete_lines_end(path))
+    assert follower.read_lines() == []
+    with open(path, 'a') as f:
+        f.write('{"visitor_country": "GB"}\n{"visitor_')
+    assert follower.read_lines() == [b'{"visitor_country": "GB"}']
+    with open(path, 'a') as f:
+        f.write('country": "FR"}\n')
+    assert follower.read_lines() == [b'{"visitor_country": "FR"}']
+    follower.close()
+
+
+def test_file_follower_truncated(mock_file):
+    path = mock_file
+    follower = FileFollower(path, offset=complete_lines_end(path))
+    with open(path, 'w') as f:
+        f.write('{"visitor_country": "GB"}\n')
+    assert follower.read_lines() == [b'{"visitor_country": "GB"}']
+    follower.close()
+
+
+def test_file_follower_rotated(mock_file):
+    path = mock_file
+    follower = FileFollower(path, offset=complete_lines_end(path))
+    with open(path, 'a') as f:
+        f.write('{"visitor_country": "GB"}\n')
+    os.rename(path, path + '.1')
+    with open(path, 'w') as f:
+        f.write('{"visitor_country": "FR"}\n')
+    assert follower.read_lines() == [b'{"visitor_country": "GB"}']
+    assert follower.read_lines() == [b'{"visitor_country": "FR"}']
+    assert follower.read_lines() == []
+    follower.close()
+
+
+def _wait_for(condition, timeout=10):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_follow_publishes_snapshots(concurrent, mock_file, mock_lines):
+    path = mock_file
+    data_collector = DataCollector(path)
+    publisher = SnapshotPublisher()
+    stop_event = threading.Event()
+    follow = threading.Thread(target=data_collector.follow_data, daemon=True, kwargs=dict(
+        publisher=publisher, concurrent=concurrent, max_workers=2, chunk_size=100, poll_interval=0.01, publish_interval=0, stop_event=stop_event))
+    follow.start()
+    assert publisher.ready.wait(10)
+
+    compute = ComputeData(publisher.latest())
+    assert compute.countries['MX'] == len(mock_lines)
+
+    with open(path, 'a') as f:
+        f.write('{"visitor_country": "MX"}\n{"visitor_country": "GB"}\n')
+    assert _wait_for(lambda: compute.pending_snapshot is not None and compute.pending_snapshot.countries.get('GB') == 1)
+    assert compute.countries.get('GB') is None
+    compute.refresh()
+    assert compute.countries['GB'] == 1
+    assert compute.countries['MX'] == len(mock_lines) + 1
+
+    stop_event.set()
+    follow.join(10)
+    assert not follow.is_alive()
+    assert data_collector.countries == compute.countries
+    assert compute.countries is not data_collector.countries
+
+
+def test_follow_rejects_multiple_files(rotated_files):
+    directory = rotated_files
+    with pytest.raises(ValueError):
+        ParseFile(str(directory)).follow(DataCollector())
+
+
+def test_stream_file_chunks_callable_size(mock_file):
+    path = mock_file
+    sizes = iter([1, 100])
+    chunks = list(stream_file_chunks(path, chunk_size=lambda: next(sizes, 10000)))
+    assert [len(chunk) for chunk in chunks] == [1, 3, 46]
+
+
+def test_bounded_queue_tuned_chunks(mock_file, mock_lines):
+    path = mock_file
+    data_collector = DataCollector(path)
+    tuner = ChunkSizeTuner(100, min_size=100)
+    with JsonProcessContextManager(data_collector, max_workers=2, queue_size=1, tuner=tuner) as jtcm:
+        for chunk in stream_file_chunks(path, chunk_size=tuner):
+            jtcm.enqueue(chunk)
+    assert data_collector.countries['MX'] == len(mock_lines)
+    assert tuner.throughput is not None
+
+
+def _failing_chunk_fn(events):
+    if any(event.get('visitor_country') == 'GB' for event in events):
+        raise KeyError('missing')
+_failing_chunk_fn.takes_chunk = True
+
+
+def test_worker_error_raised(write_lines):
+    path = write_lines(['{"visitor_country": "MX"}\n'] * 200 + ['{"visitor_country": "GB"}\n'])
+    data_collector = DataCollector(path)
+    data_collector.data_fns = [_failing_chunk_fn]
+    # Only the process given the last chunk fails, the rest finish their chunks
+    with pytest.raises(RuntimeError, match='KeyError'):
+        ParseFile(path, chunk_size=100).parse_file(data_collector, concurrent=True, max_workers=3)
+
+
+def test_parse_file_streamed_concurrent(mock_file, mock_lines):
+    path = mock_file
+    data_collector = DataCollector(path)
+    parser = ParseFile(path, chunk_size=100)
+    parser.parse_file(data_collector, concurrent=True, max_workers=2)
+    assert data_collector.countries['MX'] == len(mock_lines)
+    assert parser.tuner.throughput is not None
@@ -0,0 +1,36 @@
+import numpy as np
+from DocuTrace.Analysis.Geography import pack_code, pack_codes, continent_name, country_name, continent_names, continent_counts, \
+    lookup_continent_name, lookup_country_name, NOT_PACKED
+
+
+def test_pack_code():
+    assert pack_code('AA') == 0
+    assert pack_code('MX') == 12 * 26 + 23
+    for code in ['mx', 'M', 'MEX', 'A1', '', None, 12]:
+        assert pack_code(code) == NOT_PACKED
+
+
+def test_pack_codes_matches_pack_code():
+    codes = ['MX', 'mx', 'GB', 'A1', 'ZZ', 'MEX', None, 'É1']
+    assert pack_codes(codes).tolist() == [pack_code(code) for code in codes]
+    assert pack_codes([]).tolist() == []
+
+
+def test_table_matches_lookups():
+    for first in range(26):
+        for second in range(26):
+            code = chr(65 + first) + chr(65 + second)
+            assert continent_name(code) == lookup_continent_name(code)
+            assert country_name(code) == lookup_country_name(code)
+
+
+def test_codes_outside_table():
+    assert continent_name('mx') == lookup_continent_name('mx') == 'Unknown'
+    assert country_name('mx') == 'Mexico'
+    assert continent_names(['MX', 'mx', 'GB']) == ['North America', 'Unknown', 'Europe']
+
+
+def test_continent_counts():
+    counts = continent_counts({'GB': 2, 'MX': 3, 'FR': 1, 'US': 4, 'nope': 1})
+    assert list(counts.items()) == [('Europe', 3), ('North America', 7), ('Unknown', 1)]
+    assert continent_counts({}) == {}
@@ -0,0 +1,74 @@
+import pickle
+import numpy as np
+from DocuTrace.Analysis.Interning import Interner, IdRelation, id_relations
+
+
+def test_interner_ids():
+    interner = Interner(['a', 'b'])
+    assert interner.intern('a') == 0
+    assert interner.intern('c') == 2
+    assert interner.get_id('d') is None
+    assert interner.lookup(1) == 'b'
+    assert interner.lookup_many([2, 0]) == ['c', 'a']
+    assert 'c' in interner and 'd' not in interner
+    assert len(interner) == 3
+
+
+def test_interner_merge():
+    own = Interner(['a', 'b'])
+    other = Interner(['c', 'a'])
+    assert own.merge(other).tolist() == [2, 0]
+    assert own.values == ['a', 'b', 'c']
+
+
+def test_id_relation_mapping():
+    relation = IdRelation.from_dict({'123': ['a', 'b', 'a'], '456': 'c'}, Interner(), Interner())
+    assert relation['123'] == ['a', 'b', 'a']
+    assert relation['456'] == ['c']
+    assert '123' in relation and '789' not in relation
+    assert relation.get('789', []) == []
+    assert relation == {'123': ['a', 'b', 'a'], '456': ['c']}
+    assert relation.ids(relation.key_interner.get_id('123')).tolist() == [0, 1, 0]
+    assert relation.ids(99).tolist() == []
+
+
+def test_id_relation_merge():
+    documents, visitors = Interner(), Interner()
+    own = IdRelation.from_dict({'123': ['a']}, documents, visitors)
+    other_documents, other_visitors = Interner(), Interner()
+    other = IdRelation.from_dict({'456': ['b'], '123': ['b', 'c']}, other_documents, other_visitors)
+    own.merge(other, documents.merge(other_documents), visitors.merge(other_visitors))
+    assert own == {'123': ['a', 'b', 'c'], '456': ['b']}
+
+
+def test_intern_many():
+    interner = Interner(['b'])
+    assert interner.intern_many(['a', 'b', 'a', 'c']).tolist() == [1, 0, 1, 2]
+    assert interner.values == ['b', 'a', 'c']
+
+
+def test_id_relation_add_many():
+    relation = IdRelation.from_dict({'123': ['a']}, Interner(), Interner(['a', 'b', 'c']))
+    relation.add_many(np.array([1, 0, 1]), np.array([2, 1, 0]))
+    relation.add_many(np.array([0]), np.array([2]))
+    assert relation.pending_keys
+    relation.key_interner.intern('456')
+    assert relation == {'123': ['a', 'b', 'c'], '456': ['c', 'a']}
+    assert not relation.pending_keys
+
+
+def test_id_relation_pickle():
+    document_readers, visitor_documents = id_relations({'123': ['a', 'b'], '456': ['b']}, {'a': ['123'], 'b': ['123', '456']})
+    document_readers, visitor_documents = pickle.loads(pickle.dumps((document_readers, visitor_documents)))
+    assert document_readers == {'123': ['a', 'b'], '456': ['b']}
+    assert visitor_documents == {'a': ['123'], 'b': ['123', '456']}
+    assert document_readers.key_interner is visitor_documents.value_interner
+    document_readers.add(0, 0)
+    assert document_readers['123'] == ['a', 'b', 'a']
+
+
+def test_id_relations_shared_interners():
+    document_readers, visitor_documents = id_relations({'123': ['a']}, {'a': ['123']})
+    assert document_readers.key_interner is visitor_documents.value_interner
+    assert document_readers.value_interner is visitor_documents.key_interner
+    assert id_relations(document_readers, visitor_documents) == (document_readers, visitor_documents)
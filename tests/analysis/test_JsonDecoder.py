@@ -0,0 +1,38 @@
+import json
+import pytest
+from DocuTrace.Analysis.JsonDecoder import get_decoder, available_decoders, decoder_loaders
+
+line = b'{"visitor_country": "MX", "event_readtime": 797}\n'
+
+
+def test_available_decoders_includes_json():
+    assert 'json' in available_decoders()
+
+
+def test_get_decoder_default():
+    decoder = get_decoder()
+    assert decoder.name == available_decoders()[0]
+
+
+@pytest.mark.parametrize('name', available_decoders())
+def test_decode_bytes(name):
+    decoder = get_decoder(name)
+    assert decoder.name == name
+    assert decoder.loads(line) == {'visitor_country': 'MX', 'event_readtime': 797}
+
+
+@pytest.mark.parametrize('name', available_decoders())
+def test_decode_error_is_value_error(name):
+    with pytest.raises(ValueError):
+        get_decoder(name).loads(b'{"visitor_country": ')
+
+
+def test_get_decoder_unknown_falls_back():
+    assert get_decoder('not a decoder').name == available_decoders()[0]
+
+
+def test_get_decoder_not_installed_falls_back():
+    missing = [name for name in decoder_loaders if name not in available_decoders()]
+    if not missing:
+        pytest.skip('Every decoder is installed')
+    assert get_decoder(missing[0]).name == available_decoders()[0]
@@ -0,0 +1,54 @@
+import pickle
+import numpy as np
+from DocuTrace.Analysis.Interning import Interner, IdRelation
+from DocuTrace.Analysis.ReadGraph import CompressedRows, ReadGraph
+
+
+def test_compressed_rows_deduplicate():
+    rows = CompressedRows.from_pairs(np.array([1, 0, 1, 1]), np.array([2, 0, 2, 0]), n_rows=3)
+    assert rows.indptr.tolist() == [0, 1, 3, 3]
+    assert rows.row(1).tolist() == [0, 2]
+    assert rows.row_counts(1).tolist() == [1, 2]
+    assert rows.row(2).tolist() == []
+    assert rows.row(5).tolist() == []
+    assert rows.degrees().tolist() == [1, 2, 0]
+    assert len(rows) == 3 and rows.n_entries == 3
+
+
+def test_compressed_rows_gather():
+    rows = CompressedRows.from_pairs(np.array([0, 0, 1, 2]), np.array([3, 4, 5, 6]))
+    indices, counts = rows.gather(np.array([2, 0]))
+    assert indices.tolist() == [6, 3, 4]
+    assert counts.tolist() == [1, 1, 1]
+    indices, _ = rows.gather(np.array([], dtype=np.int64))
+    assert indices.tolist() == []
+
+
+def test_compressed_rows_transpose():
+    rows = CompressedRows.from_pairs(np.array([0, 0, 1, 1]), np.array([1, 1, 0, 1]), keep_counts=True)
+    columns = rows.transpose()
+    assert columns.row(1).tolist() == [0, 1]
+    assert columns.row_counts(1).tolist() == [2, 1]
+    assert CompressedRows.from_pairs(np.array([0]), np.array([0]), keep_counts=False).counts is None
+
+
+def test_read_graph_from_relation():
+    relation = IdRelation.from_dict({'123': ['a', 'b', 'a'], '456': ['b']}, Interner(), Interner())
+    graph = ReadGraph.from_relation(relation)
+    assert graph.readers.row(0).tolist() == [0, 1]
+    assert graph.readers.row_counts(0).tolist() == [2, 1]
+    assert graph.documents_read.row(1).tolist() == [0, 1]
+    visitors, documents = graph.edges(np.array([0, 1]), np.array([1]))
+    assert visitors.tolist() == [1] and documents.tolist() == [1]
+    copy = pickle.loads(pickle.dumps(graph))
+    assert copy.readers.indices.tolist() == graph.readers.indices.tolist()
+
+
+def test_read_graph_merge():
+    own = ReadGraph.from_relation(IdRelation.from_dict({'123': ['a']}, Interner(), Interner()))
+    other_documents, other_visitors = Interner(), Interner()
+    other = ReadGraph.from_relation(IdRelation.from_dict({'456': ['b'], '123': ['a', 'a']}, other_documents, other_visitors))
+    merged = own.merge(other, own.documents.merge(other_documents), own.visitors.merge(other_visitors))
+    assert merged.readers.row(0).tolist() == [0]
+    assert merged.readers.row_counts(0).tolist() == [3]
+    assert merged.documents_read.row(1).tolist() == [1]
@@ -0,0 +1,107 @@
+import pickle
+import random
+from collections import Counter
+import numpy as np
+import pytest
+from DocuTrace.Analysis.Interning import Interner
+from DocuTrace.Analysis.Sketches import HeavyHitters, HeavyHitter, CountMinSketch, HyperLogLogs, DistinctReaders, Estimate, hash_strings, bit_lengths
+
+
+def stream(seed, n=5000, n_items=300):
+    rng = random.Random(seed)
+    return ['doc{}'.format(int(rng.paretovariate(1.2)) % n_items) for _ in range(n)]
+
+
+def check_bounds(summary, items):
+    exact = Counter(items)
+    assert summary.total == len(items)
+    assert summary.error_bound <= len(items) / (summary.capacity + 1)
+    for item, count in exact.items():
+        estimate = summary.estimate(item)
+        assert estimate.count <= count <= estimate.count + estimate.error
+
+
+def test_heavy_hitters_exact_below_capacity():
+    summary = HeavyHitters(capacity=10)
+    summary.add('a')
+    summary.add_many(['b', 'a', 'c'])
+    summary.add_many(['c'], [5])
+    assert summary.top(2) == [HeavyHitter('c', 6, 0), HeavyHitter('a', 2, 0)]
+    assert summary.error_bound == 0
+    assert summary.estimate('d') == HeavyHitter('d', 0, 0)
+
+
+def test_heavy_hitters_bounds():
+    items = stream(0)
+    summary = HeavyHitters(capacity=20)
+    for item in items:
+        summary.add(item)
+    assert len(summary) <= 20
+    check_bounds(summary, items)
+    assert [hitter.item for hitter in summary.top(3)] == [item for item, _ in Counter(items).most_common(3)]
+
+
+def test_heavy_hitters_merge():
+    parts = [stream(seed) for seed in range(4)]
+    summaries = []
+    for part in parts:
+        summary = HeavyHitters(capacity=20)
+        summary.add_many(part)
+        summaries.append(pickle.loads(pickle.dumps(summary)))
+    merged = summaries[0]
+    for summary in summaries[1:]:
+        merged.merge(summary)
+    assert len(merged) <= 20
+    check_bounds(merged, sum(parts, []))
+
+
+def test_hash_strings():
+    hashes = hash_strings(['a', 'b', 'a'])
+    assert hashes.dtype == np.uint64
+    assert hashes[0] == hashes[2] != hashes[1]
+
+
+def test_bit_lengths():
+    values = np.array([0, 1, 2, 3, (1 << 32) - 1, 1 << 32, (1 << 64) - 1], dtype=np.uint64)
+    assert bit_lengths(values).tolist() == [0, 1, 2, 2, 32, 33, 64]
+
+
+def test_count_min_sketch():
+    keys = hash_strings(['key{}'.format(i) for i in range(500)])
+    counts = np.arange(500)
+    sketch = CountMinSketch(width=200, depth=4)
+    sketch.add_many(keys[:250], counts[:250])
+    other = CountMinSketch(width=200, depth=4)
+    other.add_many(keys[250:], counts[250:])
+    sketch.merge(other)
+    assert sketch.total == counts.sum()
+    estimates = sketch.estimate(keys)
+    assert (estimates >= counts).all()
+    assert np.mean(estimates - counts <= sketch.error_bound) >= sketch.confidence
+    with pytest.raises(ValueError):
+        sketch.merge(CountMinSketch(width=100, depth=4))
+
+
+def test_hyperloglogs():
+    sketches = HyperLogLogs(precision=10)
+    sketches.add_many(np.zeros(20000, dtype=np.int64), hash_strings(['reader{}'.format(i % 10000) for i in range(20000)]))
+    sketches.add_many(np.ones(3, dtype=np.int64), hash_strings(['a', 'b', 'a']))
+    assert abs(sketches.count(0) - 10000) <= 3 * sketches.relative_error * 10000
+    assert round(sketches.count(1)) == 2
+    assert sketches.count(5) == 0
+    assert abs(sketches.union([0, 1]) - 10002) <= 3 * sketches.relative_error * 10002
+
+
+def test_distinct_readers_merge():
+    documents = Interner()
+    readers = DistinctReaders(documents, precision=10)
+    readers.add_many(documents.intern_many(['doc'] * 3000), ['a{}'.format(i) for i in range(3000)])
+    other_documents = Interner()
+    other = DistinctReaders(other_documents, precision=10)
+    other.add_many(other_documents.intern_many(['other_doc'] * 2000 + ['doc'] * 2000), ['b{}'.format(i) for i in range(2000)] * 2)
+    readers.merge(other, documents.merge(other_documents))
+    count, error = readers.estimate('doc')
+    assert abs(count - 5000) <= 3 * error
+    count, error = readers.shared('doc', 'other_doc')
+    assert abs(count - 2000) <= 3 * error
+    assert readers.estimate('missing') == Estimate(0, 0)
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import pytest
+from DocuTrace.Utils import Cache
+from DocuTrace.Utils.Cache import LookupCache, set_lookup_cache, cached, cached_many, ResultCache, CacheInfo
+from DocuTrace.Analysis.Geography import continent_name
+
+
+def _resolver(calls):
+    def resolve_many(keys):
+        calls.extend(keys)
+        return [key.upper() for key in keys]
+    return resolve_many
+
+
+def test_lookup_resolves_missing_once(tmp_path):
+    calls = []
+    cache = LookupCache(str(tmp_path / 'cache' / 'lookups.sqlite3'))
+    assert cache.lookup('test', ['a', 'b', 'a'], _resolver(calls)) == ['A', 'B', 'A']
+    assert cache.lookup('test', ['b', 'c'], _resolver(calls)) == ['B', 'C']
+    assert calls == ['a', 'b', 'c']
+    assert cache.get('test', 'a', lambda key: 'unused') == 'A'
+
+
+def test_lookup_persists_between_runs(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite3')
+    LookupCache(path).lookup('test', ['a'], _resolver([]))
+    calls = []
+    assert LookupCache(path).lookup('test', ['a'], _resolver(calls)) == ['A']
+    assert calls == []
+    assert LookupCache(path).lookup('other', ['a'], lambda keys: ['x' for _ in keys]) == ['x']
+
+
+def test_lookup_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / 'lookups.sqlite3')
+    cache = LookupCache(path, max_entries=2)
+    cache.lookup('test', ['a'], _resolver([]))
+    cache.lookup('test', ['b'], _resolver([]))
+    LookupCache(path, max_entries=2).lookup('test', ['a'], _resolver([]))
+    cache.lookup('test', ['c'], _resolver([]))
+    with sqlite3.connect(path) as connection:
+        assert sorted(key for key, in connection.execute('SELECT key FROM lookups')) == ['a', 'c']
+
+
+def test_set_lookup_cache(tmp_path):
+    try:
+        cache = set_lookup_cache(str(tmp_path))
+        assert cached('test', 'a', str.upper) == 'A'
+        assert cached_many('test', ['a', 'b'], lambda keys: [key.upper() for key in keys]) == ['A', 'B']
+        assert continent_name('MX') == 'North America'
+        assert continent_name('mx') == 'Unknown'
+        assert cache.namespaces['continent_name'] == {'mx': 'Unknown'}
+        assert os.path.exists(str(tmp_path / Cache.CACHE_FILE_NAME))
+    finally:
+        set_lookup_cache(None)
+    assert Cache.lookup_cache is None
+    assert cached('test', 'a', str.upper) == 'A'
+
+
+def test_result_cache_lru():
+    results = ResultCache(maxsize=2)
+    assert results.get('a', lambda: 1) == 1
+    assert results.get('b', lambda: 2) == 2
+    assert results.get('a', lambda: -1) == 1
+    assert results.get('c', lambda: 3) == 3
+    assert results.get('b', lambda: 4) == 4
+    assert results.info() == CacheInfo(hits=1, misses=4, maxsize=2, currsize=2)
+    results.invalidate()
+    assert results.info() == CacheInfo(hits=1, misses=4, maxsize=2, currsize=0)
+    assert results.get('a', lambda: 5) == 5
+    results.clear()
+    assert results.info() == CacheInfo(0, 0, 2, 0)
+
+
+def test_result_cache_errors_not_cached():
+    results = ResultCache()
+    def fail():
+        raise KeyError('missing')
+    with pytest.raises(KeyError):
+        results.get('a', fail)
+    assert len(results) == 0